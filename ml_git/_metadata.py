@@ -19,7 +19,8 @@ from ml_git.constants import METADATA_MANAGER_CLASS_NAME, HEAD_1, RGX_SIZE_FILES
     DEFAULT_BRANCH_FOR_EMPTY_REPOSITORY, PERFORMANCE_KEY, EntityType, FileType, RELATED_DATASET_TABLE_INFO, \
     RELATED_LABELS_TABLE_INFO, DATASET_SPEC_KEY, LABELS_SPEC_KEY, MANIFEST_FILE
 from ml_git.git_client import GitClient
-from ml_git.manifest import Manifest
+from ml_git.compact_manifest import load_compact_manifest
+from ml_git.manifest import Manifest, manifest_exists
 from ml_git.ml_git_message import output_messages
 from ml_git.spec import get_entity_dir, spec_parse, get_spec_key, search_spec_file
 from ml_git.utils import get_root_path, ensure_path_exists, yaml_load, RootPathException, get_yaml_str, yaml_load_str, \
@@ -128,7 +129,9 @@ class MetadataRepo(object):
                 log.warn(output_messages['WARN_UNCHANGED_FILE'].format(file))
                 return None
         log.info(output_messages['INFO_COMMIT_REPO'] % (self.__path, file), class_name=METADATA_MANAGER_CLASS_NAME)
-        repo.index.add([file])
+        # stages with git itself, which only hashes the files changed since the last commit and also stages
+        # the files removed under file (e.g. the shards of a manifest left empty)
+        repo.git.add('--all', '--', file)
         return repo.index.commit(msg)
 
     def tag_add(self, tag):
@@ -304,7 +307,7 @@ class MetadataRepo(object):
         repo.delete_tag(tag)
 
     def get_metadata_manifest(self, path):
-        if os.path.isfile(path):
+        if manifest_exists(path):
             return Manifest(path)
         return None
 
@@ -493,7 +496,7 @@ class MetadataRepo(object):
         self.checkout(source_ref)
         manifest_file_source_ref = Manifest(manifest_path)
         self.checkout(ref_to_compare)
-        manifest_file_ref_to_compare = Manifest(manifest_path)
+        manifest_file_ref_to_compare = load_compact_manifest(manifest_path)
         self.checkout()
         return manifest_file_source_ref.compare_files(manifest_file_ref_to_compare)
 
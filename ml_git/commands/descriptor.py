@@ -15,7 +15,7 @@ from ml_git.commands.custom_options import MutuallyExclusiveOption, OptionRequir
 from ml_git.commands.custom_types import CategoriesType, NotEmptyString
 from ml_git.commands.utils import set_verbose_mode, MAX_INT_VALUE
 from ml_git.commands.wizard import is_wizard_enabled
-from ml_git.constants import MultihashStorageType, MutabilityType, StorageType, FileType
+from ml_git.constants import MultihashStorageType, MutabilityType, StorageType, FileType, PACK_MAX_OBJECT_SIZE
 
 commands = [
 
@@ -49,12 +49,29 @@ commands = [
 
         'options': {
             '--fix-workspace': {'is_flag': True, 'default': False, 'help': help_msg.FSCK_FIX_WORKSPACE},
-            '--full': {'is_flag': True, 'default': False, 'help': help_msg.FSCK_FULL_OPTION}
+            '--full': {'is_flag': True, 'default': False, 'help': help_msg.FSCK_FULL_OPTION},
+            '--full-verify': {'is_flag': True, 'default': False, 'help': help_msg.FSCK_FULL_VERIFY_OPTION}
         },
 
 
     },
 
+    {
+        'name': 'repack',
+
+        'callback': entity.repack,
+        'groups': [entity.datasets, entity.models, entity.labels],
+
+        'help': 'Consolidate the loose objects of %s in this ml-git repository into packfiles.',
+
+        'options': {
+            '--max-object-size': {'help': help_msg.REPACK_MAX_OBJECT_SIZE,
+                                  'validators': [check_integer_value, partial(check_number_range, min=1, max=MAX_INT_VALUE),
+                                                 partial(check_default_value, default=PACK_MAX_OBJECT_SIZE)]}
+        },
+
+    },
+
     {
         'name': 'push',
         'callback': entity.push,
@@ -69,6 +86,10 @@ commands = [
                                                                       partial(check_number_range, min=0, max=MAX_INT_VALUE),
                                                                       partial(check_default_value, default=2)]},
             '--clearonfail': {'is_flag': True, 'help': help_msg.CLEAR_ON_FAIL},
+            '--bandwidth-limit': {'help': help_msg.BANDWIDTH_LIMIT, 'validators': [check_integer_value,
+                                                                                   partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
+            '--requests-limit': {'help': help_msg.REQUESTS_LIMIT, 'validators': [check_integer_value,
+                                                                                 partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
             '--fail-limit': {'help': help_msg.FAIL_LIMIT, 'validators': [check_integer_value,
                                                                          partial(check_number_range, min=0, max=MAX_INT_VALUE)]}
         },
@@ -91,6 +112,10 @@ commands = [
                                                                       partial(check_default_value, default=2)]},
             '--force': {'default': False, 'is_flag': True, 'help': help_msg.FORCE_CHECKOUT},
             '--bare': {'default': False, 'is_flag': True, 'help': help_msg.BARE_OPTION},
+            '--bandwidth-limit': {'help': help_msg.BANDWIDTH_LIMIT, 'validators': [check_integer_value,
+                                                                                   partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
+            '--requests-limit': {'help': help_msg.REQUESTS_LIMIT, 'validators': [check_integer_value,
+                                                                                 partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
             '--version': {'help': help_msg.ARTIFACT_VERSION, 'validators': [check_integer_value,
                                                                             partial(check_number_range, min=0, max=MAX_INT_VALUE)]},
             '--fail-limit': {'help': help_msg.FAIL_LIMIT, 'validators': [check_integer_value,
@@ -125,6 +150,10 @@ commands = [
                                                                       partial(check_default_value, default=2)]},
             '--force': {'is_flag': True, 'default': False, 'help': help_msg.FORCE_CHECKOUT},
             '--bare': {'default': False, 'is_flag': True, 'help': help_msg.BARE_OPTION},
+            '--bandwidth-limit': {'help': help_msg.BANDWIDTH_LIMIT, 'validators': [check_integer_value,
+                                                                                   partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
+            '--requests-limit': {'help': help_msg.REQUESTS_LIMIT, 'validators': [check_integer_value,
+                                                                                 partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
             '--version': {'help': help_msg.ARTIFACT_VERSION, 'validators': [check_integer_value,
                                                                             partial(check_number_range, min=0, max=MAX_INT_VALUE)]},
             '--fail-limit': {'help': help_msg.FAIL_LIMIT, 'validators': [check_integer_value,
@@ -149,6 +178,10 @@ commands = [
                                                                       partial(check_default_value, default=2)]},
             '--force': {'default': False, 'is_flag': True, 'help': help_msg.FORCE_CHECKOUT},
             '--bare': {'default': False, 'is_flag': True, 'help': help_msg.BARE_OPTION},
+            '--bandwidth-limit': {'help': help_msg.BANDWIDTH_LIMIT, 'validators': [check_integer_value,
+                                                                                   partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
+            '--requests-limit': {'help': help_msg.REQUESTS_LIMIT, 'validators': [check_integer_value,
+                                                                                 partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
             '--version': {'help': help_msg.ARTIFACT_VERSION, 'validators': [check_integer_value,
                                                                             partial(check_number_range, min=0, max=MAX_INT_VALUE)]},
             '--fail-limit': {'help': help_msg.FAIL_LIMIT, 'validators': [check_integer_value,
@@ -182,7 +215,11 @@ commands = [
             '--seed': {'default': '1', 'help': help_msg.SEED_OPTION},
             '--retry': {'help': help_msg.RETRY_OPTION, 'validators': [check_integer_value,
                                                                       partial(check_number_range, min=0, max=MAX_INT_VALUE),
-                                                                      partial(check_default_value, default=2)]}
+                                                                      partial(check_default_value, default=2)]},
+            '--bandwidth-limit': {'help': help_msg.BANDWIDTH_LIMIT, 'validators': [check_integer_value,
+                                                                                   partial(check_number_range, min=1, max=MAX_INT_VALUE)]},
+            '--requests-limit': {'help': help_msg.REQUESTS_LIMIT, 'validators': [check_integer_value,
+                                                                                 partial(check_number_range, min=1, max=MAX_INT_VALUE)]}
         },
 
         'help': 'Allows you to download just the metadata files of an entity.'
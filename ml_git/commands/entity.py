@@ -95,6 +95,7 @@ def push(context, **kwargs):
     entity = kwargs['ml_entity_name']
     retry = kwargs['retry']
     fail_limit = kwargs['fail_limit']
+    repositories[repo_type].set_transfer_limits(kwargs['bandwidth_limit'], kwargs['requests_limit'])
     repositories[repo_type].push(entity, retry, clear_on_fail, fail_limit)
 
 
@@ -130,6 +131,7 @@ def checkout(context, **kwargs):
     options['bare'] = kwargs['bare']
     options['fail_limit'] = kwargs['fail_limit']
     options['full'] = kwargs['full']
+    repo.set_transfer_limits(kwargs['bandwidth_limit'], kwargs['requests_limit'])
     repo.checkout(entity, sample, options)
 
 
@@ -145,6 +147,7 @@ def fetch(context, **kwargs):
     if sample_type is not None:
         sample = {sample_type: sampling, 'seed': seed}
 
+    repo.set_transfer_limits(kwargs['bandwidth_limit'], kwargs['requests_limit'])
     repo.fetch_tag(tag, sample, retries=2)
 
 
@@ -237,9 +240,14 @@ def reset(context, **kwargs):
     repositories[repo_type].reset(entity_name, reset_type, head)
 
 
-def fsck(context, full, fix_workspace):
+def fsck(context, full, fix_workspace, full_verify):
     repo_type = context.parent.command.name
-    repositories[repo_type].fsck(full, fix_workspace)
+    repositories[repo_type].fsck(full, fix_workspace, full_verify)
+
+
+def repack(context, max_object_size):
+    repo_type = context.parent.command.name
+    repositories[repo_type].repack(max_object_size)
 
 
 def import_tag(context, **kwargs):
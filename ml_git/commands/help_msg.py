@@ -74,13 +74,17 @@ METRIC_OPTION = 'Metric key and value.'
 METRICS_COMMAND = 'Shows metrics information for each tag of the entity.'
 EXPORT_METRICS_PATH = 'Set the path to export metrics to a file.'
 EXPORT_METRICS_TYPE = 'Choose the format of the file that will be generated with the metrics [default: json].'
+BANDWIDTH_LIMIT = 'Maximum number of bytes per second transferred with the storage [default: bandwidth_limit of the config file, or no limit].'
+REQUESTS_LIMIT = 'Maximum number of requests per second sent to the storage [default: requests_limit of the config file, or no limit].'
 FAIL_LIMIT = 'Number of failures before aborting the command. This number must be in the range 0-999999999 [default: no limit].'
 LOCAL_CONFIGURATIONS = 'Local configurations.'
 WIZARD_MODE = 'Enable or disable the wizard for all supported commands.'
 GLOBAL_CONFIGURATIONS = 'Global configurations.'
 VERBOSE_OPTION = 'Debug mode'
 FSCK_FULL_OPTION = 'Show the list of corrupted files.'
+FSCK_FULL_VERIFY_OPTION = 'Verify every object, including the ones unchanged since their last verification.'
 FSCK_FIX_WORKSPACE = 'Use this option to repair files identified as corrupted in the entity workspace.'
+REPACK_MAX_OBJECT_SIZE = 'Only objects up to this size in bytes are moved into packfiles [default: 262144].'
 REMOTE_FSCK_FULL_OPTION = 'Show the list of fixed and unfixed blobs and IPLDs.'
 CREATE_COMMAND = 'This command will create the workspace structure with data and spec file for an entity and set the ' \
                  'git and storage configurations. [This command has a wizard that will request the necessary information ' \
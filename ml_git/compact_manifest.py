@@ -0,0 +1,289 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+from array import array
+
+from ml_git.file_system.hash_algorithms import BASE58_ALPHABET, b58decode, b58encode
+from ml_git.manifest import get_manifest_files, load_manifest
+from ml_git.utils import yaml_load_str
+
+'''Read-only, compact in-memory form of a MANIFEST.yaml ({hash: set of files}).
+Keys are fixed-width records holding the bytes of the CIDs instead of their base58 strings, the files of
+each key are stored one after the other, with their directories interned and their names packed in a single
+buffer, and keys are looked up through an open-addressing table of indexes. A manifest of millions of files
+takes a fraction of the memory of the dict of sets loaded by yaml_load, which it replaces where the manifest
+of a version is only read (checkout, fetch, fsck, export and diff).'''
+
+_KEY_BASE58 = 0
+_KEY_TEXT = 1
+_KEY_HEADER_SIZE = 3
+_BASE58_CHARS = frozenset(BASE58_ALPHABET)
+
+
+class _Keys(object):
+    """Keys as fixed-width records: kind, length (2 bytes) and the bytes of the key, padded with zeros."""
+
+    __slots__ = ('_records', '_width', '_count')
+
+    def __init__(self):
+        self._records = bytearray()
+        self._width = 0
+        self._count = 0
+
+    @staticmethod
+    def _encode(key):
+        if len(key) > 1 and key[0] == 'z' and _BASE58_CHARS.issuperset(key[1:]):
+            return _KEY_BASE58, b58decode(key[1:])
+        return _KEY_TEXT, key.encode('utf-8')
+
+    def _record(self, kind, data, width):
+        return bytes((kind, len(data) >> 8, len(data) & 0xff)) + data + bytes(width - len(data))
+
+    def _widen(self, width):
+        records = bytearray()
+        for i in range(self._count):
+            kind, data = self._get_raw(i)
+            records += self._record(kind, data, width)
+        self._records = records
+        self._width = width
+
+    def append(self, key):
+        kind, data = self._encode(key)
+        if len(data) > self._width:
+            self._widen(len(data))
+        self._records += self._record(kind, data, self._width)
+        self._count += 1
+        return self._count - 1
+
+    def record(self, index):
+        size = _KEY_HEADER_SIZE + self._width
+        return bytes(self._records[index * size:(index + 1) * size])
+
+    def record_of(self, key):
+        """Returns the record key would have, or None if it is longer than any stored key."""
+        kind, data = self._encode(key)
+        if len(data) > self._width:
+            return None
+        return self._record(kind, data, self._width)
+
+    def _get_raw(self, index):
+        offset = index * (_KEY_HEADER_SIZE + self._width)
+        kind = self._records[offset]
+        size = (self._records[offset + 1] << 8) | self._records[offset + 2]
+        return kind, bytes(self._records[offset + _KEY_HEADER_SIZE:offset + _KEY_HEADER_SIZE + size])
+
+    def get(self, index):
+        kind, data = self._get_raw(index)
+        if kind == _KEY_BASE58:
+            return 'z' + b58encode(data)
+        return data.decode('utf-8')
+
+    def __len__(self):
+        return self._count
+
+
+class _Paths(object):
+    """File paths as the index of their (interned) directory and their name, packed in a single buffer."""
+
+    __slots__ = ('_dirs', '_dir_ids', '_dir_of', '_names', '_name_ends')
+
+    def __init__(self):
+        self._dirs = []
+        self._dir_ids = {}
+        self._dir_of = array('I')
+        self._names = bytearray()
+        self._name_ends = array('I')
+
+    def append(self, path):
+        directory, _, name = path.rpartition('/')
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self._dirs)
+            self._dirs.append(directory)
+        self._dir_of.append(dir_id)
+        self._names += name.encode('utf-8')
+        if len(self._names) > 0xffffffff and self._name_ends.typecode == 'I':
+            self._name_ends = array('Q', self._name_ends)
+        self._name_ends.append(len(self._names))
+
+    def get(self, index):
+        start = self._name_ends[index - 1] if index > 0 else 0
+        name = self._names[start:self._name_ends[index]].decode('utf-8')
+        directory = self._dirs[self._dir_of[index]]
+        return directory + '/' + name if directory else name
+
+    def freeze(self):
+        self._dir_ids = None
+
+    def __len__(self):
+        return len(self._dir_of)
+
+
+class CompactManifest(object):
+    """Read-only mapping of the keys of a manifest to the set of their files, in the order of the manifest."""
+
+    __slots__ = ('_keys', '_paths', '_starts', '_table', '_mask')
+
+    def __init__(self):
+        self._keys = _Keys()
+        self._paths = _Paths()
+        # files of the key i are the paths _starts[i] to _starts[i + 1]
+        self._starts = array('I', [0])
+        self._table = None
+        self._mask = 0
+
+    @classmethod
+    def from_dict(cls, manifest):
+        compact = cls()
+        for key, files in (manifest or {}).items():
+            compact._append(key, files)
+        compact._freeze()
+        return compact
+
+    def _append(self, key, files):
+        self._keys.append(key)
+        for file in files:
+            self._paths.append(file)
+        if len(self._paths) > 0xffffffff and self._starts.typecode == 'I':
+            self._starts = array('Q', self._starts)
+        self._starts.append(len(self._paths))
+
+    def _freeze(self):
+        self._paths.freeze()
+        size = 8
+        while size < 2 * len(self._keys):
+            size <<= 1
+        self._mask = size - 1
+        self._table = array('I' if len(self._keys) < 0xffffffff else 'Q', [0]) * size
+        for index in range(len(self._keys)):
+            slot = hash(self._keys.record(index)) & self._mask
+            while self._table[slot]:
+                slot = (slot + 1) & self._mask
+            self._table[slot] = index + 1
+
+    def _index(self, key):
+        if not isinstance(key, str):
+            return None
+        record = self._keys.record_of(key)
+        if record is None:
+            return None
+        slot = hash(record) & self._mask
+        while self._table[slot]:
+            index = self._table[slot] - 1
+            if self._keys.record(index) == record:
+                return index
+            slot = (slot + 1) & self._mask
+        return None
+
+    def _files(self, index):
+        return {self._paths.get(i) for i in range(self._starts[index], self._starts[index + 1])}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        for index in range(len(self._keys)):
+            yield self._keys.get(index)
+
+    def keys(self):
+        return iter(self)
+
+    def __contains__(self, key):
+        return self._index(key) is not None
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        if index is None:
+            raise KeyError(key)
+        return self._files(index)
+
+    def get(self, key, default=None):
+        index = self._index(key)
+        return default if index is None else self._files(index)
+
+    def items(self):
+        for index in range(len(self._keys)):
+            yield self._keys.get(index), self._files(index)
+
+    def values(self):
+        for index in range(len(self._keys)):
+            yield self._files(index)
+
+    def files_count(self):
+        return len(self._paths)
+
+
+class _UnsupportedFormat(Exception):
+    pass
+
+
+def _scalar(text):
+    if not text:
+        raise _UnsupportedFormat()
+    if text[0] == "'":
+        if len(text) < 2 or text[-1] != "'":
+            raise _UnsupportedFormat()
+        return text[1:-1].replace("''", "'")
+    if text[0] == '"':
+        value = yaml_load_str(text)
+        if not isinstance(value, str):
+            raise _UnsupportedFormat()
+        return value
+    return text
+
+
+def _parse_manifest(lines, manifest):
+    """Reads the block style written by yaml_save for a dict of sets, one line at a time."""
+    key, files, long_file = None, None, None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        if line.startswith('  '):
+            entry = line[2:]
+            if files is None:
+                raise _UnsupportedFormat()
+            if long_file is not None:
+                if entry != ': null':
+                    raise _UnsupportedFormat()
+                files.append(long_file)
+                long_file = None
+            elif entry.startswith('? '):
+                long_file = _scalar(entry[2:])
+            elif entry.endswith(': null'):
+                files.append(_scalar(entry[:-len(': null')]))
+            else:
+                raise _UnsupportedFormat()
+            continue
+        if long_file is not None:
+            raise _UnsupportedFormat()
+        if key is not None:
+            manifest._append(key, files)
+        if line.endswith(': !!set'):
+            key, files = _scalar(line[:-len(': !!set')]), []
+        elif line.endswith(': !!set {}'):
+            key, files = _scalar(line[:-len(': !!set {}')]), []
+        else:
+            raise _UnsupportedFormat()
+    if long_file is not None:
+        raise _UnsupportedFormat()
+    if key is not None:
+        manifest._append(key, files)
+
+
+def load_compact_manifest(path):
+    """Loads the MANIFEST.yaml at path (or its shards) as a CompactManifest, without building the dict of sets.
+    Manifests written in another YAML layout are loaded with yaml_load and then compacted."""
+    manifest = CompactManifest()
+    try:
+        for manifest_path in get_manifest_files(path):
+            with open(manifest_path) as manifest_file:
+                _parse_manifest(manifest_file, manifest)
+    except FileNotFoundError:
+        pass
+    except (_UnsupportedFormat, UnicodeDecodeError):
+        return CompactManifest.from_dict(load_manifest(path))
+    manifest._freeze()
+    return manifest
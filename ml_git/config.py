@@ -12,14 +12,20 @@ from halo import Halo
 
 from ml_git import spec, log
 from ml_git.constants import FAKE_STORAGE, BATCH_SIZE_VALUE, BATCH_SIZE, StorageType, GLOBAL_ML_GIT_CONFIG, \
-    PUSH_THREADS_COUNT, SPEC_EXTENSION, EntityType, STORAGE_CONFIG_KEY, STORAGE_SPEC_KEY, DATASET_SPEC_KEY, \
-    MultihashStorageType
+    PUSH_THREADS_COUNT, HASH_THREADS_COUNT, FSCK_PROCESSES_COUNT, VERIFICATION_POLICY, VERIFICATION_SAMPLE_RATE, VERIFICATION_SAMPLE_RATE_VALUE, \
+    ADD_PROCESSES_COUNT, VerificationPolicy, SPEC_EXTENSION, EntityType, STORAGE_CONFIG_KEY, STORAGE_SPEC_KEY, DATASET_SPEC_KEY, \
+    MultihashStorageType, ADAPTIVE_CONCURRENCY, MIN_CONCURRENCY, MAX_CONCURRENCY, MIN_CONCURRENCY_VALUE, MAX_CONCURRENCY_VALUE, \
+    BANDWIDTH_LIMIT, REQUESTS_LIMIT, STORAGE_BANDWIDTH_LIMIT, STORAGE_REQUESTS_LIMIT
 from ml_git.ml_git_message import output_messages
 from ml_git.spec import get_spec_key
 from ml_git.utils import getOrElse, yaml_load, yaml_save, get_root_path, yaml_load_str, RootPathException, \
     path_is_parent
 
 push_threads = os.cpu_count()*5
+hash_threads = os.cpu_count()
+fsck_processes = os.cpu_count()
+# add hashes files in the threads of the worker pool unless it is set to more than one process
+add_processes = 1
 
 mlgit_config = {
     'mlgit_path': '.ml-git',
@@ -47,7 +53,27 @@ mlgit_config = {
     'cache_path': '',
     'metadata_path': '',
 
-    PUSH_THREADS_COUNT: push_threads
+    PUSH_THREADS_COUNT: push_threads,
+
+    HASH_THREADS_COUNT: hash_threads,
+
+    FSCK_PROCESSES_COUNT: fsck_processes,
+
+    ADD_PROCESSES_COUNT: add_processes,
+
+    ADAPTIVE_CONCURRENCY: False,
+
+    MIN_CONCURRENCY: MIN_CONCURRENCY_VALUE,
+
+    MAX_CONCURRENCY: MAX_CONCURRENCY_VALUE,
+
+    BANDWIDTH_LIMIT: 0,
+
+    REQUESTS_LIMIT: 0,
+
+    VERIFICATION_POLICY: VerificationPolicy.ALWAYS.value,
+
+    VERIFICATION_SAMPLE_RATE: VERIFICATION_SAMPLE_RATE_VALUE
 
 }
 
@@ -471,6 +497,81 @@ def get_push_threads_count(config):
     return push_threads_count
 
 
+def get_hash_threads_count(config):
+    try:
+        hash_threads_count = int(config.get(HASH_THREADS_COUNT, hash_threads))
+    except Exception:
+        raise RuntimeError(output_messages['ERROR_INVALID_VALUE_IN_CONFIG'] % HASH_THREADS_COUNT)
+
+    return hash_threads_count
+
+
+def get_fsck_processes_count(config):
+    try:
+        fsck_processes_count = int(config.get(FSCK_PROCESSES_COUNT, fsck_processes))
+    except Exception:
+        raise RuntimeError(output_messages['ERROR_INVALID_VALUE_IN_CONFIG'] % FSCK_PROCESSES_COUNT)
+
+    return fsck_processes_count
+
+
+def get_add_processes_count(config):
+    try:
+        add_processes_count = int(config.get(ADD_PROCESSES_COUNT, add_processes))
+    except Exception:
+        raise RuntimeError(output_messages['ERROR_INVALID_VALUE_IN_CONFIG'] % ADD_PROCESSES_COUNT)
+
+    return add_processes_count
+
+
+def get_concurrency_limits(config):
+    """Returns the (min, max) bounds of the adaptive concurrency of the storage operations, or None if it is disabled."""
+    if not config.get(ADAPTIVE_CONCURRENCY, False):
+        return None
+    try:
+        limits = int(config.get(MIN_CONCURRENCY, MIN_CONCURRENCY_VALUE)), int(config.get(MAX_CONCURRENCY, MAX_CONCURRENCY_VALUE))
+    except Exception:
+        limits = 0, 0
+    if not 0 < limits[0] <= limits[1]:
+        raise RuntimeError(output_messages['ERROR_INVALID_CONCURRENCY_LIMITS'] % (MIN_CONCURRENCY, MAX_CONCURRENCY))
+    return limits
+
+
+def get_transfer_limits(config, bucket=None):
+    """Returns the (bytes, requests) per second allowed to the transfers of a storage, 0 meaning no limit.
+
+    The bandwidth_limit and requests_limit options apply to every storage and take precedence over the
+    bandwidth-limit and requests-limit of the configuration of its bucket.
+    """
+    limits = []
+    for key, storage_key in ((BANDWIDTH_LIMIT, STORAGE_BANDWIDTH_LIMIT), (REQUESTS_LIMIT, STORAGE_REQUESTS_LIMIT)):
+        try:
+            limit = float(config.get(key) or (bucket or {}).get(storage_key) or 0)
+        except Exception:
+            limit = -1
+        if limit < 0:
+            raise RuntimeError(output_messages['ERROR_INVALID_TRANSFER_LIMIT'] % (key, storage_key))
+        limits.append(limit)
+    return tuple(limits)
+
+
+def get_verification_policy(config):
+    policy = config.get(VERIFICATION_POLICY, VerificationPolicy.ALWAYS.value)
+    if policy not in VerificationPolicy.to_list():
+        raise RuntimeError(output_messages['ERROR_INVALID_VERIFICATION_POLICY'] % (policy, VerificationPolicy.to_list()))
+    return policy
+
+
+def get_verification_sample_rate(config):
+    try:
+        sample_rate = float(config.get(VERIFICATION_SAMPLE_RATE, VERIFICATION_SAMPLE_RATE_VALUE))
+    except Exception:
+        sample_rate = -1
+    if not 0 <= sample_rate <= 1:
+        raise RuntimeError(output_messages['ERROR_INVALID_SAMPLE_RATE_IN_CONFIG'] % VERIFICATION_SAMPLE_RATE)
+    return sample_rate
+
+
 def merged_config_load(hide_logs=False):
     try:
         get_root_path()
@@ -37,6 +37,52 @@ FAKE_STORAGE = 'fake_storage'
 FAKE_TYPE = 's3h'
 BATCH_SIZE = 'batch_size'
 PUSH_THREADS_COUNT = 'push_threads_count'
+HASH_THREADS_COUNT = 'hash_threads_count'
+PARALLEL_HASHING_MIN_BLOCKS = 8
+PARALLEL_HASHING_BLOCKS_PER_TASK = 16
+PACKS_PATH = 'pack'
+PACK_MAX_SIZE = 512 * 1024 * 1024
+PACK_MAX_OBJECT_SIZE = 256 * 1024
+GET_READAHEAD_CHUNKS = 8
+VERIFICATION_POLICY = 'verification_policy'
+VERIFICATION_SAMPLE_RATE = 'verification_sample_rate'
+VERIFICATION_SAMPLE_RATE_VALUE = 0.1
+VERIFIED_OBJECTS_DB = 'verified.db'
+VERIFIED_OBJECTS_FLUSH_SIZE = 1000
+DESCRIPTOR_CACHE_SIZE = 65536
+PUSH_JOURNAL = 'push_journal.db'
+FSCK_PROCESSES_COUNT = 'fsck_processes_count'
+ADD_PROCESSES_COUNT = 'add_processes_count'
+ADAPTIVE_CONCURRENCY = 'adaptive_concurrency'
+MIN_CONCURRENCY = 'min_concurrency'
+MAX_CONCURRENCY = 'max_concurrency'
+BANDWIDTH_LIMIT = 'bandwidth_limit'
+REQUESTS_LIMIT = 'requests_limit'
+STORAGE_BANDWIDTH_LIMIT = 'bandwidth-limit'
+STORAGE_REQUESTS_LIMIT = 'requests-limit'
+FSCK_CHECKPOINT = 'fsck.checkpoint'
+FSCK_CHECKPOINT_INTERVAL = 30
+PUSH_JOURNAL_FLUSH_SIZE = 1000
+PUSH_JOURNAL_PAGE_SIZE = 10000
+OBJECTS_FILTER_DB = 'objects.db'
+OBJECTS_FILTER_FILE = 'objects.bloom'
+OBJECTS_FILTER_FALSE_POSITIVE_RATE = 0.01
+OBJECTS_FILTER_MIN_CAPACITY = 65536
+INDEX_DB = 'index.db'
+INDEX_DB_PAGE_SIZE = 10000
+ADD_QUEUE_SIZE = 10000
+ADD_PENDING_PER_WORKER = 4
+ADD_SAVE_INTERVAL = 10000
+ADD_PROCESS_BATCH_SIZE = 64
+POOL_IN_FLIGHT_PER_WORKER = 2
+POOL_ROOTS_IN_FLIGHT_SHARE = 0.5
+MIN_CONCURRENCY_VALUE = 4
+MAX_CONCURRENCY_VALUE = 64
+CONCURRENCY_DECREASE_FACTOR = 0.5
+CONCURRENCY_LATENCY_TOLERANCE = 2.0
+CONCURRENCY_THROUGHPUT_DROP = 0.9
+THROTTLING_ERROR_CODES = ['SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'TooManyRequests',
+                          'RequestThrottled', 'ServiceUnavailable', 'ServerBusy', 'rateLimitExceeded', 'userRateLimitExceeded']
 BATCH_SIZE_VALUE = 20
 RGX_SIZE_FILES = r'[+]\s+size:\s+(\d+(?:[.]\d+)*\s+.+)'
 RGX_AMOUNT_FILES = r'[+]\s+amount:\s+(\d+)'
@@ -71,6 +117,17 @@ DATASET_SPEC_KEY = 'dataset'
 LABELS_SPEC_KEY = 'labels'
 MODEL_SPEC_KEY = 'model'
 STORAGE_SPEC_KEY = 'storage'
+CHUNKING_SPEC_KEY = 'chunking'
+INLINE_MAX_SIZE_SPEC_KEY = 'inline_max_size'
+INLINE_DATA_KEY = 'Data'
+COMPRESSION_SPEC_KEY = 'compression'
+CODEC_KEY = 'Codec'
+HASH_ALGORITHM_SPEC_KEY = 'hash_algorithm'
+DEFAULT_HASH_ALGORITHM = 'sha2-256'
+MANIFEST_SHARDS_SPEC_KEY = 'shards'
+MANIFEST_SHARDS_DIR = 'MANIFEST.shards'
+MANIFEST_SHARDS_ROOT = 'ROOT.yaml'
+MANIFEST_SHARD_FILE = 'shard-%04d.yaml'
 STORAGE_CONFIG_KEY = 'storages'
 MLGIT_IGNORE_FILE_NAME = '.mlgitignore'
 GIT_CLIENT_CLASS_NAME = 'GitClient'
@@ -102,6 +159,28 @@ class StorageType(Enum):
         return [storage.value for storage in StorageType]
 
 
+@unique
+class VerificationPolicy(Enum):
+    ALWAYS = 'always'
+    ON_DOWNLOAD = 'on-download'
+    SAMPLED = 'sampled'
+    BACKGROUND = 'background'
+
+    @staticmethod
+    def to_list():
+        return [policy.value for policy in VerificationPolicy]
+
+
+@unique
+class ChunkingType(Enum):
+    FIXED = 'fixed'
+    CDC = 'cdc'
+
+    @staticmethod
+    def to_list():
+        return [chunking.value for chunking in ChunkingType]
+
+
 @unique
 class MultihashStorageType(Enum):
     S3H = 's3h'
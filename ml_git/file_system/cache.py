@@ -19,10 +19,8 @@ class Cache(HashFS):
         self.__manifest = manifest
 
     def update(self):
-        objfiles = yaml_load(self.__manifest)
-        for key in objfiles:
-            files = objfiles[key]
-
+        objfiles = yaml_load(self.__manifest) if isinstance(self.__manifest, str) else self.__manifest
+        for key, files in objfiles.items():
             for file in files:
                 srcfile = os.path.join(self.__datapath, file)
                 try:
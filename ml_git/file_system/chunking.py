@@ -0,0 +1,174 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import hashlib
+
+try:
+    import numpy
+except ImportError:
+    # the cut points are then searched by a pure Python loop
+    numpy = None
+
+from ml_git.constants import ChunkingType, CHUNKING_SPEC_KEY, INLINE_MAX_SIZE_SPEC_KEY, COMPRESSION_SPEC_KEY, HASH_ALGORITHM_SPEC_KEY, \
+    DEFAULT_HASH_ALGORITHM
+from ml_git.file_system.compression import get_codec
+from ml_git.file_system.hash_algorithms import get_hash_algorithm
+from ml_git.ml_git_message import output_messages
+from ml_git.spec import get_spec_key
+from ml_git.utils import yaml_load
+
+CDC_DEFAULT_MIN_SIZE = 64 * 1024
+CDC_DEFAULT_AVG_SIZE = 256 * 1024
+CDC_DEFAULT_MAX_SIZE = 1024 * 1024
+# bytes whose fingerprints are computed at once by the vectorized search, so it stops soon after a cut point
+CDC_SCAN_BLOCK_SIZE = 64 * 1024
+
+_FINGERPRINT_MASK = (1 << 64) - 1
+
+
+def _build_gear_table():
+    # The table must never change: it defines where chunk boundaries are placed.
+    return [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'big') for i in range(256)]
+
+
+GEAR = _build_gear_table()
+GEAR_ARRAY = numpy.array(GEAR, dtype=numpy.uint64) if numpy is not None else None
+
+
+def _gear_fingerprints(window):
+    """Returns the fingerprint of the gear hash at each byte of window, for a hash started at its first byte.
+
+    The fingerprint at byte i is the sum of GEAR[window[i - k]] << k for k < 64, so it is built by doubling the
+    number of bytes summed at each step instead of rolling over the bytes one by one.
+    """
+    fingerprints = GEAR_ARRAY[numpy.frombuffer(window, dtype=numpy.uint8)]
+    shift = 1
+    while shift < 64:
+        fingerprints[shift:] += fingerprints[:-shift] << numpy.uint64(shift)
+        shift *= 2
+    return fingerprints
+
+
+def _boundary_mask(bits):
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+class ContentDefinedChunker(object):
+    """FastCDC-style chunker based on a gear rolling hash with normalized chunking.
+
+    Boundaries depend on the content, so inserting or removing bytes in a file only changes
+    the chunks around the edit and the remaining chunks keep their CIDs. When numpy is available, the
+    fingerprints are computed by blocks of bytes, which places the same boundaries as the byte loop.
+    """
+
+    def __init__(self, min_size=CDC_DEFAULT_MIN_SIZE, avg_size=CDC_DEFAULT_AVG_SIZE, max_size=CDC_DEFAULT_MAX_SIZE):
+        if not 0 < min_size <= avg_size <= max_size:
+            raise RuntimeError(output_messages['ERROR_INVALID_CHUNKING_SIZES'] % (min_size, avg_size, max_size))
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = max(avg_size.bit_length() - 1, 2)
+        self._mask_small = _boundary_mask(bits + 1)
+        self._mask_large = _boundary_mask(bits - 1)
+        self._scan = self._scan_blocks if numpy is not None else self._scan_bytes
+
+    def _cut_point(self, data):
+        size = len(data)
+        if size <= self.min_size:
+            return size
+        return self._scan(data, min(self.avg_size, size), min(self.max_size, size))
+
+    def _scan_bytes(self, data, normal_size, end):
+        gear = GEAR
+        fingerprint = 0
+        for mask, start, stop in ((self._mask_small, self.min_size, normal_size), (self._mask_large, normal_size, end)):
+            for i in range(start, stop):
+                fingerprint = ((fingerprint << 1) + gear[data[i]]) & _FINGERPRINT_MASK
+                if not fingerprint & mask:
+                    return i + 1
+        return end
+
+    def _scan_blocks(self, data, normal_size, end):
+        view = memoryview(data)
+        mask_small = numpy.uint64(self._mask_small)
+        mask_large = numpy.uint64(self._mask_large)
+        start = self.min_size
+        while start < end:
+            stop = min(start + CDC_SCAN_BLOCK_SIZE, end)
+            # the fingerprints of the block depend on the 63 bytes before it
+            context = min(start - self.min_size, 63)
+            fingerprints = _gear_fingerprints(view[start - context:stop])[context:]
+            split = min(max(normal_size - start, 0), stop - start)
+            cuts = numpy.flatnonzero((fingerprints[:split] & mask_small) == 0)
+            if cuts.size == 0:
+                cuts = numpy.flatnonzero((fingerprints[split:] & mask_large) == 0) + split
+            if cuts.size > 0:
+                return start + int(cuts[0]) + 1
+            start = stop
+        return end
+
+    def chunks(self, file):
+        buffer = b''
+        eof = False
+        while True:
+            if not eof and len(buffer) < self.max_size:
+                data = file.read(self.max_size)
+                eof = not data
+                buffer += data
+                continue
+            if not buffer:
+                break
+            cut = self._cut_point(buffer)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+
+
+def create_chunker(manifest):
+    """Returns the chunker configured in the manifest section of an entity spec.
+    None means the default fixed-size chunking of MultihashFS."""
+    options = manifest.get(CHUNKING_SPEC_KEY) if manifest else None
+    if not options:
+        return None
+    chunking_type = options.get('type', ChunkingType.FIXED.value)
+    if chunking_type == ChunkingType.FIXED.value:
+        return None
+    if chunking_type != ChunkingType.CDC.value:
+        raise RuntimeError(output_messages['ERROR_INVALID_CHUNKING_TYPE'] % (chunking_type, ChunkingType.to_list()))
+    return ContentDefinedChunker(int(options.get('min_size', CDC_DEFAULT_MIN_SIZE)),
+                                 int(options.get('avg_size', CDC_DEFAULT_AVG_SIZE)),
+                                 int(options.get('max_size', CDC_DEFAULT_MAX_SIZE)))
+
+
+def get_inline_max_size(manifest):
+    """Returns the size up to which files are embedded in their descriptor (0 disables it)."""
+    options = manifest.get(CHUNKING_SPEC_KEY) if manifest else None
+    return int(options.get(INLINE_MAX_SIZE_SPEC_KEY, 0)) if options else 0
+
+
+def _load_manifest(spec_file_path, repo_type):
+    spec = yaml_load(spec_file_path)
+    entity_spec = spec.get(get_spec_key(repo_type), {}) if spec else {}
+    return entity_spec.get('manifest')
+
+
+def get_compression(manifest):
+    """Returns the name of the codec used to compress the chunks of the entity, or None."""
+    compression = manifest.get(COMPRESSION_SPEC_KEY) if manifest else None
+    # fails early on codecs that are not available
+    return get_codec(compression).name if compression else None
+
+
+def get_hash_algorithm_name(manifest):
+    """Returns the name of the hash algorithm that identifies the new objects of the entity."""
+    name = manifest.get(HASH_ALGORITHM_SPEC_KEY) if manifest else None
+    # fails early on algorithms that are not available
+    return get_hash_algorithm(name).name if name else DEFAULT_HASH_ALGORITHM
+
+
+def load_chunking_options(spec_file_path, repo_type):
+    """Returns the chunking keyword arguments of MultihashIndex/MultihashFS set in the spec of an entity."""
+    manifest = _load_manifest(spec_file_path, repo_type)
+    return {'chunker': create_chunker(manifest), 'inline_max_size': get_inline_max_size(manifest),
+            'compression': get_compression(manifest), 'hash_algorithm': get_hash_algorithm_name(manifest)}
@@ -0,0 +1,80 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import bz2
+import lzma
+import struct
+import zlib
+
+from ml_git.ml_git_message import output_messages
+
+'''Compression of the chunks of MultihashFS.
+Chunks are compressed after being hashed, so their CID always identifies the uncompressed content.
+A compressed chunk starts with a header (magic, codec id, uncompressed size), which makes every
+stored chunk self-describing: readers that only know a CID can still restore its content.'''
+
+CHUNK_MAGIC = b'\x89MLGC\n'
+CHUNK_HEADER = struct.Struct('>%dsBQ' % len(CHUNK_MAGIC))
+
+
+class Codec(object):
+
+    def __init__(self, name, codec_id, compress, decompress):
+        self.name = name
+        self.codec_id = codec_id
+        self.compress = compress
+        self.decompress = decompress
+
+
+_codecs_by_name = {}
+_codecs_by_id = {}
+
+
+def register_codec(name, codec_id, compress, decompress):
+    """Makes a codec available to the entities specs. codec_id is stored in the chunks and must never change."""
+    codec = Codec(name, codec_id, compress, decompress)
+    _codecs_by_name[name] = codec
+    _codecs_by_id[codec_id] = codec
+    return codec
+
+
+register_codec('zlib', 1, zlib.compress, zlib.decompress)
+register_codec('bz2', 2, bz2.compress, bz2.decompress)
+register_codec('lzma', 3, lzma.compress, lzma.decompress)
+
+
+def get_codec(name):
+    if name is None:
+        return None
+    if name not in _codecs_by_name:
+        raise RuntimeError(output_messages['ERROR_INVALID_COMPRESSION_CODEC'] % (name, sorted(_codecs_by_name)))
+    return _codecs_by_name[name]
+
+
+def encode_chunk(codec, data):
+    """Returns the stored form of data: compressed with a header, or data itself when compressing does not save space."""
+    compressed = codec.compress(data)
+    if CHUNK_HEADER.size + len(compressed) >= len(data):
+        return data
+    return CHUNK_HEADER.pack(CHUNK_MAGIC, codec.codec_id, len(data)) + compressed
+
+
+def is_encoded(data):
+    """Tells whether data (or its first CHUNK_HEADER.size bytes) starts with a compressed chunk header."""
+    if len(data) < CHUNK_HEADER.size:
+        return False
+    magic, codec_id, _ = CHUNK_HEADER.unpack_from(data, 0)
+    return magic == CHUNK_MAGIC and codec_id in _codecs_by_id
+
+
+def decode_chunk(data):
+    """Returns the uncompressed content of a stored chunk. Chunks stored uncompressed are returned as is."""
+    if not is_encoded(data):
+        return data
+    _, codec_id, size = CHUNK_HEADER.unpack_from(data, 0)
+    decoded = _codecs_by_id[codec_id].decompress(bytes(data[CHUNK_HEADER.size:]))
+    if len(decoded) != size:
+        raise ValueError(output_messages['ERROR_INVALID_COMPRESSED_CHUNK'] % (size, len(decoded)))
+    return decoded
@@ -0,0 +1,84 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import threading
+from collections import OrderedDict
+
+from ml_git.constants import DESCRIPTOR_CACHE_SIZE
+
+
+class DescriptorCache(object):
+    """Bounded LRU cache of parsed IPLD descriptors, shared by every MultihashFS of the process.
+
+    MultihashFS keys the descriptors by the path of its store and their CID, so stores never share an entry.
+    Each entry records whether its content was verified against its CID; a lookup that requires a verified
+    descriptor misses on the others. Links are kept as (cid, size) tuples, which take a fraction of the memory
+    of the parsed JSON, followed by the other fields of the descriptor.
+    """
+
+    def __init__(self, max_entries=DESCRIPTOR_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _is_compactable(descriptor):
+        return next(iter(descriptor), None) == 'Links' and all(list(link) == ['Hash', 'Size'] for link in descriptor['Links'])
+
+    def get(self, key, verified=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (verified and not entry[2]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        links, fields, _ = entry
+        descriptor = {'Links': [{'Hash': cid, 'Size': size} for cid, size in links]}
+        descriptor.update(fields)
+        return descriptor
+
+    def put(self, key, descriptor, verified=True):
+        if self._max_entries <= 0 or not self._is_compactable(descriptor):
+            return
+        fields = tuple((name, value) for name, value in descriptor.items() if name != 'Links')
+        links = tuple((link['Hash'], link['Size']) for link in descriptor['Links'])
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = links, fields, verified or (previous is not None and previous[2])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate()}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+descriptor_cache = DescriptorCache()
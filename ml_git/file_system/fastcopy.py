@@ -0,0 +1,103 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import errno
+import mmap
+import os
+from contextlib import contextmanager
+
+'''Helpers to move file ranges without copying them through Python objects.
+The kernel primitives are used when available (copy_file_range, then sendfile)
+with a buffered copy as the portable fallback.'''
+
+COPY_BUFFER_SIZE = 1024 * 1024
+_FALLBACK_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF)
+
+_has_copy_file_range = hasattr(os, 'copy_file_range')
+_has_sendfile = hasattr(os, 'sendfile')
+
+
+def _kernel_copy(copy_function, src_fd, dst_fd, offset, count):
+    while count > 0:
+        copied = copy_function(src_fd, dst_fd, offset, count)
+        if copied == 0:
+            break
+        offset += copied
+        count -= copied
+    return offset, count
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def copy_range(src_fd, dst_fd, offset, count):
+    """Appends count bytes of src_fd starting at offset to the current position of dst_fd."""
+    global _has_copy_file_range, _has_sendfile
+    if _has_copy_file_range:
+        try:
+            offset, count = _kernel_copy(_copy_file_range, src_fd, dst_fd, offset, count)
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRORS:
+                raise e
+            _has_copy_file_range = e.errno not in (errno.ENOSYS, errno.EOPNOTSUPP)
+    if count > 0 and _has_sendfile:
+        try:
+            offset, count = _kernel_copy(_sendfile, src_fd, dst_fd, offset, count)
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRORS:
+                raise e
+            _has_sendfile = e.errno not in (errno.ENOSYS, errno.EOPNOTSUPP)
+    while count > 0:
+        data = os.pread(src_fd, min(count, COPY_BUFFER_SIZE), offset) if hasattr(os, 'pread') else _seek_read(src_fd, offset, count)
+        if not data:
+            break
+        os.write(dst_fd, data)
+        offset += len(data)
+        count -= len(data)
+
+
+def read_range(fd, offset, count):
+    """Reads count bytes of fd starting at offset, without moving its file position when possible."""
+    if hasattr(os, 'pread'):
+        return os.pread(fd, count, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, count)
+
+
+def _seek_read(fd, offset, count):
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, min(count, COPY_BUFFER_SIZE))
+
+
+def advise_willneed(fd, offset, count):
+    """Asks the kernel to start reading a range of fd ahead of its use."""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, count, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+
+
+@contextmanager
+def map_range(fd, offset, count):
+    """Yields a read-only memoryview over count bytes of fd starting at offset."""
+    if count == 0:
+        yield memoryview(b'')
+        return
+    aligned_offset = offset - offset % mmap.ALLOCATIONGRANULARITY
+    mapped = mmap.mmap(fd, count + offset - aligned_offset, access=mmap.ACCESS_READ, offset=aligned_offset)
+    view = memoryview(mapped)
+    range_view = view[offset - aligned_offset:]
+    try:
+        yield range_view
+    finally:
+        range_view.release()
+        view.release()
+        mapped.close()
@@ -0,0 +1,125 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import hashlib
+from functools import partial
+
+from ml_git.constants import DEFAULT_HASH_ALGORITHM
+from ml_git.ml_git_message import output_messages
+
+'''Hash algorithms that identify the objects of MultihashFS.
+Keys are CIDv1 (dag-pb) strings in base58btc whose multihash prefix records the algorithm, so objects
+hashed with different algorithms can live in the same store and each one is verified with its own.
+The CIDs are encoded here directly from the digest, which gives the same strings as the cid package
+without its hex and multihash round-trips.'''
+
+CID_VERSION = 1
+DAG_PB_CODEC = 0x70
+BASE58BTC_PREFIX = 'z'
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+_BASE58_PAIRS = [a + b for a in BASE58_ALPHABET for b in BASE58_ALPHABET]
+_BASE58_INDEX = {c: i for i, c in enumerate(BASE58_ALPHABET)}
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _read_varint(data, offset):
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        value |= (byte & 0x7f) << shift
+        offset += 1
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def b58encode(data):
+    number = int.from_bytes(data, 'big')
+    digits = []
+    while number:
+        # two digits per division
+        number, remainder = divmod(number, 58 * 58)
+        digits.append(_BASE58_PAIRS[remainder])
+    encoded = ''.join(reversed(digits)).lstrip('1')
+    return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
+
+
+def b58decode(encoded):
+    number = 0
+    for char in encoded:
+        number = number * 58 + _BASE58_INDEX[char]
+    leading_zeros = len(encoded) - len(encoded.lstrip('1'))
+    return b'\0' * leading_zeros + number.to_bytes((number.bit_length() + 7) // 8, 'big')
+
+
+class HashAlgorithm(object):
+
+    def __init__(self, name, code, digest_size, new):
+        self.name = name
+        self.code = code
+        self.digest_size = digest_size
+        self.new = new
+        self._cid_prefix = _varint(CID_VERSION) + _varint(DAG_PB_CODEC) + _varint(code) + _varint(digest_size)
+
+    def cid(self, hasher):
+        """Returns the CID of the content fed to hasher, an object returned by new()."""
+        return BASE58BTC_PREFIX + b58encode(self._cid_prefix + hasher.digest())
+
+    def digest(self, data):
+        hasher = self.new()
+        hasher.update(data)
+        return self.cid(hasher)
+
+
+_algorithms_by_name = {}
+_algorithms_by_code = {}
+
+
+def register_hash_algorithm(name, code, digest_size, new):
+    """Makes a hash algorithm available to the entities specs. code is its multihash code and new returns a hashlib-like object."""
+    algorithm = HashAlgorithm(name, code, digest_size, new)
+    _algorithms_by_name[name] = algorithm
+    _algorithms_by_code[code] = algorithm
+    return algorithm
+
+
+register_hash_algorithm('sha2-256', 0x12, 32, hashlib.sha256)
+register_hash_algorithm('sha2-512', 0x13, 64, hashlib.sha512)
+register_hash_algorithm('sha3-256', 0x16, 32, hashlib.sha3_256)
+register_hash_algorithm('sha3-512', 0x14, 64, hashlib.sha3_512)
+register_hash_algorithm('blake2b-256', 0xb220, 32, partial(hashlib.blake2b, digest_size=32))
+register_hash_algorithm('blake2b-512', 0xb240, 64, hashlib.blake2b)
+register_hash_algorithm('blake2s-256', 0xb260, 32, hashlib.blake2s)
+
+
+def get_hash_algorithm(name=DEFAULT_HASH_ALGORITHM):
+    if name not in _algorithms_by_name:
+        raise RuntimeError(output_messages['ERROR_INVALID_HASH_ALGORITHM'] % (name, sorted(_algorithms_by_name)))
+    return _algorithms_by_name[name]
+
+
+def algorithm_of(cid):
+    """Returns the hash algorithm recorded in cid. Keys that are not valid CIDs get the default algorithm,
+    so verifying them fails as for any corrupted object."""
+    try:
+        data = b58decode(cid[1:]) if cid.startswith(BASE58BTC_PREFIX) else b''
+        _, offset = _read_varint(data, 0)
+        _, offset = _read_varint(data, offset)
+        code, _ = _read_varint(data, offset)
+    except (KeyError, IndexError):
+        return _algorithms_by_name[DEFAULT_HASH_ALGORITHM]
+    return _algorithms_by_code.get(code, _algorithms_by_name[DEFAULT_HASH_ALGORITHM])
+
+
+def hash_algorithms():
+    return sorted(_algorithms_by_name)
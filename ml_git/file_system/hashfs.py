@@ -3,18 +3,38 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import base64
 import hashlib
 import json
+import multiprocessing
 import os
-
-import multihash
-from cid import CIDv1
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
+
+import humanize
 from tqdm import tqdm
 
 from ml_git import log
-from ml_git.constants import HASH_FS_CLASS_NAME, LOCAL_REPOSITORY_CLASS_NAME, STORAGE_LOG
+from ml_git.constants import HASH_FS_CLASS_NAME, STORAGE_LOG, PARALLEL_HASHING_MIN_BLOCKS, \
+    PARALLEL_HASHING_BLOCKS_PER_TASK, PACKS_PATH, PACK_MAX_OBJECT_SIZE, GET_READAHEAD_CHUNKS, VerificationPolicy, \
+    VERIFICATION_SAMPLE_RATE_VALUE, VERIFIED_OBJECTS_DB, PUSH_JOURNAL, FSCK_CHECKPOINT, FSCK_CHECKPOINT_INTERVAL, INLINE_DATA_KEY, \
+    CODEC_KEY, OBJECTS_FILTER_DB, OBJECTS_FILTER_FILE, DEFAULT_HASH_ALGORITHM
+from ml_git.file_system.compression import CHUNK_HEADER, decode_chunk, encode_chunk, get_codec, is_encoded
+from ml_git.file_system.descriptor_cache import descriptor_cache
+from ml_git.file_system.hash_algorithms import algorithm_of, get_hash_algorithm
+from ml_git.file_system.fastcopy import advise_willneed, copy_range, map_range, read_range
+from ml_git.file_system.journal import PushJournal
+from ml_git.file_system.objects_filter import ObjectsFilter
+from ml_git.file_system.pack import PackStore
+from ml_git.file_system.verification import VerifiedObjects
 from ml_git.ml_git_message import output_messages
-from ml_git.utils import json_load, ensure_path_exists, get_root_path, set_write_read
+from ml_git.pool import WorkerPool
+from ml_git.utils import json_load, ensure_path_exists, set_write_read
 
 '''implementation of a "hashdir" based filesystem
 Lack a few desirable properties of MultihashFS.
@@ -40,6 +60,7 @@ class HashFS(object):
         ensure_path_exists(self._path)
         self._logpath = os.path.join(self._path, 'log')
         ensure_path_exists(self._logpath)
+        self._journal = PushJournal(os.path.join(self._logpath, PUSH_JOURNAL), legacy_log_path=os.path.join(self._logpath, STORAGE_LOG))
 
     def _hash_filename(self, filename):
         m = hashlib.md5()
@@ -92,9 +113,7 @@ class HashFS(object):
         dstfile = self._get_hashpath(os.path.basename(srcfile))
         ensure_path_exists(os.path.dirname(dstfile))
         os.link(srcfile, dstfile)
-        fullpath = os.path.join(self._logpath, STORAGE_LOG)
-        with open(fullpath, 'a') as log_file:
-            self._log(dstfile, log_file=log_file)
+        self._log(dstfile)
         return os.path.basename(srcfile)
 
     def get(self, file, dstfile):
@@ -105,47 +124,35 @@ class HashFS(object):
 
     def reset_log(self):
         log.debug(output_messages['DEBUG_UPDATE_LOG'], class_name=HASH_FS_CLASS_NAME)
-        fullpath = os.path.join(self._logpath, STORAGE_LOG)
-        if os.path.exists(fullpath) is False:
-            return None
-        os.unlink(fullpath)
+        self._journal.drop()
 
     def update_log(self, files_to_keep):
         log.debug(output_messages['DEBUG_UPDATE_LOG_LIST_FILES'], class_name=HASH_FS_CLASS_NAME)
-        fullpath = os.path.join(self._logpath, STORAGE_LOG)
-        if not os.path.exists(fullpath):
-            return None
-        with open(fullpath, 'w') as log_file:
-            for file in files_to_keep:
-                log_file.write("%s\n" % file)
-
-    def _log(self, objkey, links=[], log_file=None):
+        self._journal.replace(files_to_keep)
+
+    def _log(self, objkey, links=[]):
         log.debug(output_messages['DEBUG_UPDATE_LOG_KEY'] % objkey, class_name=HASH_FS_CLASS_NAME)
-        log_file.write("%s\n" % (objkey))
-        for link in links:
-            h = link['Hash']
-            log_file.write("%s\n" % (h))
+        self._journal.append([objkey] + [link['Hash'] for link in links])
 
     def get_log(self):
         log.debug(output_messages['DEBUG_LOADING_LOG'], class_name=HASH_FS_CLASS_NAME)
-        logs = []
-        try:
-            root_path = get_root_path()
-            log_path = os.path.join(root_path, self._logpath, STORAGE_LOG)
-        except Exception as e:
-            log.error(e, class_name=LOCAL_REPOSITORY_CLASS_NAME)
-            raise e
+        return list(self._journal.pending())
 
-        if os.path.exists(log_path) is not True:
-            return logs
+    def iter_log(self):
+        """Streams the keys waiting to be pushed, without loading the whole journal."""
+        return self._journal.pending()
 
-        with open(log_path, 'r') as f:
-            while True:
-                line = f.readline().strip()
-                if not line:
-                    break
-                logs.append(line)
-        return logs
+    def count_log(self):
+        return self._journal.count_pending()
+
+    def mark_pushed(self, key):
+        self._journal.mark_pushed(key)
+
+    def unmark_pushed(self, keys):
+        self._journal.unmark_pushed(keys)
+
+    def close_log(self):
+        self._journal.close()
 
     def get_keypath(self, key):
         return self._get_hashpath(key)
@@ -154,7 +161,9 @@ class HashFS(object):
         """walk implementation to make appear hashfs as a single namespace (and/or hide hashdir implementation details"""
         nfiles = []
         for root, dirs, files in os.walk(self._path):
-            if STORAGE_LOG in files:
+            if root == self._path and PACKS_PATH in dirs:
+                dirs.remove(PACKS_PATH)
+            if root == self._logpath:
                 continue
             if len(files) > 0:
                 nfiles.extend(files)
@@ -170,15 +179,7 @@ class HashFS(object):
         return None
 
     def remove_hash(self, hash_to_remove):
-        fullpath = os.path.join(self._logpath, STORAGE_LOG)
-        if not os.path.exists(fullpath):
-            return None
-        with open(fullpath, 'r') as f:
-            lines = f.readlines()
-        with open(fullpath, 'w') as f:
-            for line in lines:
-                if line.strip('\n') != hash_to_remove:
-                    f.write(line)
+        self._journal.remove([hash_to_remove])
 
 
 '''Implementation of a content-addressable filesystem
@@ -191,13 +192,32 @@ This filesystem guarantees by design:
 
 
 class MultihashFS(HashFS):
-    def __init__(self, path, blocksize=256 * 1024, levels=2):
+    def __init__(self, path, blocksize=256 * 1024, levels=2, hash_threads=1, chunker=None, inline_max_size=0, compression=None,
+                 hash_algorithm=DEFAULT_HASH_ALGORITHM, verification_policy=VerificationPolicy.ALWAYS.value,
+                 verification_sample_rate=VERIFICATION_SAMPLE_RATE_VALUE):
+        is_new_store = not os.path.exists(os.path.join(path, 'hashfs'))
         super(MultihashFS, self).__init__(path, blocksize, levels)
         self._levels = levels
         if levels < 1:
             self._levels = 1
         if levels > 22:
             self.levels = 22
+        self._hash_threads = hash_threads if hash_threads > 1 else 1
+        self._chunker = chunker
+        self._inline_max_size = inline_max_size
+        self._codec = get_codec(compression)
+        self._hash_algorithm = get_hash_algorithm(hash_algorithm)
+        self._packs = PackStore(os.path.join(self._path, PACKS_PATH))
+        self._descriptors = descriptor_cache
+        self._verification_policy = verification_policy
+        self._verification_sample_rate = verification_sample_rate
+        self._verified_objects = VerifiedObjects(os.path.join(self._logpath, VERIFIED_OBJECTS_DB))
+        self._background_verification = None
+        self._background_verification_lock = threading.Lock()
+        self._objects_filter = ObjectsFilter(os.path.join(self._logpath, OBJECTS_FILTER_DB), os.path.join(self._logpath, OBJECTS_FILTER_FILE))
+        if is_new_store:
+            # nothing was stored yet, so the filter can be trusted from the start
+            self._objects_filter.rebuild([])
 
     def _get_hashpath(self, filename, path=None):
         hpath = self._path
@@ -207,65 +227,131 @@ class MultihashFS(HashFS):
         h = self._get_hash(filename, start=5)  # TODO create constant
         return os.path.join(hpath, h, filename)
 
-    def _store_chunk(self, filename, data):
+    def _store_chunk(self, filename, data, compress=False):
         fullpath = self._get_hashpath(filename)
         ensure_path_exists(os.path.dirname(fullpath))
 
-        if os.path.isfile(fullpath) is True:
+        if os.path.isfile(fullpath) is True or self._packs.contains(filename):
             log.debug(output_messages['DEBUG_CHUNK_ALREADY_EXISTS'] % (filename, len(data)), class_name=HASH_FS_CLASS_NAME)
             return False
 
         if data is not None:
+            if compress and self._codec is not None:
+                data = encode_chunk(self._codec, data)
             log.debug(output_messages['DEBUG_ADDING_CHUNK'] % (filename, len(data)), class_name=HASH_FS_CLASS_NAME)
             with open(fullpath, 'wb') as f:
                 f.write(data)
+            self._objects_filter.add(filename)
             return True
 
     def _check_integrity(self, cid, data):
-        cid0 = self._digest(data)
+        cid0 = self._digest(data, cid)
+        if cid != cid0 and is_encoded(data):
+            try:
+                cid0 = self._digest(decode_chunk(data), cid)
+            except Exception as e:
+                log.debug(str(e), class_name=HASH_FS_CLASS_NAME)
         if cid == cid0:
             log.debug(output_messages['DEBUG_CHECKSUM_VERIFIED'] % cid, class_name=HASH_FS_CLASS_NAME)
             return True
         log.debug(output_messages['DEBUG_CORRUPTION_DETECTED'] % (cid, cid0), class_name=HASH_FS_CLASS_NAME)
         return False
 
-    def _digest(self, data):
-        m = hashlib.sha256()
-        m.update(data)
-        h = m.hexdigest()
-        mh = multihash.encode(bytes.fromhex(h), 'sha2-256')
-        cid = CIDv1('dag-pb', mh)
-        return str(cid)
+    def _digest(self, data, cid=None):
+        """Returns the CID of data, hashed with the algorithm recorded in cid or, for new objects, with the algorithm of the entity."""
+        algorithm = self._hash_algorithm if cid is None else algorithm_of(cid)
+        return algorithm.digest(data)
 
-    def put(self, srcfile):
-        links = []
-        with open(srcfile, 'rb') as f:
-            while True:
-                d = f.read(self._blk_size)
-                if not d:
-                    break
-                scid = self._digest(d)
-                self._store_chunk(scid, d)
-                links.append({'Hash': scid, 'Size': len(d)})
-
-        ls = json.dumps({'Links': links})
+    def put(self, srcfile, size=None):
+        """Stores srcfile and returns its key. size, when known, saves a stat of srcfile."""
+        ls = json.dumps(self._build_descriptor(srcfile, store=True, size=size))
         scid = self._digest(ls.encode())
         self._store_chunk(scid, ls.encode())
         return scid
 
-    def get_scid(self, srcfile):
+    def get_scid(self, srcfile, cid=None, store=False, size=None):
+        """Returns the key of srcfile. When srcfile is compared with an existing object cid, it is first hashed with
+        the algorithm of cid, so an unchanged file still matches it after the entity switched to another algorithm.
+        With store, the file is stored as it is hashed with the algorithm of the entity, which saves a second read
+        of the files that are then added."""
+        if cid is not None and algorithm_of(cid) is not self._hash_algorithm:
+            scid = self._descriptor_cid(srcfile, algorithm_of(cid), size)
+            if scid == cid:
+                return scid
+        if store:
+            return self.put(srcfile, size)
+        return self._descriptor_cid(srcfile, self._hash_algorithm, size)
+
+    def _descriptor_cid(self, srcfile, algorithm, size=None):
+        ls = json.dumps(self._build_descriptor(srcfile, store=False, algorithm=algorithm, size=size))
+        return algorithm.digest(ls.encode())
+
+    def _build_descriptor(self, srcfile, store=True, algorithm=None, size=None):
+        """Files up to inline_max_size bytes are embedded in their descriptor instead of being stored as a chunk."""
+        size = os.path.getsize(srcfile) if size is None else size
+        if self._inline_max_size > 0 and size <= self._inline_max_size:
+            with open(srcfile, 'rb') as f:
+                data = f.read()
+            log.debug(output_messages['DEBUG_INLINE_FILE'] % (srcfile, len(data)), class_name=HASH_FS_CLASS_NAME)
+            return {'Links': [], INLINE_DATA_KEY: base64.b64encode(data).decode()}
+        descriptor = {'Links': self._hash_chunks(srcfile, store, algorithm or self._hash_algorithm, size)}
+        if self._codec is not None:
+            descriptor[CODEC_KEY] = self._codec.name
+        return descriptor
+
+    def _hash_chunks(self, srcfile, store, algorithm, file_size=None):
+        if self._chunker is not None:
+            return self._hash_content_defined_chunks(srcfile, store, algorithm)
+        file_size = os.path.getsize(srcfile) if file_size is None else file_size
+        nblocks = -(-file_size // self._blk_size)
+        if self._hash_threads > 1 and nblocks >= PARALLEL_HASHING_MIN_BLOCKS:
+            return self._hash_chunks_parallel(srcfile, nblocks, store, algorithm)
+        return self._hash_block_range(srcfile, 0, nblocks, store, algorithm)
+
+    def _hash_block_range(self, srcfile, first_block, nblocks, store, algorithm):
         links = []
         with open(srcfile, 'rb') as f:
-            while True:
+            f.seek(first_block * self._blk_size)
+            for _ in range(nblocks):
                 d = f.read(self._blk_size)
                 if not d:
                     break
-                scid = self._digest(d)
+                scid = algorithm.digest(d)
+                if store:
+                    self._store_chunk(scid, d, compress=True)
                 links.append({'Hash': scid, 'Size': len(d)})
+        return links
 
-        ls = json.dumps({'Links': links})
-        scid = self._digest(ls.encode())
-        return scid
+    def _hash_content_defined_chunks(self, srcfile, store, algorithm):
+        log.debug(output_messages['DEBUG_CONTENT_DEFINED_CHUNKING'] % (srcfile, self._chunker.avg_size), class_name=HASH_FS_CLASS_NAME)
+        links = []
+        with open(srcfile, 'rb') as f:
+            for d in self._chunker.chunks(f):
+                scid = algorithm.digest(d)
+                if store:
+                    self._store_chunk(scid, d, compress=True)
+                links.append({'Hash': scid, 'Size': len(d)})
+        return links
+
+    def _hash_chunks_parallel(self, srcfile, nblocks, store, algorithm):
+        """Hash (and store) ranges of blocks of srcfile concurrently.
+
+        hashlib releases the GIL while digesting, so the block ranges are spread over a thread pool
+        and the resulting links are concatenated in file order. The descriptor is therefore identical
+        to the one built by the sequential path.
+        """
+        step = PARALLEL_HASHING_BLOCKS_PER_TASK
+        log.debug(output_messages['DEBUG_PARALLEL_HASHING'] % (srcfile, nblocks, self._hash_threads), class_name=HASH_FS_CLASS_NAME)
+        wp = WorkerPool(nworkers=min(self._hash_threads, -(-nblocks // step)))
+        for first_block in range(0, nblocks, step):
+            wp.submit(self._hash_block_range, srcfile, first_block, min(step, nblocks - first_block), store, algorithm)
+        links = []
+        try:
+            for future in wp.wait():
+                links.extend(future.result())
+        finally:
+            wp.shutdown()
+        return links
 
     def _copy(self, objectkey, dstfile):
         corruption_found = False
@@ -287,22 +373,30 @@ class MultihashFS(HashFS):
 
     def get(self, object_key, dst_file_path):
         size = 0
-        descriptor = json_load(self._get_hashpath(object_key))
-        json_objects = json.dumps(descriptor).encode()
-        is_corrupted = not self._check_integrity(object_key, json_objects)
-        if is_corrupted:
+        descriptor, is_valid = self._load_descriptor(object_key)
+        if not is_valid:
             return size
+        if INLINE_DATA_KEY in descriptor:
+            data = base64.b64decode(descriptor[INLINE_DATA_KEY])
+            with open(dst_file_path, 'wb') as dst_file:
+                dst_file.write(data)
+            return len(data)
         successfully_wrote = True
         # concat all chunks to dstfile
         try:
             with open(dst_file_path, 'wb') as dst_file:
-                for chunk in descriptor['Links']:
+                locations = [self._locate_object(chunk['Hash']) for chunk in descriptor['Links']]
+                for location in locations[:GET_READAHEAD_CHUNKS]:
+                    self._read_ahead(location)
+                for i, chunk in enumerate(descriptor['Links']):
                     chunk_hash = chunk['Hash']
                     blob_size = chunk['Size']
                     log.debug(output_messages['DEBUG_GET_CHUNK'] % (chunk_hash, blob_size), class_name=HASH_FS_CLASS_NAME)
                     size += int(blob_size)
+                    if i + GET_READAHEAD_CHUNKS < len(locations):
+                        self._read_ahead(locations[i + GET_READAHEAD_CHUNKS])
 
-                    successfully_wrote = self._write_chunk_in_file(chunk_hash, dst_file)
+                    successfully_wrote = self._write_chunk_in_file(chunk_hash, dst_file, locations[i])
                     if not successfully_wrote:
                         break
         except Exception as e:
@@ -315,34 +409,218 @@ class MultihashFS(HashFS):
             os.unlink(dst_file_path)
         return size
 
-    def _write_chunk_in_file(self, chunk_hash, dst_file):
-        with open(self._get_hashpath(chunk_hash), 'rb') as chunk_file:
-            while True:
-                chunk_bytes = chunk_file.read(self._blk_size)
-                if not chunk_bytes:
-                    break
-                if self._check_integrity(chunk_hash, chunk_bytes) is False:
+    def _write_chunk_in_file(self, chunk_hash, dst_file, location=None):
+        """Verifies the chunk (according to the verification policy) over a memory map of its file
+        and splices it into dst_file without copying it through Python."""
+        location = location or self._locate_object(chunk_hash)
+        path, offset, chunk_size = location
+        with open(path, 'rb') as chunk_file:
+            stat = os.fstat(chunk_file.fileno())
+            if is_encoded(read_range(chunk_file.fileno(), offset, CHUNK_HEADER.size)):
+                return self._write_compressed_chunk(chunk_hash, chunk_file.fileno(), dst_file, location, stat)
+            if self._must_verify(chunk_hash, stat):
+                if self._verification_policy == VerificationPolicy.BACKGROUND.value:
+                    self._submit_background_verification(chunk_hash, location, dst_file.name)
+                elif not self._verify_object(chunk_hash, chunk_file.fileno(), offset, chunk_size, stat):
                     return False
-                dst_file.write(chunk_bytes)
+            dst_file.flush()
+            copy_range(chunk_file.fileno(), dst_file.fileno(), offset, chunk_size)
         return True
 
+    def _write_compressed_chunk(self, chunk_hash, fd, dst_file, location, stat):
+        """Compressed chunks can not be spliced, they are read, decompressed and verified in memory."""
+        _, offset, chunk_size = location
+        data = read_range(fd, offset, chunk_size)
+        try:
+            content = decode_chunk(data)
+        except Exception as e:
+            log.debug(str(e), class_name=HASH_FS_CLASS_NAME)
+            content = data
+        if self._must_verify(chunk_hash, stat):
+            ncid = self._digest(content, chunk_hash)
+            if ncid != chunk_hash and content is not data and self._digest(data, chunk_hash) == chunk_hash:
+                # an uncompressed chunk that just starts like a compressed one
+                content, ncid = data, chunk_hash
+            if ncid != chunk_hash:
+                log.debug(output_messages['DEBUG_CORRUPTION_DETECTED'] % (chunk_hash, ncid), class_name=HASH_FS_CLASS_NAME)
+                return False
+            if self._verification_policy != VerificationPolicy.ALWAYS.value:
+                self._verified_objects.mark(chunk_hash, stat)
+        dst_file.write(content)
+        return True
+
+    def _must_verify(self, key, stat):
+        policy = self._verification_policy
+        if policy == VerificationPolicy.ALWAYS.value:
+            return True
+        if policy == VerificationPolicy.SAMPLED.value and random.random() < self._verification_sample_rate:
+            return True
+        return not self._verified_objects.is_verified(key, stat)
+
+    def _verify_object(self, key, fd, offset, size, stat):
+        with map_range(fd, offset, size) as object_view:
+            is_valid = self._check_integrity(key, object_view)
+        if is_valid and self._verification_policy != VerificationPolicy.ALWAYS.value:
+            self._verified_objects.mark(key, stat)
+        return is_valid
+
+    def _verify_object_location(self, key, location, dst_file_path):
+        path, offset, size = location
+        with open(path, 'rb') as object_file:
+            return key, dst_file_path, self._verify_object(key, object_file.fileno(), offset, size, os.fstat(object_file.fileno()))
+
+    def _submit_background_verification(self, key, location, dst_file_path):
+        with self._background_verification_lock:
+            if self._background_verification is None:
+                self._background_verification = WorkerPool(nworkers=os.cpu_count())
+            self._background_verification.submit(self._verify_object_location, key, location, dst_file_path)
+
+    def mark_verified(self, key):
+        """Records that the object was verified by other means (e.g. by the storage while downloading it)."""
+        if self._verification_policy != VerificationPolicy.ALWAYS.value:
+            self._verified_objects.mark(key, os.stat(self._get_hashpath(key)))
+
+    def finish_verification(self):
+        """Waits for the background verifications and persists the verified objects.
+        Files rebuilt from corrupted objects are removed and the keys of those objects are returned."""
+        corrupted_objects = []
+        with self._background_verification_lock:
+            background_verification, self._background_verification = self._background_verification, None
+        if background_verification is not None:
+            for future in background_verification.wait():
+                key, dst_file_path, is_valid = future.result()
+                if not is_valid:
+                    corrupted_objects.append(key)
+                    if os.path.exists(dst_file_path):
+                        set_write_read(dst_file_path)
+                        os.unlink(dst_file_path)
+            background_verification.shutdown()
+        self._verified_objects.flush()
+        return corrupted_objects
+
+    def _locate_object(self, key):
+        """Returns the (path, offset, size) of the content of key, either a loose object file or a range of a pack."""
+        keypath = self._get_hashpath(key)
+        try:
+            return keypath, 0, os.path.getsize(keypath)
+        except FileNotFoundError as e:
+            location = self._packs.locate(key)
+            if location is None:
+                raise e
+            return location
+
+    @staticmethod
+    def _read_ahead(location):
+        path, offset, size = location
+        with open(path, 'rb') as f:
+            advise_willneed(f.fileno(), offset, size)
+
     def load(self, key):
+        descriptor, _ = self._load_descriptor(key, verify=False)
+        return descriptor
+
+    def _load_descriptor(self, key, verify=True):
+        """Returns the descriptor of key and whether its content matched key, which is only checked with verify.
+        Descriptors are kept in the descriptor cache shared by the process, under the path of this store, and
+        each one is hashed at most once."""
+        cache_key = (self._path, key)
+        descriptor = self._descriptors.get(cache_key, verified=verify)
+        if descriptor is not None:
+            return descriptor, True
         srckey = self._get_hashpath(key)
-        return json_load(srckey)
+        data = None if os.path.exists(srckey) else self._packs.read(key)
+        descriptor = json.loads(data) if data is not None else json_load(srckey)
+        is_valid = not verify or self._check_integrity(key, json.dumps(descriptor).encode())
+        if is_valid:
+            self._descriptors.put(cache_key, descriptor, verified=verify)
+        return descriptor, is_valid
+
+    @contextmanager
+    def materialize(self, key):
+        """Yields the path of a file with the content of key.
+        Packed objects are extracted to a temporary file that is removed afterwards."""
+        keypath = self._get_hashpath(key)
+        data = None if os.path.exists(keypath) else self._packs.read(key)
+        if data is None:
+            yield keypath
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix=key)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            yield tmp_path
+        finally:
+            os.unlink(tmp_path)
+
+    def walk(self, page_size=50):
+        for files in super(MultihashFS, self).walk(page_size):
+            yield files
+        packed_keys = self._packs.keys()
+        for i in range(0, len(packed_keys), page_size):
+            yield packed_keys[i:i + page_size]
 
-    def fetch_scid(self, key, log_file=None):
+    def _loose_objects(self):
+        for root, dirs, files in os.walk(self._path):
+            if root == self._path:
+                dirs[:] = [d for d in dirs if d not in (PACKS_PATH, os.path.basename(self._logpath))]
+            for file in files:
+                fullpath = os.path.join(root, file)
+                if self._get_hashpath(file) == fullpath:
+                    yield file, fullpath
+
+    def repack(self, max_object_size=PACK_MAX_OBJECT_SIZE):
+        """Moves the loose objects up to max_object_size bytes into packfiles.
+        Returns the number of objects packed."""
+        log.info(output_messages['INFO_STARTING_REPACK'] % self._path, class_name=HASH_FS_CLASS_NAME)
+        loose_objects = {}
+        for key, fullpath in self._loose_objects():
+            if os.path.getsize(fullpath) <= max_object_size:
+                loose_objects[key] = fullpath
+        packed_keys = self._packs.write((key, partial(self._read_file, fullpath)) for key, fullpath in sorted(loose_objects.items()))
+        for key in packed_keys:
+            set_write_read(loose_objects[key])
+            os.unlink(loose_objects[key])
+        self._remove_empty_dirs()
+        log.info(output_messages['INFO_REPACK_FINISHED'] % (len(packed_keys), self._path), class_name=HASH_FS_CLASS_NAME)
+        return len(packed_keys)
+
+    @staticmethod
+    def _read_file(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _remove_empty_dirs(self):
+        kept_dirs = (self._path, self._logpath, os.path.join(self._path, PACKS_PATH))
+        for root, dirs, files in os.walk(self._path, topdown=False):
+            if root not in kept_dirs and not os.listdir(root):
+                os.rmdir(root)
+
+    def fetch_scid(self, key):
         log.debug(output_messages['DEBUG_BUILDING_STORAGE_LOG'], class_name=HASH_FS_CLASS_NAME)
         if self._exists(key):
             links = self.load(key)
-            self._log(key, links['Links'], log_file)
+            self._log(key, links['Links'])
         else:
             log.debug(output_messages['DEBUG_BLOB_ALREADY_COMMITED'] % key, class_name=HASH_FS_CLASS_NAME)
 
     '''test existence of CIDv1 key in hash dir implementation'''
 
     def _exists(self, key):
+        if not self._objects_filter.might_contain(key):
+            return False
         keypath = self._get_hashpath(key)
-        return os.path.exists(keypath)
+        return os.path.exists(keypath) or self._packs.contains(key)
+
+    def record_object(self, key):
+        """Adds key to the objects filter, after its object was written to the store by other means (e.g. downloaded)."""
+        self._descriptors.discard((self._path, key))
+        self._objects_filter.add(key)
+
+    def rebuild_objects_filter(self):
+        """Rebuilds the objects filter from the objects found in the store."""
+        keys = [key for key, _ in self._loose_objects()]
+        keys.extend(self._packs.keys())
+        self._objects_filter.rebuild(keys)
 
     '''test existence of filename in system always returns False.
     no easy way to test if a file exists based on its name only because it's a CAS.'''
@@ -352,12 +630,24 @@ class MultihashFS(HashFS):
 
     '''Checks integrity of all files under .ml-git/.../hashfs/'''
 
-    def fsck(self, exclude=['log', 'metadata'], remove_corrupted=False):
+    def fsck(self, exclude=['log', 'metadata'], remove_corrupted=False, workers=1, incremental=False):
+        """Verifies the objects and returns the corrupted ones.
+        In incremental mode, objects whose file is unchanged since they were last verified are not hashed again."""
         log.info(output_messages['INFO_STARTING_INTEGRITY_CHECK'].format(self._path), class_name=HASH_FS_CLASS_NAME)
         corrupted_files = []
         corrupted_files_fullpaths = []
-        self._check_files_integrity(corrupted_files, corrupted_files_fullpaths)
+        self._check_files_integrity(corrupted_files, corrupted_files_fullpaths, workers, incremental)
+        corrupted_packed_files = self._check_packed_files_integrity(incremental)
         self._remove_corrupted_files(corrupted_files_fullpaths, remove_corrupted)
+        if remove_corrupted and len(corrupted_packed_files) > 0:
+            self._packs.rewrite(lambda key: key not in corrupted_packed_files)
+        corrupted_files.extend(corrupted_packed_files)
+        if len(corrupted_files) > 0:
+            self._verified_objects.discard(corrupted_files)
+            for key in corrupted_files:
+                self._descriptors.discard((self._path, key))
+        self._verified_objects.flush()
+        self.rebuild_objects_filter()
         log.info(output_messages['INFO_FINISH_INTEGRITY_CHECK'].format(self._path), class_name=HASH_FS_CLASS_NAME)
         return corrupted_files
 
@@ -368,44 +658,170 @@ class MultihashFS(HashFS):
                                        unit_scale=True, mininterval=1.0)
             for cor_file_fullpath in corrupted_files_fullpaths:
                 log.debug(output_messages['DEBUG_REMOVING_FILE'] % cor_file_fullpath, class_name=HASH_FS_CLASS_NAME)
-                os.unlink(cor_file_fullpath)
+                if os.path.exists(cor_file_fullpath):
+                    os.unlink(cor_file_fullpath)
                 self.__progress_bar.update(1)
             self.__progress_bar.close()
 
-    def _check_files_integrity(self, corrupted_files, corrupted_files_fullpaths):
-        self.__progress_bar = tqdm(total=len(os.listdir(self._path)) - 1, desc='directories', unit='directories',
-                                   unit_scale=True, mininterval=1.0)
-        last_path = ''
-        for root, dirs, files in os.walk(self._path):
-            if 'log' in root:
-                continue
+    def _fsck_shards(self):
+        ignored_dirs = (PACKS_PATH, os.path.basename(self._logpath))
+        return sorted(d for d in os.listdir(self._path) if d not in ignored_dirs and os.path.isdir(os.path.join(self._path, d)))
+
+    def _load_fsck_checkpoint(self, shards):
+        checkpoint_path = os.path.join(self._logpath, FSCK_CHECKPOINT)
+        if not os.path.exists(checkpoint_path):
+            return {'shards': [], 'corrupted': [], 'bytes': 0, 'files': 0, 'skipped': 0}
+        checkpoint = json_load(checkpoint_path)
+        log.info(output_messages['INFO_RESUMING_INTEGRITY_CHECK'] % (self._path, len(checkpoint['shards']), len(shards)),
+                 class_name=HASH_FS_CLASS_NAME)
+        return checkpoint
+
+    def _save_fsck_checkpoint(self, checkpoint):
+        checkpoint_path = os.path.join(self._logpath, FSCK_CHECKPOINT)
+        tmp_checkpoint_path = checkpoint_path + '.tmp'
+        with open(tmp_checkpoint_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_checkpoint_path, checkpoint_path)
+
+    def _check_files_integrity(self, corrupted_files, corrupted_files_fullpaths, workers=1, incremental=False):
+        """Hashes every loose object, one top-level directory (shard) at a time.
+        Shards are spread across processes when workers > 1, and the shards already checked are saved
+        periodically to a checkpoint so an interrupted check resumes where it stopped."""
+        # worker processes read the verification records from the database
+        self._verified_objects.flush()
+        shards = self._fsck_shards()
+        checkpoint = self._load_fsck_checkpoint(shards)
+        checked_shards = set(checkpoint['shards'])
+        pending_shards = [shard for shard in shards if shard not in checked_shards]
+        self.__progress_bar = tqdm(total=len(shards), initial=len(shards) - len(pending_shards), desc='directories',
+                                   unit='directories', unit_scale=True, mininterval=1.0)
+        checked_bytes, checked_files, skipped_files = 0, 0, 0
+        start_time = time.monotonic()
+        last_checkpoint_time = start_time
+        completed = False
+        try:
+            for shard, shard_corrupted_files, shard_bytes, shard_files, shard_skipped in self._run_shards(pending_shards, workers, incremental):
+                checkpoint['shards'].append(shard)
+                checkpoint['corrupted'].extend(shard_corrupted_files)
+                checkpoint['bytes'] += shard_bytes
+                checkpoint['files'] += shard_files
+                checkpoint['skipped'] = checkpoint.get('skipped', 0) + shard_skipped
+                checked_bytes += shard_bytes
+                checked_files += shard_files
+                skipped_files += shard_skipped
+                elapsed = time.monotonic() - start_time
+                self.__progress_bar.set_postfix_str('%s/s' % humanize.naturalsize(checked_bytes / elapsed if elapsed else 0))
+                self.__progress_bar.update(1)
+                if time.monotonic() - last_checkpoint_time >= FSCK_CHECKPOINT_INTERVAL:
+                    self._save_fsck_checkpoint(checkpoint)
+                    last_checkpoint_time = time.monotonic()
+            completed = True
+        finally:
+            self.__progress_bar.close()
+            if completed:
+                checkpoint_path = os.path.join(self._logpath, FSCK_CHECKPOINT)
+                if os.path.exists(checkpoint_path):
+                    os.unlink(checkpoint_path)
+            else:
+                self._save_fsck_checkpoint(checkpoint)
+        elapsed = max(time.monotonic() - start_time, 1e-6)
+        throughput = humanize.naturalsize(checked_bytes / elapsed)
+        log.info(output_messages['INFO_INTEGRITY_CHECK_THROUGHPUT'] % (humanize.naturalsize(checked_bytes), checked_files, elapsed, throughput),
+                 class_name=HASH_FS_CLASS_NAME)
+        if skipped_files > 0:
+            log.info(output_messages['INFO_SKIPPED_VERIFIED_OBJECTS'] % skipped_files, class_name=HASH_FS_CLASS_NAME)
+        for file, fullpath in checkpoint['corrupted']:
+            corrupted_files.append(file)
+            corrupted_files_fullpaths.append(fullpath)
+
+    def _run_shards(self, shards, workers, incremental=False):
+        if workers <= 1 or len(shards) <= 1:
+            for shard in shards:
+                yield (shard,) + self._check_shard_integrity(shard, incremental)
+            return
+        # the workers are spawned: a forked child would share the open SQLite connections and the threads of this process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_fsck_process,
+                                 initargs=(os.path.dirname(self._path), self._blk_size, self._levels)) as executor:
+            futures = {executor.submit(_check_shard_integrity, shard, incremental): shard for shard in shards}
+            try:
+                for future in as_completed(futures):
+                    yield (futures[future],) + future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _check_shard_integrity(self, shard, incremental=False):
+        corrupted_files = []
+        corrupted_files_fullpaths = []
+        checked_bytes, checked_files, skipped_files = 0, 0, 0
+        for root, dirs, files in os.walk(os.path.join(self._path, shard)):
             for file in files:
                 fullpath = os.path.join(root, file)
+                stat = os.stat(fullpath)
+                if incremental and self._verified_objects.is_verified(file, stat):
+                    if not self._is_valid_hashpath(root, file):
+                        corrupted_files.append(file)
+                        corrupted_files_fullpaths.append(fullpath)
+                    skipped_files += 1
+                    continue
+                corrupted_count = len(corrupted_files)
+                algorithm = algorithm_of(file)
                 with open(fullpath, 'rb') as c:
-                    m = hashlib.sha256()
+                    m = algorithm.new()
                     while True:
                         d = c.read(self._blk_size)
                         if not d:
                             break
                         m.update(d)
-                    self._verify_chunk_integrity(corrupted_files, corrupted_files_fullpaths, file, fullpath, m, root)
-                if root[:-2] != last_path:
-                    last_path = root[:-2]
-                    self.__progress_bar.update(1)
-        self.__progress_bar.close()
-
-    def _verify_chunk_integrity(self, corrupted_files, corrupted_files_fullpaths, file, fullpath, m, root):
-        chuck_hex = m.hexdigest()
-        multi_hash = multihash.encode(bytes.fromhex(chuck_hex), 'sha2-256')
-        cid = CIDv1('dag-pb', multi_hash)
-        ncid = str(cid)
+                        checked_bytes += len(d)
+                    ncid = algorithm.cid(m)
+                    if ncid != file:
+                        ncid = self._decoded_file_cid(fullpath, algorithm, ncid)
+                    self._verify_chunk_integrity(corrupted_files, corrupted_files_fullpaths, file, fullpath, ncid, root)
+                if len(corrupted_files) == corrupted_count:
+                    self._verified_objects.mark(file, stat)
+                checked_files += 1
+        self._verified_objects.flush()
+        return list(zip(corrupted_files, corrupted_files_fullpaths)), checked_bytes, checked_files, skipped_files
+
+    def _check_packed_files_integrity(self, incremental=False):
+        corrupted_files = []
+        pack_stats = {}
+        for key, pack_path, offset, size in self._packs.entries():
+            if pack_path not in pack_stats:
+                pack_stats[pack_path] = os.stat(pack_path)
+            if incremental and self._verified_objects.is_verified(key, pack_stats[pack_path]):
+                continue
+            with open(pack_path, 'rb') as pack_file:
+                pack_file.seek(offset)
+                data = pack_file.read(size)
+            if not self._check_integrity(key, data):
+                corrupted_files.append(key)
+            else:
+                self._verified_objects.mark(key, pack_stats[pack_path])
+        return corrupted_files
+
+    @staticmethod
+    def _decoded_file_cid(fullpath, algorithm, ncid):
+        """Returns the CID of the uncompressed content of a compressed chunk, or ncid for any other file."""
+        with open(fullpath, 'rb') as f:
+            if not is_encoded(f.read(CHUNK_HEADER.size)):
+                return ncid
+            f.seek(0)
+            try:
+                return algorithm.digest(decode_chunk(f.read()))
+            except Exception as e:
+                log.debug(str(e), class_name=HASH_FS_CLASS_NAME)
+                return ncid
+
+    def _verify_chunk_integrity(self, corrupted_files, corrupted_files_fullpaths, file, fullpath, ncid, root):
         if ncid != file:
             log.debug(output_messages['DEBUG_CORRUPTION_DETECTED'] % (file, ncid),
                       class_name=HASH_FS_CLASS_NAME)
             corrupted_files.append(file)
             corrupted_files_fullpaths.append(fullpath)
         else:
-            log.debug(output_messages['DEBUG_CHECKSUM_VERIFIED'] % cid, class_name=HASH_FS_CLASS_NAME)
+            log.debug(output_messages['DEBUG_CHECKSUM_VERIFIED'] % ncid, class_name=HASH_FS_CLASS_NAME)
             if not self._is_valid_hashpath(root, file):
                 corrupted_files.append(file)
                 corrupted_files_fullpaths.append(fullpath)
@@ -422,3 +838,17 @@ class MultihashFS(HashFS):
                       class_name=HASH_FS_CLASS_NAME)
 
         return is_valid
+
+
+_process_hfs = None
+
+
+def _init_fsck_process(path, blocksize, levels):
+    global _process_hfs
+    log.init_logger()
+    _process_hfs = MultihashFS(path, blocksize, levels)
+
+
+def _check_shard_integrity(shard, incremental):
+    """Entry point of the fsck worker processes."""
+    return _process_hfs._check_shard_integrity(shard, incremental)
@@ -3,60 +3,166 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import multiprocessing
 import os
+import queue
 import shutil
+import stat
+import threading
 import time
-from builtins import FileNotFoundError
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 
 from ml_git import log
-from ml_git.constants import MULTI_HASH_CLASS_NAME, MutabilityType, SPEC_EXTENSION, INDEX_FILE, MLGIT_IGNORE_FILE_NAME
+from ml_git.constants import MULTI_HASH_CLASS_NAME, MutabilityType, SPEC_EXTENSION, MLGIT_IGNORE_FILE_NAME, \
+    DEFAULT_HASH_ALGORITHM, ADD_QUEUE_SIZE, ADD_PENDING_PER_WORKER, ADD_SAVE_INTERVAL, ADD_PROCESS_BATCH_SIZE
 from ml_git.file_system.cache import Cache
 from ml_git.file_system.hashfs import MultihashFS
-from ml_git.manifest import Manifest
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
 from ml_git.ml_git_message import output_messages
 from ml_git.pool import pool_factory
-from ml_git.utils import ensure_path_exists, yaml_load, posix_path, set_read_only, get_file_size, \
-    run_function_per_group, get_ignore_rules, should_ignore_file
+from ml_git.utils import ensure_path_exists, posix_path, set_read_only, \
+    get_ignore_rules, should_ignore_file
+
+# marks the end of the files found by the scanner of _add_dir
+_SCAN_END = object()
 
 
 class MultihashIndex(object):
 
-    def __init__(self, spec, index_path, object_path, mutability=MutabilityType.STRICT.value, cache_path=None):
+    def __init__(self, spec, index_path, object_path, mutability=MutabilityType.STRICT.value, cache_path=None, hash_threads=1,
+                 chunker=None, inline_max_size=0, compression=None, hash_algorithm=DEFAULT_HASH_ALGORITHM, hash_processes=1):
         self._spec = spec
         self._path = index_path
-        self._hfs = MultihashFS(object_path)
+        self._hfs = MultihashFS(object_path, hash_threads=hash_threads, chunker=chunker, inline_max_size=inline_max_size,
+                                compression=compression, hash_algorithm=hash_algorithm)
         self._mf = self._get_index(index_path)
         self._full_idx = FullIndex(spec, index_path, mutability)
         self._cache = cache_path
+        # files of a directory are hashed in worker processes when hash_processes > 1, each of them with its own MultihashFS
+        self._hash_processes = hash_processes
+        self._object_path = object_path
+        self._hfs_options = {'chunker': chunker, 'inline_max_size': inline_max_size, 'compression': compression,
+                             'hash_algorithm': hash_algorithm}
 
     def _get_index(self, idxpath):
         metadatapath = os.path.join(idxpath, 'metadata', self._spec)
         ensure_path_exists(metadatapath)
+        return ManifestIndexStore(metadatapath)
 
-        mfpath = os.path.join(metadatapath, 'MANIFEST.yaml')
-        return Manifest(mfpath)
-
-    def _add_dir(self, dir_path, manifest_path, file_path='', ignore_rules=None):
-        self.manifestfiles = yaml_load(manifest_path)
-        f_index_file = self._full_idx.get_index()
-        all_files = []
+    @staticmethod
+    def _scan_dir(dir_path, file_path='', ignore_rules=None):
         for root, dirs, files in os.walk(os.path.join(dir_path, file_path)):
-            base_path = root[:len(dir_path) + 1:]
             relative_path = root[len(dir_path) + 1:]
             if '.' == root[0] or should_ignore_file(ignore_rules, '{}/'.format(relative_path)):
                 continue
             for file in files:
                 file_path = os.path.join(relative_path, file)
                 if ignore_rules is None or not should_ignore_file(ignore_rules, file_path):
-                    all_files.append(file_path)
-            self.wp.progress_bar_total_inc(len(all_files))
-            args = {'wp': self.wp, 'base_path': base_path, 'f_index_file': f_index_file, 'all_files': all_files, 'dir_path': dir_path}
-            result = run_function_per_group(range(len(all_files)), 10000, function=self._adding_dir_work, arguments=args)
-            if not result:
-                return False
-        self._full_idx.save_manifest_index()
-        self._mf.save()
+                    yield file_path
+
+    @staticmethod
+    def _put_scanned(scanned, item, stop):
+        while not stop.is_set():
+            try:
+                scanned.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan_to_queue(self, dir_path, file_path, ignore_rules, scanned, stop):
+        try:
+            for path in self._scan_dir(dir_path, file_path, ignore_rules):
+                if not self._put_scanned(scanned, path, stop):
+                    return
+            end = _SCAN_END
+        except Exception as e:
+            end = e
+        self._put_scanned(scanned, end, stop)
+
+    def _apply_added(self, done):
+        for future in done:
+            scid, filepath, previous_hash = future.result()
+            self.update_index(scid, filepath, previous_hash) if scid is not None else None
+        return len(done)
+
+    def _submit_to_process(self, hasher, basepath, filepath, f_index_file):
+        fullpath = os.path.join(basepath, filepath)
+        st = os.stat(fullpath)
+        check_file = f_index_file.get(posix_path(filepath))
+        if check_file is not None and not self._full_idx.needs_hashing(filepath, check_file, posix_path(filepath), st):
+            self.wp.progress()
+            return
+        previous_key = check_file['hash'] if check_file is not None else None
+        store = check_file is None or self._full_idx.accepts_change(check_file, st)
+        hasher.submit(fullpath, previous_key, st.st_size, store, (filepath, fullpath, check_file, st))
+
+    def _apply_hashed(self, results, f_index_file):
+        count = 0
+        for (filepath, fullpath, check_file, st), scid in results:
+            scid, filepath, previous_hash = self._record_hashed(f_index_file, filepath, fullpath, check_file, st, scid)
+            self.update_index(scid, filepath, previous_hash) if scid is not None else None
+            self.wp.progress()
+            count += 1
+        return count
+
+    def _add_dir(self, dir_path, manifest_path, file_path='', ignore_rules=None):
+        # the scanner thread walks the tree into a bounded queue, the workers of the pool hash the files and this
+        # thread is the only one that writes the index, so the three stages overlap with a bounded memory footprint
+        f_index_file = self._full_idx.get_index()
+        # with worker processes, this thread also reads the index for them and records their results
+        hasher = _ProcessHasher(self._hash_processes, self._object_path, self._hfs_options) if self._hash_processes > 1 else None
+        scanned = queue.Queue(maxsize=ADD_QUEUE_SIZE)
+        stop = threading.Event()
+        scanner = threading.Thread(target=self._scan_to_queue, args=(dir_path, file_path, ignore_rules, scanned, stop), daemon=True)
+        scanner.start()
+        max_pending = self.wp.nworkers * ADD_PENDING_PER_WORKER
+        applied = 0
+        try:
+            while True:
+                path = scanned.get()
+                if path is _SCAN_END:
+                    break
+                if isinstance(path, Exception):
+                    raise path
+                if (SPEC_EXTENSION in path) or (path == 'README.md') or (path == MLGIT_IGNORE_FILE_NAME):
+                    self.add_metadata(dir_path, path)
+                    continue
+                self.wp.progress_bar_total_inc(1)
+                if hasher is None:
+                    self.wp.submit(self._add_file, dir_path, path, f_index_file)
+                    while self.wp.pending_count() >= max_pending:
+                        applied += self._apply_added(self.wp.wait_next())
+                else:
+                    self._submit_to_process(hasher, dir_path, path, f_index_file)
+                    while hasher.pending_count() >= self._hash_processes * ADD_PENDING_PER_WORKER:
+                        applied += self._apply_hashed(hasher.wait_next(), f_index_file)
+                if applied >= ADD_SAVE_INTERVAL:
+                    # the files added so far are committed to the index
+                    self._full_idx.save_manifest_index()
+                    self._mf.save()
+                    applied = 0
+            while self.wp.pending_count() > 0:
+                self._apply_added(self.wp.wait_next())
+            if hasher is not None:
+                hasher.flush()
+                while hasher.pending_count() > 0:
+                    self._apply_hashed(hasher.wait_next(), f_index_file)
+        except Exception as e:
+            log.error(output_messages['ERROR_ADDING_DIR'] % (dir_path, e), class_name=MULTI_HASH_CLASS_NAME)
+            return False
+        finally:
+            stop.set()
+            self.wp.cancel()
+            self.wp.wait()
+            self.wp.reset_futures()
+            if hasher is not None:
+                hasher.shutdown()
+            self._full_idx.save_manifest_index()
+            self._mf.save()
+        return True
 
     def add(self, path, manifestpath, files=[]):
         self.wp = pool_factory(pb_elts=0, pb_desc='files')
@@ -78,33 +184,7 @@ class MultihashIndex(object):
                 self._add_dir(path, manifestpath, ignore_rules=ignore_rules)
         self.wp.progress_bar_close()
 
-    def _adding_dir_work_future_process(self, futures, wp):
-        for future in futures:
-            scid, filepath, previous_hash = future.result()
-            self.update_index(scid, filepath, previous_hash) if scid is not None else None
-        wp.reset_futures()
-
-    def _adding_dir_work(self, files, args):
-        for k in files:
-            file_path = args['all_files'][k]
-            if (SPEC_EXTENSION in file_path) or (file_path == 'README.md') or (file_path == MLGIT_IGNORE_FILE_NAME):
-                args['wp'].progress_bar_total_inc(-1)
-                self.add_metadata(args['base_path'], file_path)
-            else:
-                args['wp'].submit(self._add_file, args['base_path'], file_path, args['f_index_file'])
-        futures = self.wp.wait()
-        try:
-            self._adding_dir_work_future_process(futures, self.wp)
-        except Exception as e:
-            self._full_idx.save_manifest_index()
-            self._mf.save()
-            log.error(output_messages['ERROR_ADDING_DIR'] % (args['dir_path'], e), class_name=MULTI_HASH_CLASS_NAME)
-            return False
-        return True
-
     def _add_single_file(self, base_path, manifestpath, file_path):
-        self.manifestfiles = yaml_load(manifestpath)
-
         f_index_file = self._full_idx.get_index()
         if (SPEC_EXTENSION in file_path) or ('README' in file_path) or (MLGIT_IGNORE_FILE_NAME in file_path):
             self.wp.progress_bar_total_inc(-1)
@@ -148,11 +228,7 @@ class MultihashIndex(object):
         self._mf.add(objectkey, posix_path(filename), previous_hash)
 
     def remove_manifest(self):
-        index_metadata_path = os.path.join(self._path, 'metadata', self._spec)
-        try:
-            os.unlink(os.path.join(index_metadata_path, 'MANIFEST.yaml'))
-        except FileNotFoundError:
-            pass
+        self._mf.remove()
 
     def _save_index(self):
         self._mf.save()
@@ -165,20 +241,27 @@ class MultihashIndex(object):
         metadatapath = os.path.join(self._path, 'metadata', self._spec)
         ensure_path_exists(metadatapath)
 
-        scid = None
+        # a single stat of the file serves the checks, the hashing and the index entry
+        st = os.stat(fullpath)
         check_file = f_index_file.get(posix_path(filepath))
+        if check_file is not None and not self._full_idx.needs_hashing(filepath, check_file, posix_path(filepath), st):
+            return None, filepath, None
+        # a modified file is stored as it is hashed, so it is read only once, unless its change is rejected
+        previous_key = check_file['hash'] if check_file is not None else None
+        store = check_file is None or self._full_idx.accepts_change(check_file, st)
+        scid = self._hfs.get_scid(fullpath, previous_key, store=store, size=st.st_size)
+        return self._record_hashed(f_index_file, filepath, fullpath, check_file, st, scid)
+
+    def _record_hashed(self, f_index_file, filepath, fullpath, check_file, st, scid):
+        if check_file is None:
+            self._full_idx.update_full_index(posix_path(filepath), fullpath, Status.a.name, scid, st=st)
+            return scid, filepath, None
+
+        scid = self._full_idx.update_hashed(check_file, posix_path(filepath), fullpath, scid, st, self._cache)
         previous_hash = None
-        if check_file is not None:
-            if self._full_idx.check_and_update(filepath, check_file, self._hfs, posix_path(filepath), fullpath, self._cache):
-                scid = self._hfs.put(fullpath)
-
-            updated_check = f_index_file.get(posix_path(filepath))
-            if 'previous_hash' in updated_check:
-                previous_hash = updated_check['previous_hash']
-        else:
-            scid = self._hfs.put(fullpath)
-            self._full_idx.update_full_index(posix_path(filepath), fullpath, Status.a.name, scid)
-
+        updated_check = f_index_file.get(posix_path(filepath))
+        if 'previous_hash' in updated_check:
+            previous_hash = updated_check['previous_hash']
         return scid, filepath, previous_hash
 
     def get(self, objectkey, path, file):
@@ -197,6 +280,9 @@ class MultihashIndex(object):
     def fsck(self, entity_path):
         return self._full_idx.fsck(entity_path, self._hfs, self._cache)
 
+    def get_scid(self, file_path, cid=None):
+        return self._hfs.get_scid(file_path, cid)
+
     def update_index_manifest(self, hash_files):
         for key in hash_files:
             values = list(hash_files[key])
@@ -221,6 +307,63 @@ class MultihashIndex(object):
         return hashes_list
 
 
+class _ProcessHasher(object):
+    """Stores files in worker processes, in batches, and returns their keys to the parent, which records them in the index."""
+
+    def __init__(self, processes, object_path, hfs_options):
+        # the workers are spawned: a forked child would share the open SQLite connections of the index
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_hash_process, initargs=(object_path, hfs_options))
+        self._batch = []
+        # future -> contexts of the files of its batch
+        self._pending = {}
+
+    def submit(self, fullpath, previous_key, size, store, context):
+        self._batch.append(((fullpath, previous_key, size, store), context))
+        if len(self._batch) >= ADD_PROCESS_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            future = self._executor.submit(_hash_files, [file for file, _ in self._batch])
+            self._pending[future] = [context for _, context in self._batch]
+            self._batch = []
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def wait_next(self):
+        """Waits for at least one batch and returns the (context, key) of its files."""
+        done, _ = futures.wait(self._pending, return_when=futures.FIRST_COMPLETED)
+        results = []
+        for future in done:
+            contexts = self._pending.pop(future)
+            results.extend(zip(contexts, future.result()))
+        return results
+
+    def shutdown(self):
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._pending = {}
+
+
+# MultihashFS of an add worker process
+_process_hfs = None
+
+
+def _init_hash_process(object_path, hfs_options):
+    global _process_hfs
+    log.init_logger()
+    _process_hfs = MultihashFS(object_path, **hfs_options)
+
+
+def _hash_files(files):
+    """Entry point of the add worker processes: hashes each (path, previous key, size, store), stores it if store is
+    set and returns their keys."""
+    return [_process_hfs.get_scid(fullpath, previous_key, store=store, size=size) for fullpath, previous_key, size, store in files]
+
+
 class FullIndex(object):
     def __init__(self, spec, index_path, mutability=MutabilityType.STRICT.value):
         self._spec = spec
@@ -231,21 +374,20 @@ class FullIndex(object):
     def _get_index(self, idxpath):
         metadatapath = os.path.join(idxpath, 'metadata', self._spec)
         ensure_path_exists(metadatapath)
-        fidxpath = os.path.join(metadatapath, INDEX_FILE)
-        return Manifest(fidxpath)
+        return FileIndexStore(metadatapath)
 
-    def update_full_index(self, filename, fullpath, status, key, previous_hash=None):
-        self._fidx.add(filename, self._full_index_format(fullpath, status, key, previous_hash))
+    def update_full_index(self, filename, fullpath, status, key, previous_hash=None, st=None):
+        self._fidx.add(filename, self._full_index_format(fullpath, status, key, previous_hash, st))
 
-    def _full_index_format(self, fullpath, status, new_key, previous_hash=None):
-        st = os.stat(fullpath)
+    def _full_index_format(self, fullpath, status, new_key, previous_hash=None, st=None):
+        st = os.stat(fullpath) if st is None else st
         obj = {'ctime': st.st_ctime, 'mtime': st.st_mtime, 'status': status, 'hash': new_key,
-               'size': get_file_size(fullpath)}
+               'size': st.st_size}
 
         if previous_hash:
             obj['previous_hash'] = previous_hash
 
-        if self._mutability != MutabilityType.MUTABLE.value and os.path.isfile(fullpath):
+        if self._mutability != MutabilityType.MUTABLE.value and stat.S_ISREG(st.st_mode):
             set_read_only(fullpath)
         return obj
 
@@ -287,33 +429,54 @@ class FullIndex(object):
     def save_manifest_index(self):
         return self._fidx.save()
 
+    def reset(self):
+        self._fidx.clear()
+
     def remove_deleted_files(self, deleted_files):
         for file in deleted_files:
             self._fidx.rm_key(file)
         self._fidx.save()
 
-    def check_and_update(self, key, value, hfs, filepath, fullpath, cache):
-        st = os.stat(fullpath)
+    def needs_hashing(self, key, value, filepath, st):
+        """Returns whether the file of the index entry value changed since it was recorded, according to st."""
         if key == filepath and value['ctime'] == st.st_ctime and value['mtime'] == st.st_mtime:
             log.debug(output_messages['DEBUG_FILE_ALREADY_EXISTS_REPOSITORY'] % filepath, class_name=MULTI_HASH_CLASS_NAME)
-            return None
+            return False
         elif key == filepath and value['ctime'] != st.st_ctime or value['mtime'] != st.st_mtime:
             log.debug(output_messages['DEBUG_FILE_WAS_MODIFIED'] % filepath, class_name=MULTI_HASH_CLASS_NAME)
-            scid = hfs.get_scid(fullpath)
-            if value['hash'] != scid:
-                scid_ret = self._update_file_status(cache, filepath, fullpath, scid, st, value)
-                return scid_ret
+            return True
+        return False
+
+    def _is_locked(self, value, st):
+        is_flexible = self._mutability == MutabilityType.FLEXIBLE.value
+        is_strict = self._mutability == MutabilityType.STRICT.value
+        not_unlocked = value['mtime'] != st.st_mtime and 'untime' not in value
+        return (is_flexible and not_unlocked) or is_strict
+
+    def accepts_change(self, value, st):
+        """Returns whether a new version of the file of the index entry value may be added, so it can be stored as it
+        is hashed. A change of a locked file is only kept if the file was already marked as corrupted."""
+        return not self._is_locked(value, st) or (value['status'] == Status.c.name and 'previous_hash' in value)
+
+    def update_hashed(self, value, filepath, fullpath, scid, st, cache):
+        """Records scid, the key of a file that needed hashing, and returns it if it is to be added to the manifest."""
+        if value['hash'] != scid:
+            return self._update_file_status(cache, filepath, fullpath, scid, st, value)
         return None
 
+    def check_and_update(self, key, value, hfs, filepath, fullpath, cache, store=False, st=None):
+        st = os.stat(fullpath) if st is None else st
+        if not self.needs_hashing(key, value, filepath, st):
+            return None
+        scid = hfs.get_scid(fullpath, value['hash'], store=store and self.accepts_change(value, st), size=st.st_size)
+        return self.update_hashed(value, filepath, fullpath, scid, st, cache)
+
     def _update_file_status(self, cache, filepath, fullpath, scid, st, value):
         status = Status.a.name
         prev_hash = value['hash']
         scid_ret = scid
-        is_flexible = self._mutability == MutabilityType.FLEXIBLE.value
-        is_strict = self._mutability == MutabilityType.STRICT.value
-        not_unlocked = value['mtime'] != st.st_mtime and 'untime' not in value
         bare_mode = os.path.exists(os.path.join(self._path, 'metadata', self._spec, 'bare'))
-        if (is_flexible and not_unlocked) or is_strict:
+        if self._is_locked(value, st):
             if value['status'] == Status.c.name and 'previous_hash' in value:
                 prev_hash = value['previous_hash']
                 if scid == prev_hash:
@@ -329,7 +492,7 @@ class FullIndex(object):
         elif bare_mode and self._mutability == MutabilityType.MUTABLE.value:
             print('\n')
             log.warn(output_messages['WARN_FILE_EXISTS_IN_REPOSITORY'] % filepath, class_name=MULTI_HASH_CLASS_NAME)
-        self.update_full_index(posix_path(filepath), fullpath, status, scid, prev_hash)
+        self.update_full_index(posix_path(filepath), fullpath, status, scid, prev_hash, st)
         return scid_ret
 
     def get_total_size(self):
@@ -350,7 +513,7 @@ class FullIndex(object):
             if os.path.exists(file_path):
                 if v['status'] == Status.c.name and 'previous_hash' in v:
                     expected_hash = v['previous_hash']
-                if hfs.get_scid(file_path) != expected_hash:
+                if hfs.get_scid(file_path, expected_hash) != expected_hash:
                     check_file = f_index.get(posix_path(k))
                     self.check_and_update(k, check_file, hfs, posix_path(k), file_path, cache)
                     corrupted_files[file_path] = {'hash': expected_hash, 'key': k}
@@ -0,0 +1,423 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import weakref
+
+from ml_git import log
+from ml_git.constants import INDEX_DB, INDEX_DB_PAGE_SIZE, INDEX_FILE, MANIFEST_FILE, MULTI_HASH_CLASS_NAME
+from ml_git.ml_git_message import output_messages
+from ml_git.utils import yaml_load
+
+'''Working index of an entity (index/metadata/<spec>), kept in an SQLite database.
+FileIndexStore holds the state of each file of the workspace (formerly INDEX.yaml) and ManifestIndexStore
+the files added since the last commit, by key (formerly the MANIFEST.yaml of the index). Both keep the
+API of Manifest, but read only the rows they are asked for and buffer changes in memory until save(),
+which writes them in a single transaction. The YAML files of older versions are imported on first use.'''
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, ctime REAL, mtime REAL, status TEXT, hash TEXT, '
+    'size INTEGER, previous_hash TEXT, untime REAL, extra TEXT)',
+    'CREATE TABLE IF NOT EXISTS manifest (key TEXT NOT NULL, file TEXT NOT NULL, PRIMARY KEY (key, file))',
+    'CREATE INDEX IF NOT EXISTS manifest_file ON manifest (file)',
+    'CREATE TABLE IF NOT EXISTS saved (name TEXT PRIMARY KEY)',
+)
+
+INDEX_FIELDS = ('ctime', 'mtime', 'status', 'hash', 'size', 'previous_hash', 'untime')
+OPTIONAL_INDEX_FIELDS = ('previous_hash', 'untime')
+_FIELD_TYPES = {'ctime': float, 'mtime': float, 'status': str, 'hash': str, 'size': int, 'previous_hash': str, 'untime': float}
+
+
+class _IndexTable(object):
+    """Base of the tables of index.db. legacy_file is the YAML file the table replaces, and is also the
+    name recorded in the saved table once the table is saved, the equivalent of that file existing."""
+
+    legacy_file = None
+
+    def __init__(self, metadata_path):
+        self._db_path = os.path.join(metadata_path, INDEX_DB)
+        self._legacy_path = os.path.join(metadata_path, self.legacy_file)
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def _get_connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
+            self._connection = sqlite3.connect(self._db_path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+            with self._connection:
+                for statement in SCHEMA:
+                    self._connection.execute(statement)
+            self._migrate_legacy_file()
+        return self._connection
+
+    def _migrate_legacy_file(self):
+        if not os.path.exists(self._legacy_path):
+            return
+        entries = yaml_load(self._legacy_path) or {}
+        with self._connection:
+            self._import(entries)
+            self._mark_saved()
+        try:
+            os.unlink(self._legacy_path)
+        except FileNotFoundError:
+            pass
+        log.debug(output_messages['DEBUG_INDEX_FILE_IMPORTED'] % (len(entries), self._legacy_path), class_name=MULTI_HASH_CLASS_NAME)
+
+    def _import(self, entries):
+        raise NotImplementedError
+
+    def _mark_saved(self):
+        self._connection.execute('INSERT OR IGNORE INTO saved (name) VALUES (?)', (self.legacy_file,))
+
+    def is_saved(self):
+        """Returns True if the table was saved and not removed since."""
+        with self._lock:
+            connection = self._get_connection()
+            return connection.execute('SELECT 1 FROM saved WHERE name = ?', (self.legacy_file,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class IndexEntry(dict):
+    """State of a file in a FileIndexStore. Changing it marks it to be written by the next save()."""
+
+    def __init__(self, store, file, values):
+        super(IndexEntry, self).__init__(values)
+        self._store = store
+        self._file = file
+
+    def __setitem__(self, key, value):
+        super(IndexEntry, self).__setitem__(key, value)
+        self._store._mark_changed(self._file, self)
+
+    def __delitem__(self, key):
+        super(IndexEntry, self).__delitem__(key)
+        self._store._mark_changed(self._file, self)
+
+    def update(self, *args, **kwargs):
+        super(IndexEntry, self).update(*args, **kwargs)
+        self._store._mark_changed(self._file, self)
+
+    def pop(self, key, *default):
+        value = super(IndexEntry, self).pop(key, *default)
+        self._store._mark_changed(self._file, self)
+        return value
+
+
+class FileIndexStore(_IndexTable):
+    """State of the files of the workspace (ctime, mtime, status, hash, size...), keyed by their path.
+
+    Behaves as the mapping returned by get_yaml() for INDEX.yaml: entries are loaded one at a time, and
+    changes to them, additions and removals are kept pending until save().
+    """
+
+    legacy_file = INDEX_FILE
+
+    def __init__(self, metadata_path):
+        super(FileIndexStore, self).__init__(metadata_path)
+        # file -> IndexEntry to write, or None to delete
+        self._changed = {}
+        # entries handed out, so that all the readers of a file share (and change) the same entry
+        self._loaded = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _row(file, values):
+        row = [file]
+        for field in INDEX_FIELDS:
+            value = values.get(field)
+            row.append(_FIELD_TYPES[field](value) if value is not None else None)
+        extra = {field: value for field, value in values.items() if field not in _FIELD_TYPES}
+        row.append(json.dumps(extra) if extra else None)
+        return row
+
+    def _entry(self, file, row):
+        values = {}
+        for field, value in zip(INDEX_FIELDS, row):
+            if value is not None or field not in OPTIONAL_INDEX_FIELDS:
+                values[field] = value
+        if row[len(INDEX_FIELDS)]:
+            values.update(json.loads(row[len(INDEX_FIELDS)]))
+        return IndexEntry(self, file, values)
+
+    def _write(self, rows):
+        self._connection.executemany('INSERT OR REPLACE INTO files (file, {}, extra) VALUES (?, {}?)'.format(
+            ', '.join(INDEX_FIELDS), '?, ' * len(INDEX_FIELDS)), rows)
+
+    def _import(self, entries):
+        self._write(self._row(str(file), values) for file, values in entries.items())
+
+    def _mark_changed(self, file, entry):
+        with self._lock:
+            self._changed[file] = entry
+
+    def _select(self, file):
+        return self._get_connection().execute('SELECT {}, extra FROM files WHERE file = ?'.format(', '.join(INDEX_FIELDS)),
+                                              (file,)).fetchone()
+
+    def get(self, file):
+        with self._lock:
+            if file in self._changed:
+                return self._changed[file]
+            entry = self._loaded.get(file)
+            if entry is None:
+                row = self._select(file)
+                if row is None:
+                    return None
+                entry = self._entry(file, row)
+                self._loaded[file] = entry
+            return entry
+
+    def __getitem__(self, file):
+        entry = self.get(file)
+        if entry is None:
+            raise KeyError(file)
+        return entry
+
+    def __contains__(self, file):
+        return self.get(file) is not None
+
+    def exists(self, file):
+        return file in self
+
+    def add(self, file, values, previous_key=None):
+        entry = IndexEntry(self, file, values)
+        with self._lock:
+            self._changed[file] = entry
+            self._loaded[file] = entry
+
+    def __setitem__(self, file, values):
+        self.add(file, values)
+
+    def rm_key(self, file):
+        with self._lock:
+            self._changed[file] = None
+            self._loaded.pop(file, None)
+
+    def _stored_rows(self):
+        last_file = ''
+        while True:
+            with self._lock:
+                rows = self._get_connection().execute('SELECT file, {}, extra FROM files WHERE file > ? ORDER BY file LIMIT ?'.format(
+                    ', '.join(INDEX_FIELDS)), (last_file, INDEX_DB_PAGE_SIZE)).fetchall()
+            for row in rows:
+                last_file = row[0]
+                yield row
+            if len(rows) < INDEX_DB_PAGE_SIZE:
+                return
+
+    def items(self):
+        with self._lock:
+            changed = dict(self._changed)
+        for row in self._stored_rows():
+            file = row[0]
+            if file in changed:
+                continue
+            entry = self._loaded.get(file)
+            yield file, entry if entry is not None else self._entry(file, row[1:])
+        for file, entry in changed.items():
+            if entry is not None:
+                yield file, entry
+
+    def keys(self):
+        for file, _ in self.items():
+            yield file
+
+    def values(self):
+        for _, entry in self.items():
+            yield entry
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        with self._lock:
+            connection = self._get_connection()
+            count = connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+            for file, entry in self._changed.items():
+                stored = connection.execute('SELECT 1 FROM files WHERE file = ?', (file,)).fetchone() is not None
+                count += (entry is not None) - stored
+            return count
+
+    def get_yaml(self):
+        return self
+
+    def load(self):
+        return {file: dict(entry) for file, entry in self.items()}
+
+    def save(self):
+        with self._lock:
+            connection = self._get_connection()
+            changed, self._changed = self._changed, {}
+            with connection:
+                connection.executemany('DELETE FROM files WHERE file = ?', ((file,) for file, entry in changed.items() if entry is None))
+                self._write(self._row(file, entry) for file, entry in changed.items() if entry is not None)
+                self._mark_saved()
+
+    def clear(self):
+        """Removes all the entries, saved or not."""
+        with self._lock:
+            connection = self._get_connection()
+            self._changed = {}
+            self._loaded.clear()
+            with connection:
+                connection.execute('DELETE FROM files')
+                connection.execute('DELETE FROM saved WHERE name = ?', (self.legacy_file,))
+
+
+class ManifestIndexStore(_IndexTable):
+    """Files added to the index since the last commit, as sets of paths keyed by the hash of their content.
+
+    Keeps the API of the Manifest of MANIFEST.yaml. Changes are kept pending until save(), and the files
+    of a key are read from the database only when that key is looked up.
+    """
+
+    legacy_file = MANIFEST_FILE
+
+    def __init__(self, metadata_path):
+        super(ManifestIndexStore, self).__init__(metadata_path)
+        self._added = {}
+        self._removed = {}
+
+    def _import(self, entries):
+        self._connection.executemany('INSERT OR IGNORE INTO manifest (key, file) VALUES (?, ?)',
+                                     ((str(key), str(file)) for key, files in entries.items() for file in files))
+
+    def _stored_files(self, key):
+        rows = self._get_connection().execute('SELECT file FROM manifest WHERE key = ?', (key,)).fetchall()
+        return {row[0] for row in rows}
+
+    def _files(self, key):
+        with self._lock:
+            files = self._stored_files(key) - self._removed.get(key, set())
+            return files | self._added.get(key, set())
+
+    def add(self, key, file, previous_key=None):
+        with self._lock:
+            if previous_key is not None and self.exists_keyfile(previous_key, file):
+                self.rm(previous_key, file)
+            self._removed.get(key, set()).discard(file)
+            self._added.setdefault(key, set()).add(file)
+
+    def merge(self, manifest):
+        for key, files in manifest.items():
+            for file in files:
+                self.add(key, file)
+
+    def rm(self, key, file):
+        with self._lock:
+            if not self.exists(key):
+                return False
+            self._added.get(key, set()).discard(file)
+            self._removed.setdefault(key, set()).add(file)
+            return True
+
+    def rm_file(self, file):
+        with self._lock:
+            key = self.search(file)
+            if key is None:
+                return False
+            return self.rm(key, file)
+
+    def rm_key(self, key):
+        with self._lock:
+            self._added.pop(key, None)
+            self._removed[key] = self._stored_files(key)
+
+    def exists(self, key):
+        return len(self._files(key)) > 0
+
+    def search(self, file):
+        with self._lock:
+            for key, files in self._added.items():
+                if file in files:
+                    return key
+            rows = self._get_connection().execute('SELECT key FROM manifest WHERE file = ?', (file,)).fetchall()
+            for row in rows:
+                if file not in self._removed.get(row[0], set()):
+                    return row[0]
+            return None
+
+    def _stored_items(self):
+        last_key, last_file = '', ''
+        while True:
+            with self._lock:
+                rows = self._get_connection().execute('SELECT key, file FROM manifest WHERE (key, file) > (?, ?) ORDER BY key, file LIMIT ?',
+                                                      (last_key, last_file, INDEX_DB_PAGE_SIZE)).fetchall()
+            for last_key, last_file in rows:
+                yield last_key, last_file
+            if len(rows) < INDEX_DB_PAGE_SIZE:
+                return
+
+    def items(self):
+        with self._lock:
+            changed = set(self._added) | set(self._removed)
+        key, files = None, set()
+        for stored_key, file in self._stored_items():
+            if stored_key in changed:
+                continue
+            if stored_key != key:
+                if files:
+                    yield key, files
+                key, files = stored_key, set()
+            files.add(file)
+        if files:
+            yield key, files
+        for key in changed:
+            files = self._files(key)
+            if files:
+                yield key, files
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __getitem__(self, key):
+        files = self.get(key)
+        if files is None:
+            raise KeyError(key)
+        return files
+
+    def get(self, key):
+        files = self._files(key)
+        return files if files else None
+
+    def exists_keyfile(self, key, file):
+        return file in self._files(key)
+
+    def get_yaml(self):
+        return self.load()
+
+    def load(self):
+        return {key: files for key, files in self.items()}
+
+    def save(self):
+        with self._lock:
+            connection = self._get_connection()
+            added, self._added = self._added, {}
+            removed, self._removed = self._removed, {}
+            with connection:
+                connection.executemany('DELETE FROM manifest WHERE key = ? AND file = ?',
+                                       ((key, file) for key, files in removed.items() for file in files))
+                connection.executemany('INSERT OR IGNORE INTO manifest (key, file) VALUES (?, ?)',
+                                       ((key, file) for key, files in added.items() for file in files))
+                self._mark_saved()
+
+    def remove(self):
+        """Removes all the files, saved or not, as removing MANIFEST.yaml did."""
+        with self._lock:
+            connection = self._get_connection()
+            self._added, self._removed = {}, {}
+            with connection:
+                connection.execute('DELETE FROM manifest')
+                connection.execute('DELETE FROM saved WHERE name = ?', (self.legacy_file,))
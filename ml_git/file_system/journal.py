@@ -0,0 +1,139 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import sqlite3
+import threading
+
+from ml_git.constants import PUSH_JOURNAL_FLUSH_SIZE, PUSH_JOURNAL_PAGE_SIZE
+
+
+class PushJournal(object):
+    """Journal of the objects committed locally that still have to be pushed to the storage.
+
+    Keys are appended in commit order and indexed by key, so removing one does not rewrite the journal.
+    Pushed objects are flagged instead of removed, which lets an interrupted push resume with only the
+    objects that did not reach the storage. The journal is dropped once the whole push succeeds.
+    """
+
+    def __init__(self, path, legacy_log_path=None):
+        self._path = path
+        self._legacy_log_path = legacy_log_path
+        self._connection = None
+        self._pushed = []
+        self._lock = threading.RLock()
+
+    def _get_connection(self, create=True):
+        if self._connection is None:
+            if not create and not os.path.exists(self._path) and not self._has_legacy_log():
+                return None
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._connection = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS journal '
+                                     '(seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE, pushed INTEGER NOT NULL DEFAULT 0)')
+            self._migrate_legacy_log()
+        return self._connection
+
+    def _has_legacy_log(self):
+        return self._legacy_log_path is not None and os.path.exists(self._legacy_log_path)
+
+    def _migrate_legacy_log(self):
+        if not self._has_legacy_log():
+            return
+        with open(self._legacy_log_path) as log_file:
+            keys = [line.strip() for line in log_file if line.strip()]
+        self._insert(keys)
+        os.unlink(self._legacy_log_path)
+
+    def _insert(self, keys):
+        self._connection.executemany('INSERT OR IGNORE INTO journal (key) VALUES (?)', ((key,) for key in keys))
+        self._connection.commit()
+
+    def append(self, keys):
+        with self._lock:
+            self._get_connection()
+            self._insert(keys)
+
+    def remove(self, keys):
+        with self._lock:
+            connection = self._get_connection(create=False)
+            if connection is None:
+                return
+            connection.executemany('DELETE FROM journal WHERE key = ?', ((key,) for key in keys))
+            connection.commit()
+
+    def replace(self, keys):
+        """Keeps only keys in the journal, all of them pending."""
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute('DELETE FROM journal')
+            self._insert(keys)
+
+    def pending(self):
+        """Yields the keys not pushed yet, in the order they were appended."""
+        last_seq = 0
+        while True:
+            with self._lock:
+                connection = self._get_connection(create=False)
+                if connection is None:
+                    return
+                rows = connection.execute('SELECT seq, key FROM journal WHERE pushed = 0 AND seq > ? ORDER BY seq LIMIT ?',
+                                          (last_seq, PUSH_JOURNAL_PAGE_SIZE)).fetchall()
+            for last_seq, key in rows:
+                yield key
+            if len(rows) < PUSH_JOURNAL_PAGE_SIZE:
+                return
+
+    def count_pending(self):
+        with self._lock:
+            connection = self._get_connection(create=False)
+            if connection is None:
+                return 0
+            return connection.execute('SELECT COUNT(*) FROM journal WHERE pushed = 0').fetchone()[0]
+
+    def mark_pushed(self, key):
+        with self._lock:
+            self._pushed.append(key)
+            if len(self._pushed) >= PUSH_JOURNAL_FLUSH_SIZE:
+                self.flush()
+
+    def unmark_pushed(self, keys):
+        """Flags keys as pending again, e.g. when their upload was rolled back."""
+        with self._lock:
+            self.flush()
+            connection = self._get_connection(create=False)
+            if connection is None:
+                return
+            connection.executemany('UPDATE journal SET pushed = 0 WHERE key = ?', ((key,) for key in keys))
+            connection.commit()
+
+    def flush(self):
+        with self._lock:
+            if not self._pushed:
+                return
+            connection = self._get_connection()
+            connection.executemany('UPDATE journal SET pushed = 1 WHERE key = ?', ((key,) for key in self._pushed))
+            connection.commit()
+            self._pushed = []
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def drop(self):
+        """Removes the journal, after all its objects were pushed."""
+        with self._lock:
+            self._pushed = []
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            for path in (self._path, self._path + '-wal', self._path + '-shm', self._legacy_log_path):
+                if path is not None and os.path.exists(path):
+                    os.unlink(path)
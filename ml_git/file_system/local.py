@@ -3,6 +3,7 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import base64
 import bisect
 import csv
 import filecmp
@@ -11,28 +12,35 @@ import os
 import shutil
 import tempfile
 from asyncio import CancelledError
+from functools import partial
 from pathlib import Path
 
+import humanize
 from botocore.client import ClientError
 from tqdm import tqdm
 
 from ml_git import log
+from ml_git.compact_manifest import load_compact_manifest
 from ml_git.config import get_index_path, get_objects_path, get_refs_path, get_index_metadata_path, \
-    get_metadata_path, get_batch_size, get_push_threads_count
+    get_metadata_path, get_batch_size, get_push_threads_count, get_hash_threads_count, get_verification_policy, \
+    get_verification_sample_rate, get_concurrency_limits
 from ml_git.constants import LOCAL_REPOSITORY_CLASS_NAME, STORAGE_FACTORY_CLASS_NAME, REPOSITORY_CLASS_NAME, \
-    MutabilityType, StorageType, SPEC_EXTENSION, MANIFEST_FILE, INDEX_FILE, EntityType, PERFORMANCE_KEY, \
-    STORAGE_SPEC_KEY, STORAGE_CONFIG_KEY, MLGIT_IGNORE_FILE_NAME
+    MutabilityType, StorageType, SPEC_EXTENSION, MANIFEST_FILE, EntityType, PERFORMANCE_KEY, \
+    STORAGE_SPEC_KEY, STORAGE_CONFIG_KEY, MLGIT_IGNORE_FILE_NAME, INLINE_DATA_KEY
 from ml_git.error_handler import error_handler
 from ml_git.file_system.cache import Cache
+from ml_git.file_system.chunking import load_chunking_options
+from ml_git.file_system.compression import decode_chunk
 from ml_git.file_system.hashfs import MultihashFS
 from ml_git.file_system.index import MultihashIndex, FullIndex, Status
 from ml_git.metadata import Metadata
 from ml_git.ml_git_message import output_messages
-from ml_git.pool import pool_factory, process_futures
+from ml_git.pool import pool_factory, process_futures, process_results, AdaptiveConcurrency
 from ml_git.refs import Refs
 from ml_git.sample import SampleValidate
 from ml_git.spec import spec_parse, search_spec_file, get_entity_dir, get_spec_key, SearchSpecException
-from ml_git.storages.store_utils import storage_factory
+from ml_git.storages.multihash_storage import MultihashStorage
+from ml_git.storages.store_utils import storage_factory, storage_pool, transfer_stats
 from ml_git.utils import yaml_load, ensure_path_exists, convert_path, normalize_path, \
     posix_path, set_write_read, change_mask_for_routine, run_function_per_group, get_root_path, yaml_save, \
     get_ignore_rules, should_ignore_file
@@ -43,21 +51,36 @@ class LocalRepository(MultihashFS):
     def __init__(self, config, objects_path, repo_type=EntityType.DATASETS.value, block_size=256 * 1024, levels=2):
         self.is_shared_objects = repo_type in config and 'objects_path' in config[repo_type]
         with change_mask_for_routine(self.is_shared_objects):
-            super(LocalRepository, self).__init__(objects_path, block_size, levels)
+            super(LocalRepository, self).__init__(objects_path, block_size, levels, get_hash_threads_count(config),
+                                                  verification_policy=get_verification_policy(config),
+                                                  verification_sample_rate=get_verification_sample_rate(config))
         self.__config = config
         self.__repo_type = repo_type
         self.__progress_bar = None
 
-    def _pool_push(self, ctx, obj, obj_path):
+    def _pool_push(self, ctx, obj, objects_fs):
         storage = ctx
         log.debug(output_messages['DEBUG_PUSH_BLOB_TO_STORAGE'] % obj, class_name=LOCAL_REPOSITORY_CLASS_NAME)
-        ret = storage.file_store(obj, obj_path)
+        with self.materialize(obj) as obj_path:
+            ret = storage.file_store(obj, obj_path)
+        objects_fs.mark_pushed(obj)
         return ret
 
+    @staticmethod
+    def _adaptive_concurrency(config):
+        limits = get_concurrency_limits(config)
+        return AdaptiveConcurrency(*limits) if limits is not None else None
+
+    def _pooled_storage(self, storage_str):
+        # the storage checked before the work starts is then used by a worker instead of creating another one
+        storages = storage_pool(self.__config, storage_str)
+        storage = storages.acquire()
+        storages.release(storage)
+        return storage
+
     def _create_pool(self, config, storage_str, retry, pb_elts=None, pb_desc='blobs', nworkers=os.cpu_count() * 5, fail_limit=None):
-        _storage_factory = lambda: storage_factory(config, storage_str)  # noqa: E731
-        return pool_factory(ctx_factory=_storage_factory, retry=retry, pb_elts=pb_elts,
-                            pb_desc=pb_desc, nworkers=nworkers, fail_limit=fail_limit)
+        return pool_factory(ctx_pool=storage_pool(config, storage_str), retry=retry, pb_elts=pb_elts,
+                            pb_desc=pb_desc, nworkers=nworkers, fail_limit=fail_limit, concurrency=self._adaptive_concurrency(config))
 
     def push(self, object_path, spec_file, retry=2, clear_on_fail=False, fail_limit=None):
         repo_type = self.__repo_type
@@ -66,13 +89,13 @@ class LocalRepository(MultihashFS):
         spec = yaml_load(spec_file)
         manifest = spec[entity_spec_key]['manifest']
         idx = MultihashFS(object_path)
-        objs = idx.get_log()
+        objs_count = idx.count_log()
 
-        if objs is None or len(objs) == 0:
+        if objs_count == 0:
             log.info(output_messages['INFO_NO_BLOBS_TO_PUSH'], class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return 0
 
-        storage = storage_factory(self.__config, manifest[STORAGE_SPEC_KEY])
+        storage = self._pooled_storage(manifest[STORAGE_SPEC_KEY])
 
         if storage is None:
             log.error(output_messages['ERROR_WITHOUT_STORAGE'] % (manifest[STORAGE_SPEC_KEY]), class_name=STORAGE_FACTORY_CLASS_NAME)
@@ -83,25 +106,23 @@ class LocalRepository(MultihashFS):
 
         nworkers = get_push_threads_count(self.__config)
 
-        wp = self._create_pool(self.__config, manifest[STORAGE_SPEC_KEY], retry, len(objs), 'files', nworkers, fail_limit)
-        for obj in objs:
-            # Get obj from filesystem
-            obj_path = self.get_keypath(obj)
-            wp.submit(self._pool_push, obj, obj_path)
-
-        futures = wp.wait()
+        wp = self._create_pool(self.__config, manifest[STORAGE_SPEC_KEY], retry, objs_count, 'files', nworkers, fail_limit)
         uploaded_files = []
+        uploaded_keys = []
         error = ''
-        for future in futures:
+        for obj, future in wp.imap_unordered(self._pool_push, idx.iter_log(), idx):
             try:
                 success = future.result()
                 uploaded_files.append(list(success.values())[0])
+                uploaded_keys.append(obj)
             except Exception as e:
                 if not (type(e) is CancelledError):
                     log.debug(output_messages['ERROR_FATAL_PUSH'] % e, class_name=LOCAL_REPOSITORY_CLASS_NAME)
                     error = e
         wp.progress_bar_close()
         wp.reset_futures()
+        idx.close_log()
+        self._log_transfer_stats(manifest[STORAGE_SPEC_KEY])
 
         if wp.errors_count > 0:
             log.error(output_messages['ERROR_ON_PUSH_BLOBS'] % wp.errors_count, class_name=LOCAL_REPOSITORY_CLASS_NAME)
@@ -112,8 +133,21 @@ class LocalRepository(MultihashFS):
                 log.error(output_messages['ERROR_CANNOT_RECOVER'])
             if clear_on_fail and len(uploaded_files) > 0 and handler_exit_code != 0:
                 self._delete(uploaded_files, spec_file, retry)
+                idx.unmark_pushed(uploaded_keys)
         return 0 if not wp.errors_count > 0 else 1
 
+    @staticmethod
+    def _log_transfer_stats(storage_str):
+        stats = transfer_stats(storage_str)
+        if stats is not None:
+            log.info(output_messages['INFO_TRANSFER_STATS'] % (stats['requests'], humanize.naturalsize(stats['bytes']), stats['throttled']),
+                     class_name=LOCAL_REPOSITORY_CLASS_NAME)
+
+    def _log_descriptor_cache_stats(self):
+        stats = self._descriptors.stats()
+        log.debug(output_messages['DEBUG_DESCRIPTOR_CACHE_STATS'] % (stats['hits'], stats['misses'], stats['hit_rate'] * 100, stats['entries']),
+                  class_name=LOCAL_REPOSITORY_CLASS_NAME)
+
     def _pool_delete(self, ctx, obj):
         storage = ctx
         log.debug(output_messages['DEBUG_DELETE_BLOB_FROM_STORAGE'] % obj, class_name=LOCAL_REPOSITORY_CLASS_NAME)
@@ -127,7 +161,7 @@ class LocalRepository(MultihashFS):
         spec = yaml_load(spec_file)
         entity_spec_key = get_spec_key(repo_type)
         manifest = spec[entity_spec_key]['manifest']
-        storage = storage_factory(self.__config, manifest[STORAGE_SPEC_KEY])
+        storage = self._pooled_storage(manifest[STORAGE_SPEC_KEY])
         if storage is None:
             log.error(output_messages['ERROR_WITHOUT_STORAGE'] % (manifest[STORAGE_SPEC_KEY]), class_name=STORAGE_FACTORY_CLASS_NAME)
             return -2
@@ -161,12 +195,13 @@ class LocalRepository(MultihashFS):
             self._fetch_ipld_remote(ctx, key, key_path)
         return key
 
-    def _fetch_ipld_remote(self, ctx, key, key_path):
+    def _fetch_ipld_remote(self, ctx, key, key_path, hash_fs=None):
         storage = ctx
         ensure_path_exists(os.path.dirname(key_path))
         log.debug(output_messages['DEBUG_DOWNLOADING_IPLD'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
         if storage.get(key_path, key) is False:
             raise RuntimeError(output_messages['ERROR_DOWNLOADING_IPLD'] % key)
+        (hash_fs or self).record_object(key)
         return key
 
     def _fetch_ipld_to_path(self, ctx, key, hash_fs):
@@ -174,20 +209,22 @@ class LocalRepository(MultihashFS):
         if hash_fs._exists(key) is False:
             key_path = hash_fs.get_keypath(key)
             try:
-                self._fetch_ipld_remote(ctx, key, key_path)
+                self._fetch_ipld_remote(ctx, key, key_path, hash_fs)
             except Exception:
                 pass
         return key
 
-    def _fetch_blob(self, ctx, key):
-        links = self.load(key)
-        for olink in links['Links']:
-            key = olink['Hash']
-            log.debug(output_messages['DEBUG_GETTING_BLOB'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
-            if self._exists(key) is False:
-                key_path = self.get_keypath(key)
-                self._fetch_blob_remote(ctx, key, key_path)
-        return True
+    def _fetch_descriptor(self, ctx, key):
+        """Downloads the descriptor of key if it is missing and returns the keys of its chunks."""
+        self._fetch_ipld(ctx, key)
+        return [link['Hash'] for link in self.load(key)['Links']]
+
+    def _fetch_chunk(self, ctx, key):
+        log.debug(output_messages['DEBUG_GETTING_BLOB'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
+        if self._exists(key) is False:
+            key_path = self.get_keypath(key)
+            self._fetch_blob_remote(ctx, key, key_path)
+        return key
 
     def _fetch_blob_to_path(self, ctx, key, hash_fs):
         try:
@@ -197,17 +234,22 @@ class LocalRepository(MultihashFS):
                 log.debug(output_messages['DEBUG_GETTING_BLOB'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
                 if hash_fs._exists(key) is False:
                     key_path = hash_fs.get_keypath(key)
-                    self._fetch_blob_remote(ctx, key, key_path)
+                    self._fetch_blob_remote(ctx, key, key_path, hash_fs)
         except Exception:
             return False
         return True
 
-    def _fetch_blob_remote(self, ctx, key, key_path):
+    def _fetch_blob_remote(self, ctx, key, key_path, hash_fs=None):
         storage = ctx
         ensure_path_exists(os.path.dirname(key_path))
         log.debug(output_messages['DEBUG_DOWNLOADING_BLOB'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
         if storage.get(key_path, key) is False:
             raise RuntimeError(output_messages['ERROR_DOWNLOAD_BLOG'] % key)
+        hash_fs = hash_fs or self
+        hash_fs.record_object(key)
+        if isinstance(storage, MultihashStorage):
+            # multihash storages check the content against the key while downloading it
+            hash_fs.mark_verified(key)
         return True
 
     def adding_to_cache_dir(self, lkeys, args):
@@ -226,26 +268,50 @@ class LocalRepository(MultihashFS):
             return False
         return True
 
-    @staticmethod
-    def _fetch_batch(iplds, args):
-        for key in iplds:
-            args["wp"].submit(args["function"], key)
-        futures = args["wp"].wait()
-
-        for future in futures:
+    def _fetch_batch(self, iplds, args):
+        wp = args['wp']
+        # a chunk shared by several files is downloaded once, and counted as missing for each file until it is downloaded
+        scheduled = set()
+        downloaded = set()
+        # the files waiting for each chunk and the number of chunks of each file not downloaded yet
+        waiting = {}
+        missing = {}
+
+        def chunk_tasks(task, result):
+            if task[0] != self._fetch_descriptor:
+                return []
+            chunks = [key for key in dict.fromkeys(result) if key not in downloaded]
+            for chunk in chunks:
+                waiting.setdefault(chunk, []).append(task[1])
+            missing[task[1]] = len(chunks)
+            chunks = [key for key in chunks if key not in scheduled]
+            scheduled.update(chunks)
+            wp.progress_bar_total_inc(len(chunks))
+            return [(self._fetch_chunk, key) for key in chunks]
+
+        args['error'] = None
+        for (userfn, key), future in wp.imap_graph(((self._fetch_descriptor, key) for key in iplds), chunk_tasks):
             try:
                 future.result()
+                if userfn == self._fetch_chunk:
+                    downloaded.add(key)
+                    for ipld in waiting.pop(key, ()):
+                        missing[ipld] -= 1
             except Exception as e:
                 if not (type(e) is CancelledError):
                     log.debug(output_messages['ERROR_FATAL_FETCH'] % e, class_name=LOCAL_REPOSITORY_CLASS_NAME)
-                return e
-        return True
-
-    def _handle_fetch_error(self, lkeys, result, args):
-        log.error(output_messages['ERROR_ON_GETTING_BLOBS'] % len(lkeys), class_name=LOCAL_REPOSITORY_CLASS_NAME)
-        exit_code = error_handler(result)
+                if args['error'] is None:
+                    args['error'] = e
+        # a file failed if its descriptor or one of its chunks failed or was not submitted after the pool was cancelled
+        args['failed'] = [key for key in iplds if missing.get(key, 1) > 0]
+        return not args['failed']
+
+    def _handle_fetch_error(self, args):
+        log.error(output_messages['ERROR_ON_GETTING_BLOBS'] % len(args['failed']), class_name=LOCAL_REPOSITORY_CLASS_NAME)
+        exit_code = error_handler(args['error'])
         if exit_code == 0:
-            exit_code = run_function_per_group(lkeys, 20, function=self._fetch_batch, arguments=args)
+            args['wp'].reset_futures()
+            exit_code = 0 if self._fetch_batch(args['failed'], args) else 1
         else:
             log.error(output_messages['ERROR_CANNOT_RECOVER'], class_name=LOCAL_REPOSITORY_CLASS_NAME)
         return exit_code
@@ -264,7 +330,7 @@ class LocalRepository(MultihashFS):
                       class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return False
         manifest = spec[entity_spec_key]['manifest']
-        storage = storage_factory(self.__config, manifest[STORAGE_SPEC_KEY])
+        storage = self._pooled_storage(manifest[STORAGE_SPEC_KEY])
         if storage is None:
             return False
 
@@ -277,35 +343,20 @@ class LocalRepository(MultihashFS):
         if bare:
             return True
 
-        # creates 2 independent worker pools for IPLD files and another for data chunks/blobs.
-        # Indeed, IPLD files are 1st needed to get blobs to get from storage.
-        # Concurrency comes from the download of
-        #   1) multiple IPLD files at a time and
-        #   2) multiple data chunks/blobs from multiple IPLD files at a time.
-
-        wp_ipld = self._create_pool(self.__config, manifest[STORAGE_SPEC_KEY], retries, len(files))
-        # TODO: is that the more efficient in case the list is very large?
+        # a single worker pool downloads the descriptors and the chunks. The chunks of a descriptor are queued as soon
+        # as it arrives, so chunks are downloaded while the other descriptors are, instead of after the last one.
+        wp = self._create_pool(self.__config, manifest[STORAGE_SPEC_KEY], retries, len(files), 'objects')
         lkeys = list(files.keys())
         with change_mask_for_routine(self.is_shared_objects):
-            args = {'wp': wp_ipld}
-            args['error_msg'] = 'Error to fetch ipld -- [%s]'
-            args['function'] = self._fetch_ipld
-            result = run_function_per_group(lkeys, 20, function=self._fetch_batch, arguments=args)
-            if not result and self._handle_fetch_error(lkeys, result, args) != 0:
+            args = {'wp': wp}
+            result = self._fetch_batch(lkeys, args)
+            if not result and self._handle_fetch_error(args) != 0:
                 return False
-            wp_ipld.progress_bar_close()
-            del wp_ipld
-
-            wp_blob = self._create_pool(self.__config, manifest[STORAGE_SPEC_KEY], retries, len(files), 'chunks')
-
-            args['wp'] = wp_blob
-            args['error_msg'] = 'Error to fetch blob -- [%s]'
-            args['function'] = self._fetch_blob
-            result = run_function_per_group(lkeys, 20, function=self._fetch_batch, arguments=args)
-            if not result and self._handle_fetch_error(lkeys, result, args) != 0:
-                return False
-            wp_blob.progress_bar_close()
-            del wp_blob
+            wp.progress_bar_close()
+            del wp
+            self.finish_verification()
+        self._log_descriptor_cache_stats()
+        self._log_transfer_stats(manifest[STORAGE_SPEC_KEY])
 
         return True
 
@@ -356,40 +407,43 @@ class LocalRepository(MultihashFS):
             md_dst = os.path.join(ws_path, md)
             shutil.copy2(md_path, md_dst)
 
-    def adding_files_into_cache(self, lkeys, args):
+    def _keys_in_objects(self, lkeys, missing):
         for key in lkeys:
             # check file is in objects ; otherwise critical error (should have been fetched at step before)
             if self._exists(key) is False:
-                log.error(output_messages['ERROR_BLOB_NOT_FOUND_EXITING'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
-                return False
-            args['wp'].submit(self._update_cache, args['cache'], key)
-        futures = args['wp'].wait()
+                missing.append(key)
+                return
+            yield key
+
+    def adding_files_into_cache(self, lkeys, args):
+        missing = []
         try:
-            process_futures(futures, args['wp'])
+            update_cache = partial(self._update_cache, args['cache'])
+            process_results(args['wp'].imap_unordered(update_cache, self._keys_in_objects(lkeys, missing)))
         except Exception as e:
             log.error(output_messages['ERROR_ADDING_INTO_CACHE'] % (args['cache_path'], e),
                       class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return False
+        if missing:
+            log.error(output_messages['ERROR_BLOB_NOT_FOUND_EXITING'] % missing[0], class_name=LOCAL_REPOSITORY_CLASS_NAME)
+            return False
         return True
 
     def adding_files_into_workspace(self, lkeys, args):
-        for key in lkeys:
-            # check file is in objects ; otherwise critical error (should have been fetched at step before)
-            if self._exists(key) is False:
-                log.error(output_messages['ERROR_BLOB_NOT_FOUND_EXITING'], class_name=LOCAL_REPOSITORY_CLASS_NAME)
-                return False
-            args['wps'].submit(self._update_links_wspace, key, Status.u.name, args)
-        futures = args['wps'].wait()
+        missing = []
         try:
-            process_futures(futures, args['wps'])
+            process_results(args['wps'].imap_unordered(self._update_links_wspace, self._keys_in_objects(lkeys, missing), Status.u.name, args))
         except Exception as e:
             log.error(output_messages['ERROR_ADDING_INTO_WORKSPACE'] % (args['ws_path'], e),
                       class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return False
+        if missing:
+            log.error(output_messages['ERROR_BLOB_NOT_FOUND_EXITING'], class_name=LOCAL_REPOSITORY_CLASS_NAME)
+            return False
         return True
 
     def _load_obj_files(self, samples, manifest_path, sampling_flag='', is_checkout=False):
-        obj_files = yaml_load(manifest_path)
+        obj_files = load_compact_manifest(manifest_path)
         try:
             if samples is not None:
                 set_files = SampleValidate.process_samples(samples, obj_files)
@@ -418,7 +472,7 @@ class LocalRepository(MultihashFS):
             cache = Cache(cache_path)
             wp = pool_factory(pb_elts=len(lkey), pb_desc='mounting files in cache', fail_limit=fail_limit)
             args = {'wp': wp, 'cache': cache, 'cache_path': cache_path}
-            if not run_function_per_group(lkey, 20, function=self.adding_files_into_cache, arguments=args):
+            if not self.adding_files_into_cache(lkey, args):
                 return
             wp.progress_bar_close()
 
@@ -426,7 +480,7 @@ class LocalRepository(MultihashFS):
         args = {'wps': wps, 'cache': cache, 'fidx': fidx, 'ws_path': ws_path, 'mfiles': mfiles,
                 'obj_files': obj_files, 'mutability': mutability}
 
-        if not run_function_per_group(lkey, 20, function=self.adding_files_into_workspace, arguments=args):
+        if not self.adding_files_into_workspace(lkey, args):
             return
 
         wps.progress_bar_close()
@@ -440,9 +494,9 @@ class LocalRepository(MultihashFS):
         entity_dir = get_entity_dir(self.__repo_type, entity, root_path=metadata_path)
         manifest_path = os.path.join(metadata_path, entity_dir, MANIFEST_FILE)
 
-        obj_files = yaml_load(manifest_path)
+        obj_files = load_compact_manifest(manifest_path)
 
-        storage = storage_factory(self.__config, manifest[STORAGE_SPEC_KEY])
+        storage = self._pooled_storage(manifest[STORAGE_SPEC_KEY])
         if storage is None:
             log.error(output_messages['ERROR_WITHOUT_STORAGE'] % (manifest[STORAGE_SPEC_KEY]), class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return
@@ -475,12 +529,8 @@ class LocalRepository(MultihashFS):
         manifest_path = os.path.join(metadata_path, entity_dir, MANIFEST_FILE)
         mutability, _ = self.get_mutability_from_spec(spec_name, self.__repo_type, entity_dir)
         index_manifest_path = os.path.join(index_path, 'metadata', spec_name)
-        fidx_path = os.path.join(index_manifest_path, INDEX_FILE)
-        try:
-            os.unlink(fidx_path)
-        except FileNotFoundError:
-            pass
         fidx = FullIndex(spec_name, index_path, mutability)
+        fidx.reset()
         # copy all files defined in manifest from objects to cache (if not there yet) then hard links to workspace
         mfiles = {}
 
@@ -498,21 +548,26 @@ class LocalRepository(MultihashFS):
                     cache = Cache(cache_path)
                     wp = pool_factory(pb_elts=len(lkey), pb_desc='files into cache', fail_limit=fail_limit)
                     args = {'wp': wp, 'cache': cache, 'cache_path': cache_path}
-                    if not run_function_per_group(lkey, 20, function=self.adding_files_into_cache, arguments=args):
+                    if not self.adding_files_into_cache(lkey, args):
                         return
                     wp.progress_bar_close()
 
             wps = pool_factory(pb_elts=len(lkey), pb_desc='files into workspace', fail_limit=fail_limit)
             args = {'wps': wps, 'cache': cache, 'fidx': fidx, 'ws_path': ws_path, 'mfiles': mfiles,
                     'obj_files': obj_files, 'mutability': mutability}
-            if not run_function_per_group(lkey, 20, function=self.adding_files_into_workspace, arguments=args):
+            if not self.adding_files_into_workspace(lkey, args):
                 return
             wps.progress_bar_close()
+            corrupted_objects = self.finish_verification()
+            if len(corrupted_objects) > 0:
+                log.error(output_messages['ERROR_BACKGROUND_VERIFICATION_FAILED'] % (len(corrupted_objects), corrupted_objects),
+                          class_name=LOCAL_REPOSITORY_CLASS_NAME)
         else:
             args = {'fidx': fidx, 'ws_path': ws_path, 'obj_files': obj_files}
             run_function_per_group(lkey, 20, function=self._update_index_bare_mode, arguments=args)
 
         fidx.save_manifest_index()
+        self._log_descriptor_cache_stats()
         # Check files that have been removed (present in wskpace and not in MANIFEST)
         self._remove_unused_links_wspace(ws_path, mfiles)
         # Update metadata in workspace
@@ -535,8 +590,8 @@ class LocalRepository(MultihashFS):
 
     def _pool_remote_fsck_ipld(self, ctx, obj):
         storage = ctx
-        obj_path = self.get_keypath(obj)
-        ret = storage.file_store(obj, obj_path)
+        with self.materialize(obj) as obj_path:
+            ret = storage.file_store(obj, obj_path)
         return ret
 
     def _pool_remote_fsck_blob(self, ctx, obj):
@@ -549,19 +604,16 @@ class LocalRepository(MultihashFS):
         for olink in links['Links']:
             key = olink['Hash']
             storage = ctx
-            obj_path = self.get_keypath(key)
-            ret = storage.file_store(key, obj_path)
+            with self.materialize(key) as obj_path:
+                ret = storage.file_store(key, obj_path)
             rets.append(ret)
         return rets
 
     @staticmethod
     def _work_pool_file_submitter(files, args):
         wp_file = args['wp']
-        for key in files:
-            wp_file.submit(args['submit_function'], key, *args['args'])
-        files_future = wp_file.wait()
         try:
-            process_futures(files_future, wp_file)
+            process_results(wp_file.imap_unordered(args['submit_function'], files, *args['args']))
         except Exception as e:
             log.error(output_messages['ERROR_TO_FETCH_FILE'] % e, class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return False
@@ -574,7 +626,7 @@ class LocalRepository(MultihashFS):
             'args': args,
             'submit_function': submit_function
         }
-        run_function_per_group(files, 20, function=self._work_pool_file_submitter, arguments=submit_args)
+        self._work_pool_file_submitter(files, submit_args)
         wp_file.progress_bar_close()
         del wp_file
 
@@ -599,9 +651,16 @@ class LocalRepository(MultihashFS):
 
     @staticmethod
     def _remote_fsck_ipld_future_process(futures, args):
+        error = None
         for future in futures:
             args['ipld'] += 1
-            key = future.result()
+            try:
+                key = future.result()
+            except Exception as e:
+                # the other checks still run, the first error is raised once they are done
+                if error is None:
+                    error = e
+                continue
             ks = list(key.keys())
             if ks[0] is False:
                 args['ipld_unfixed_list'].append(ks[0])
@@ -612,6 +671,8 @@ class LocalRepository(MultihashFS):
                 args['ipld_fixed_list'].append(ks[0])
                 args['ipld_fixed'] += 1
         args['wp'].reset_futures()
+        if error is not None:
+            raise error
 
     def _fsck_check_blobs_is_present(self, lkeys):
         missing_blobs = []
@@ -636,8 +697,7 @@ class LocalRepository(MultihashFS):
                 log.debug(output_messages['DEBUG_MISSING_IPLD'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
         return missing_iplds
 
-    def _remote_fsck_submit_iplds(self, lkeys, args):
-
+    def _remote_fsck_present_iplds(self, lkeys, args):
         for key in lkeys:
             # blob file describing IPLD links
             log.debug(output_messages['DEBUG_CHECK_IPLD'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
@@ -646,9 +706,11 @@ class LocalRepository(MultihashFS):
                 args['wp'].progress_bar_total_inc(-1)
                 log.debug(output_messages['DEBUG_MISSING_IPLD'] % key, class_name=LOCAL_REPOSITORY_CLASS_NAME)
             else:
-                args['wp'].submit(self._pool_remote_fsck_ipld, key)
+                yield key
 
-        ipld_futures = args['wp'].wait()
+    def _remote_fsck_submit_iplds(self, lkeys, args):
+        ipld_futures = (future for _, future in args['wp'].imap_unordered(self._pool_remote_fsck_ipld,
+                                                                          self._remote_fsck_present_iplds(lkeys, args)))
         try:
             self._remote_fsck_ipld_future_process(ipld_futures, args)
         except Exception as e:
@@ -658,9 +720,15 @@ class LocalRepository(MultihashFS):
 
     @staticmethod
     def _remote_fsck_blobs_future_process(futures, args):
+        error = None
         for future in futures:
             args['blob'] += 1
-            rets = future.result()
+            try:
+                rets = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+                continue
             for ret in rets:
                 if ret is not None:
                     ks = list(ret.keys())
@@ -673,12 +741,11 @@ class LocalRepository(MultihashFS):
                         args['blob_fixed_list'].append(ks[0])
                         args['blob_fixed'] += 1
         args['wp'].reset_futures()
+        if error is not None:
+            raise error
 
     def _remote_fsck_submit_blobs(self, lkeys, args):
-        for key in lkeys:
-            args['wp'].submit(self._pool_remote_fsck_blob, key)
-
-        futures = args['wp'].wait()
+        futures = (future for _, future in args['wp'].imap_unordered(self._pool_remote_fsck_blob, lkeys))
         try:
             self._remote_fsck_blobs_future_process(futures, args)
         except Exception as e:
@@ -698,9 +765,9 @@ class LocalRepository(MultihashFS):
             log.warn(output_messages['WARN_EMPTY_ENTITY'] % spec_name, class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return
         manifest_path = os.path.join(metadata_path, entity_dir, MANIFEST_FILE)
-        obj_files = yaml_load(manifest_path)
+        obj_files = load_compact_manifest(manifest_path)
 
-        storage = storage_factory(self.__config, manifest[STORAGE_SPEC_KEY])
+        storage = self._pooled_storage(manifest[STORAGE_SPEC_KEY])
         if storage is None:
             log.error(output_messages['ERROR_WITHOUT_STORAGE'] % (manifest[STORAGE_SPEC_KEY]), class_name=LOCAL_REPOSITORY_CLASS_NAME)
             return -2
@@ -721,7 +788,7 @@ class LocalRepository(MultihashFS):
         submit_iplds_args = {'wp': wp_ipld, 'ipld_unfixed': 0, 'ipld_fixed': 0, 'ipld': 0, 'ipld_missing': [],
                              'full_log': full_log, 'ipld_unfixed_list': [], 'ipld_fixed_list': []}
 
-        result = run_function_per_group(lkeys, 20, function=self._remote_fsck_submit_iplds, arguments=submit_iplds_args)
+        result = self._remote_fsck_submit_iplds(lkeys, submit_iplds_args)
         if not result:
             return False
         wp_ipld.progress_bar_close()
@@ -744,7 +811,7 @@ class LocalRepository(MultihashFS):
         submit_blob_args = {'wp': wp_blob, 'blob': 0, 'blob_fixed': 0, 'blob_unfixed': 0,
                             'full_log': full_log, 'blob_fixed_list': [], 'blob_unfixed_list': []}
 
-        result = run_function_per_group(lkeys, 20, function=self._remote_fsck_submit_blobs, arguments=submit_blob_args)
+        result = self._remote_fsck_submit_blobs(lkeys, submit_blob_args)
         if not result:
             return False
         wp_blob.progress_bar_close()
@@ -769,6 +836,8 @@ class LocalRepository(MultihashFS):
                           output_messages['INFO_REMOTE_FSCK_FIXED_LIST'] % ('Blobs', submit_blob_args['blob_unfixed_list']))
 
         log.info(output_messages['INFO_REMOTE_FSCK_TOTAL'] % (submit_iplds_args['ipld'], submit_blob_args['blob']))
+        self._log_descriptor_cache_stats()
+        self._log_transfer_stats(manifest[STORAGE_SPEC_KEY])
 
         if (submit_iplds_args['ipld_fixed'] > 0 or submit_blob_args['blob_fixed'] > 0 or
                 submit_iplds_args['ipld_unfixed'] > 0 or submit_blob_args['blob_unfixed'] > 0) and not full_log:
@@ -808,7 +877,7 @@ class LocalRepository(MultihashFS):
         corrupted_files = []
         idx_yaml_mf = idx_yaml.get_manifest_index()
 
-        self.__progress_bar = tqdm(total=len(idx_yaml_mf.load()), desc='files', unit='files', unit_scale=True,
+        self.__progress_bar = tqdm(total=len(idx_yaml_mf), desc='files', unit='files', unit_scale=True,
                                    mininterval=1.0)
         for key in idx_yaml_mf:
             if idx_yaml_mf[key]['status'] == Status.c.name:
@@ -851,7 +920,8 @@ class LocalRepository(MultihashFS):
             raise Exception(output_messages['ERROR_INVALID_STATUS_DIRECTORY'])
 
         # All files in MANIFEST.yaml in the index AND all files in datapath which stats links == 1
-        idx = MultihashIndex(spec, index_path, objects_path)
+        chunking_options = load_chunking_options(os.path.join(path, file), repo_type) if path is not None else {}
+        idx = MultihashIndex(spec, index_path, objects_path, hash_threads=get_hash_threads_count(self.__config), **chunking_options)
         idx_yaml = idx.get_index_yaml()
         untracked_files = []
         changed_files = []
@@ -865,14 +935,14 @@ class LocalRepository(MultihashFS):
             changed_files, untracked_files = \
                 self._get_workspace_files_status(all_files, full_metadata_path, idx_yaml_mf,
                                                  index_metadata_entity_path,
-                                                 path, new_files, status_directory)
+                                                 path, new_files, idx, status_directory)
         if tag:
             metadata.checkout()
         return new_files, deleted_files, untracked_files, corrupted_files, changed_files
 
     def _get_workspace_files_status(self, all_files, full_metadata_path, idx_yaml_mf,
                                     index_metadata_entity_path, path,
-                                    new_files, status_directory=''):
+                                    new_files, idx, status_directory=''):
         changed_files = []
         untracked_files = []
         ignore_rules = get_ignore_rules(path)
@@ -893,7 +963,7 @@ class LocalRepository(MultihashFS):
                     full_file_path = os.path.join(root, file)
                     stat = os.stat(full_file_path)
                     file_in_index = idx_yaml_mf[posix_path(file_path)]
-                    if file_in_index['mtime'] != stat.st_mtime and self.get_scid(full_file_path) != \
+                    if file_in_index['mtime'] != stat.st_mtime and idx.get_scid(full_file_path, file_in_index['hash']) != \
                             file_in_index['hash']:
                         bisect.insort(changed_files, file_path)
                 else:
@@ -1057,10 +1127,11 @@ class LocalRepository(MultihashFS):
             return
         manifest_file = MANIFEST_FILE
         manifest_path = os.path.join(metadata_path, entity_dir, manifest_file)
-        files = yaml_load(manifest_path)
+        files = load_compact_manifest(manifest_path)
         log.info(output_messages['INFO_EXPORTING_TAG'] % (tag, manifest[STORAGE_SPEC_KEY], storage_dst_type),
                  class_name=LOCAL_REPOSITORY_CLASS_NAME)
-        wp_export_file = pool_factory(ctx_factory=lambda: storage, retry=retry, pb_elts=len(files), pb_desc='files')
+        wp_export_file = pool_factory(ctx_factory=lambda: storage, retry=retry, pb_elts=len(files), pb_desc='files',
+                                      concurrency=self._adaptive_concurrency(self.__config))
 
         lkeys = list(files.keys())
         args = {'wp': wp_export_file, 'store_dst': storage_dst, 'files': files}
@@ -1082,12 +1153,14 @@ class LocalRepository(MultihashFS):
     def _mount_blobs(ctx, links):
         storage = ctx
         file = b''
+        if INLINE_DATA_KEY in links:
+            return base64.b64decode(links[INLINE_DATA_KEY])
 
         for chunk in links['Links']:
             h = chunk['Hash']
             obj = storage.get_object(h)
             if obj:
-                file += obj
+                file += decode_chunk(obj)
             del obj
         return file
 
@@ -8,11 +8,11 @@ import humanize
 from halo import Halo
 
 from ml_git import log
-from ml_git.constants import HASH_FS_CLASS_NAME, STORAGE_LOG
+from ml_git.constants import HASH_FS_CLASS_NAME, PACKS_PATH
 from ml_git.file_system.hashfs import MultihashFS
 from ml_git.file_system.index import FullIndex, Status
 from ml_git.ml_git_message import output_messages
-from ml_git.utils import yaml_load, remove_unnecessary_files
+from ml_git.utils import remove_unnecessary_files
 
 
 class Objects(MultihashFS):
@@ -32,19 +32,17 @@ class Objects(MultihashFS):
         idx = MultihashFS(self._objects_path)
         fidx = FullIndex(self.__spec, index_path)
         findex = fidx.get_index()
-        log_path = os.path.join(self._logpath, STORAGE_LOG)
-        with open(log_path, 'a') as log_file:
-            for k, v in findex.items():
-                if not os.path.exists(os.path.join(ws_path, k)):
-                    deleted_files.append(k)
-                elif v['status'] == Status.a.name:
-                    if persist_data:
-                        idx.fetch_scid(v['hash'], log_file)
-                    v['status'] = Status.u.name
-                    if 'previous_hash' in v:
-                        changed_files.append((v['previous_hash'], k))
-                    else:
-                        added_files.append(k)
+        for k, v in findex.items():
+            if not os.path.exists(os.path.join(ws_path, k)):
+                deleted_files.append(k)
+            elif v['status'] == Status.a.name:
+                if persist_data:
+                    idx.fetch_scid(v['hash'])
+                v['status'] = Status.u.name
+                if 'previous_hash' in v:
+                    changed_files.append((v['previous_hash'], k))
+                else:
+                    added_files.append(k)
         if persist_data:
             fidx.get_manifest_index().save()
         return changed_files, deleted_files, added_files
@@ -52,8 +50,7 @@ class Objects(MultihashFS):
     def _get_used_blobs(self, descriptor_hashes):
         used_blobs = []
         for file in descriptor_hashes:
-            descriptor_path = self._get_hashpath(file)
-            descriptor = yaml_load(descriptor_path)
+            descriptor = self.load(file)
             for hash in descriptor['Links']:
                 used_blobs.append(hash['Hash'])
         used_blobs.extend(descriptor_hashes)
@@ -62,6 +59,12 @@ class Objects(MultihashFS):
     def garbage_collector(self, blobs_hashes):
         used_blobs = self._get_used_blobs(blobs_hashes)
         count_removed_objects, reclaimed_objects_space = remove_unnecessary_files(used_blobs,
-                                                                                  os.path.join(self._objects_path, HASH_FS_CLASS_NAME.lower()))
+                                                                                  os.path.join(self._objects_path, HASH_FS_CLASS_NAME.lower()),
+                                                                                  ignored_dirs=[PACKS_PATH, os.path.basename(self._logpath)])
+        used_blobs = set(used_blobs)
+        count_removed_packed, reclaimed_packed_space = self._packs.rewrite(lambda key: key in used_blobs)
+        count_removed_objects += count_removed_packed
+        reclaimed_objects_space += reclaimed_packed_space
+        self.rebuild_objects_filter()
         log.debug(output_messages['INFO_REMOVED_FILES'] % (humanize.intword(count_removed_objects), self._objects_path))
         return count_removed_objects, reclaimed_objects_space
@@ -0,0 +1,199 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+
+from ml_git import log
+from ml_git.constants import HASH_FS_CLASS_NAME, OBJECTS_FILTER_FALSE_POSITIVE_RATE, OBJECTS_FILTER_MIN_CAPACITY
+from ml_git.ml_git_message import output_messages
+
+'''Existence filter of the objects of a MultihashFS.
+The keys of the objects are kept in an exact set (an SQLite table) and in a Bloom filter built from it.
+A key missing from the Bloom filter is certainly not in the objects store, so the lookup does not touch
+the filesystem; a key present in it may still be missing and must be checked in the store.'''
+
+FILTER_MAGIC = b'MLGITBLM'
+FILTER_VERSION = 1
+FILTER_HEADER = struct.Struct('>8sIQIQQ')
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity, false_positive_rate=OBJECTS_FILTER_FALSE_POSITIVE_RATE, nbits=None, nhashes=None, bits=None):
+        self.capacity = capacity
+        self.nbits = nbits or max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)))
+        self.nhashes = nhashes or max(1, int(round(self.nbits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.nbits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack('>QQ', digest)
+        h2 |= 1
+        return ((h1 + i * h2) % self.nbits for i in range(self.nhashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ObjectsFilter(object):
+    """Bloom filter of the objects of a MultihashFS, persisted next to the exact set of their keys.
+
+    Keys are appended to the set as soon as their object is written, and the filter file records the last
+    key it covers, so loading it only adds the keys stored since it was saved. A key missing from the filter
+    is looked up among the keys stored since then, by other instances or processes, before it is reported as
+    missing. The filter is grown from the set when it holds more keys than it was sized for. Until it is built
+    (for a new objects store, or by fsck and gc), every key may be present and lookups fall back to the filesystem.
+    """
+
+    def __init__(self, db_path, filter_path):
+        self._db_path = db_path
+        self._filter_path = filter_path
+        self._connection = None
+        self._filter = None
+        self._count = 0
+        self._last_seq = 0
+        self._lock = threading.RLock()
+
+    def _get_connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
+            self._connection = sqlite3.connect(self._db_path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            # keys lost on a system crash are restored by the next fsck or gc
+            self._connection.execute('PRAGMA synchronous = OFF')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS objects (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE)')
+        return self._connection
+
+    def is_enabled(self):
+        return self._filter is not None or os.path.exists(self._db_path)
+
+    def _load(self):
+        if self._filter is not None:
+            return self._filter
+        if not os.path.exists(self._db_path):
+            return None
+        self._read_filter_file()
+        connection = self._get_connection()
+        if self._filter is None:
+            self._rebuild_filter(connection)
+            return self._filter
+        added = self._add_keys_since(connection, self._last_seq)
+        if self._count > self._filter.capacity:
+            self._rebuild_filter(connection)
+        elif added > 0:
+            self._save()
+        return self._filter
+
+    def _read_filter_file(self):
+        try:
+            with open(self._filter_path, 'rb') as filter_file:
+                magic, version, nbits, nhashes, count, last_seq = FILTER_HEADER.unpack(filter_file.read(FILTER_HEADER.size))
+                bits = bytearray(filter_file.read())
+        except (OSError, struct.error):
+            return
+        if magic != FILTER_MAGIC or version != FILTER_VERSION or len(bits) != (nbits + 7) // 8:
+            log.debug(output_messages['DEBUG_INVALID_OBJECTS_FILTER'] % self._filter_path, class_name=HASH_FS_CLASS_NAME)
+            return
+        capacity = max(OBJECTS_FILTER_MIN_CAPACITY, int(nbits * math.log(2) ** 2 / -math.log(OBJECTS_FILTER_FALSE_POSITIVE_RATE)))
+        self._filter = BloomFilter(capacity, nbits=nbits, nhashes=nhashes, bits=bits)
+        self._count = count
+        self._last_seq = last_seq
+
+    def _add_keys_since(self, connection, last_seq):
+        added = 0
+        for seq, key in connection.execute('SELECT seq, key FROM objects WHERE seq > ? ORDER BY seq', (last_seq,)):
+            self._filter.add(key)
+            self._last_seq = seq
+            added += 1
+        self._count += added
+        return added
+
+    def _rebuild_filter(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+        self._filter = BloomFilter(max(OBJECTS_FILTER_MIN_CAPACITY, 2 * count))
+        self._count, self._last_seq = 0, 0
+        self._add_keys_since(connection, 0)
+        self._save()
+        log.debug(output_messages['DEBUG_OBJECTS_FILTER_BUILT'] % (self._count, self._filter.nbits // 8), class_name=HASH_FS_CLASS_NAME)
+
+    def _save(self):
+        # each writer has its own temporary file, as add workers and other ml-git runs may save the filter at once
+        fd, tmp_filter_path = tempfile.mkstemp(dir=os.path.dirname(self._filter_path),
+                                               prefix=os.path.basename(self._filter_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as filter_file:
+                filter_file.write(FILTER_HEADER.pack(FILTER_MAGIC, FILTER_VERSION, self._filter.nbits, self._filter.nhashes,
+                                                     self._count, self._last_seq))
+                filter_file.write(self._filter.bits)
+            os.replace(tmp_filter_path, self._filter_path)
+        except OSError as e:
+            # the keys not covered by the saved filter are read from the set on the next load
+            log.debug(output_messages['DEBUG_OBJECTS_FILTER_NOT_SAVED'] % (self._filter_path, e), class_name=HASH_FS_CLASS_NAME)
+            if os.path.exists(tmp_filter_path):
+                os.remove(tmp_filter_path)
+
+    def might_contain(self, key):
+        """Returns False only if key is certainly not in the objects store."""
+        with self._lock:
+            bloom_filter = self._load()
+            if bloom_filter is None or key in bloom_filter:
+                return True
+            connection = self._get_connection()
+            if self._add_keys_since(connection, self._last_seq) == 0:
+                return False
+            if self._count > self._filter.capacity:
+                self._rebuild_filter(connection)
+            return key in self._filter
+
+    def add(self, key):
+        with self._lock:
+            if self._load() is None:
+                return
+            connection = self._get_connection()
+            cursor = connection.execute('INSERT OR IGNORE INTO objects (key) VALUES (?)', (key,))
+            connection.commit()
+            if cursor.rowcount == 0:
+                return
+            if cursor.lastrowid == self._last_seq + 1:
+                self._filter.add(key)
+                self._count += 1
+                self._last_seq = cursor.lastrowid
+            else:
+                # keys stored by other instances since the last read come before this one
+                self._add_keys_since(connection, self._last_seq)
+            if self._count > self._filter.capacity:
+                self._rebuild_filter(connection)
+
+    def rebuild(self, keys):
+        """Replaces the set and the filter with keys, the objects found in the store."""
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute('DELETE FROM objects')
+            connection.executemany('INSERT OR IGNORE INTO objects (key) VALUES (?)', ((key,) for key in keys))
+            connection.commit()
+            self._rebuild_filter(connection)
+
+    def save(self):
+        with self._lock:
+            if self._filter is not None:
+                self._save()
+
+    def close(self):
+        with self._lock:
+            self.save()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,223 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import uuid
+
+from ml_git import log
+from ml_git.constants import HASH_FS_CLASS_NAME, PACK_MAX_SIZE
+from ml_git.ml_git_message import output_messages
+from ml_git.utils import ensure_path_exists
+
+'''Packfiles for MultihashFS.
+Small objects are appended to a .pack file and located through a .idx file that holds
+fixed-size records (key, offset, size) sorted by key, so a lookup is a binary search.'''
+
+PACK_EXTENSION = '.pack'
+INDEX_EXTENSION = '.idx'
+INDEX_MAGIC = b'MLGITIDX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('>8sII')
+INDEX_KEY_SIZE = 64
+INDEX_RECORD = struct.Struct('>%dsQQ' % INDEX_KEY_SIZE)
+
+
+class PackIndex(object):
+
+    def __init__(self, index_path):
+        self.pack_path = index_path[:-len(INDEX_EXTENSION)] + PACK_EXTENSION
+        self._file = open(index_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise RuntimeError(output_messages['ERROR_INVALID_PACK_INDEX'] % index_path)
+
+    def __len__(self):
+        return self._count
+
+    def _record(self, position):
+        key, offset, size = INDEX_RECORD.unpack_from(self._map, INDEX_HEADER.size + position * INDEX_RECORD.size)
+        return key.rstrip(b'\0'), offset, size
+
+    def find(self, key):
+        key = key.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, offset, size = self._record(middle)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return offset, size
+        return None
+
+    def entries(self):
+        for position in range(self._count):
+            key, offset, size = self._record(position)
+            yield key.decode(), offset, size
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class PackStore(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._indexes = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._indexes is not None and mtime == self._mtime:
+                return self._indexes
+            self._close_indexes()
+            indexes = []
+            if mtime is not None:
+                for file in sorted(os.listdir(self._path)):
+                    if file.endswith(INDEX_EXTENSION):
+                        indexes.append(PackIndex(os.path.join(self._path, file)))
+            self._indexes = indexes
+            self._mtime = mtime
+            return indexes
+
+    def _close_indexes(self):
+        for index in self._indexes or []:
+            index.close()
+        self._indexes = None
+
+    def close(self):
+        with self._lock:
+            self._close_indexes()
+
+    def _find(self, key):
+        for index in self._indexes if self._indexes is not None else self._load():
+            location = index.find(key)
+            if location is not None:
+                return index.pack_path, location
+        return None
+
+    def contains(self, key):
+        if self._find(key) is not None:
+            return True
+        # another process may have repacked since the indexes were loaded
+        self._load()
+        return self._find(key) is not None
+
+    def locate(self, key):
+        """Returns the (pack_path, offset, size) of key or None if it is not packed."""
+        found = self._find(key)
+        if found is None:
+            self._load()
+            found = self._find(key)
+        if found is None:
+            return None
+        pack_path, (offset, size) = found
+        return pack_path, offset, size
+
+    def read(self, key):
+        location = self.locate(key)
+        if location is None:
+            return None
+        pack_path, offset, size = location
+        with open(pack_path, 'rb') as pack_file:
+            pack_file.seek(offset)
+            return pack_file.read(size)
+
+    def entries(self):
+        for index in self._load():
+            for key, offset, size in index.entries():
+                yield key, index.pack_path, offset, size
+
+    def keys(self):
+        return [key for key, _, _, _ in self.entries()]
+
+    def pack_files(self):
+        return [index.pack_path for index in self._load()]
+
+    def write(self, objects, max_pack_size=PACK_MAX_SIZE):
+        """Appends the (key, data_loader) pairs of objects to new packs and returns the keys packed.
+        data_loader is called only when the object is written, to keep memory usage bounded."""
+        ensure_path_exists(self._path)
+        packed_keys = []
+        records = []
+        pack_file, tmp_pack_path, pack_size = None, None, 0
+        for key, data_loader in objects:
+            if len(key.encode()) > INDEX_KEY_SIZE:
+                continue
+            if pack_file is None:
+                tmp_pack_path = os.path.join(self._path, 'tmp-%s%s' % (uuid.uuid4().hex, PACK_EXTENSION))
+                pack_file = open(tmp_pack_path, 'wb')
+                pack_size = 0
+            data = data_loader()
+            pack_file.write(data)
+            records.append((key.encode(), pack_size, len(data)))
+            pack_size += len(data)
+            if pack_size >= max_pack_size:
+                pack_file.close()
+                packed_keys.extend(self._commit_pack(tmp_pack_path, records))
+                pack_file, records = None, []
+        if pack_file is not None:
+            pack_file.close()
+            packed_keys.extend(self._commit_pack(tmp_pack_path, records))
+        return packed_keys
+
+    def _commit_pack(self, tmp_pack_path, records):
+        records.sort()
+        pack_id = hashlib.sha1(b''.join(key for key, _, _ in records)).hexdigest()
+        pack_path = os.path.join(self._path, 'pack-%s%s' % (pack_id, PACK_EXTENSION))
+        index_path = pack_path[:-len(PACK_EXTENSION)] + INDEX_EXTENSION
+        tmp_index_path = tmp_pack_path[:-len(PACK_EXTENSION)] + INDEX_EXTENSION
+        with open(tmp_index_path, 'wb') as index_file:
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(records)))
+            for key, offset, size in records:
+                index_file.write(INDEX_RECORD.pack(key, offset, size))
+        # the index is renamed last, so readers never find an index without its pack
+        os.replace(tmp_pack_path, pack_path)
+        os.replace(tmp_index_path, index_path)
+        log.debug(output_messages['DEBUG_PACK_CREATED'] % (pack_path, len(records)), class_name=HASH_FS_CLASS_NAME)
+        return [key.decode() for key, _, _ in records]
+
+    def remove_pack(self, pack_path):
+        self.close()
+        os.unlink(pack_path[:-len(PACK_EXTENSION)] + INDEX_EXTENSION)
+        os.unlink(pack_path)
+
+    def rewrite(self, keep):
+        """Rewrites the packs holding objects for which keep(key) is False, dropping those objects.
+        Returns the number of objects and bytes removed."""
+        removed_count, removed_size = 0, 0
+        for pack_path in self.pack_files():
+            entries = [(key, offset, size) for key, path, offset, size in self.entries() if path == pack_path]
+            kept = [(key, offset, size) for key, offset, size in entries if keep(key)]
+            if len(kept) == len(entries):
+                continue
+            removed_count += len(entries) - len(kept)
+            removed_size += sum(size for _, _, size in entries) - sum(size for _, _, size in kept)
+            if kept:
+                with open(pack_path, 'rb') as pack_file:
+                    self.write((key, self._loader(pack_file, offset, size)) for key, offset, size in sorted(kept, key=lambda e: e[1]))
+            self.remove_pack(pack_path)
+        return removed_count, removed_size
+
+    @staticmethod
+    def _loader(pack_file, offset, size):
+        def load():
+            pack_file.seek(offset)
+            return pack_file.read(size)
+        return load
@@ -0,0 +1,79 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import sqlite3
+import threading
+
+from ml_git.constants import VERIFIED_OBJECTS_FLUSH_SIZE
+
+
+class VerifiedObjects(object):
+    """Persistent record of the objects whose content was hashed and matched their CID.
+
+    Each record stores the inode, mtime and size of the file that held the object when it was verified.
+    A record is only trusted while that file is unchanged, so replacing or rewriting an object file
+    makes it be verified again.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._connection = None
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    def _get_connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._connection = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            # the records only save work, losing the last ones on a crash is harmless
+            self._connection.execute('PRAGMA synchronous = OFF')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS verified (key TEXT PRIMARY KEY, inode INTEGER, mtime INTEGER, size INTEGER)')
+        return self._connection
+
+    @staticmethod
+    def _stamp(stat):
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def is_verified(self, key, stat):
+        with self._lock:
+            stamp = self._pending.get(key)
+            if stamp is None:
+                if not self._pending and not os.path.exists(self._path):
+                    return False
+                stamp = self._get_connection().execute('SELECT inode, mtime, size FROM verified WHERE key = ?', (key,)).fetchone()
+        return stamp is not None and tuple(stamp) == self._stamp(stat)
+
+    def mark(self, key, stat):
+        with self._lock:
+            self._pending[key] = self._stamp(stat)
+            if len(self._pending) >= VERIFIED_OBJECTS_FLUSH_SIZE:
+                self.flush()
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pending.pop(key, None)
+            if os.path.exists(self._path):
+                connection = self._get_connection()
+                connection.executemany('DELETE FROM verified WHERE key = ?', ((key,) for key in keys))
+                connection.commit()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            connection = self._get_connection()
+            connection.executemany('INSERT OR REPLACE INTO verified (key, inode, mtime, size) VALUES (?, ?, ?, ?)',
+                                   ((key,) + stamp for key, stamp in self._pending.items()))
+            connection.commit()
+            self._pending = {}
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
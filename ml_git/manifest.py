@@ -3,26 +3,157 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import os
+import zlib
 from pprint import pformat
 
 from halo import Halo
 
-from ml_git.utils import yaml_load, yaml_save
+from ml_git.constants import MANIFEST_SHARDS_DIR, MANIFEST_SHARDS_ROOT, MANIFEST_SHARD_FILE, MANIFEST_SHARDS_SPEC_KEY
+from ml_git.ml_git_message import output_messages
+from ml_git.utils import yaml_load, yaml_save, ensure_path_exists
+
+# layout of the sharded manifests
+MANIFEST_SHARDS_VERSION = 1
+
+
+def get_manifest_shards(manifest):
+    """Returns the number of shards the MANIFEST.yaml of the entity is split into (0 keeps a single file)."""
+    shards = manifest.get(MANIFEST_SHARDS_SPEC_KEY) if manifest else None
+    if not shards:
+        return 0
+    try:
+        shards = int(shards)
+    except (TypeError, ValueError):
+        shards = 0
+    if shards <= 0:
+        raise RuntimeError(output_messages['ERROR_INVALID_MANIFEST_SHARDS'] % manifest.get(MANIFEST_SHARDS_SPEC_KEY))
+    return shards
+
+
+def shard_of(key, shards):
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def get_shards_path(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path), MANIFEST_SHARDS_DIR)
+
+
+def get_shards_count(manifest_path):
+    """Returns the number of shards of the manifest at manifest_path, or 0 if it is a single file."""
+    root = yaml_load(os.path.join(get_shards_path(manifest_path), MANIFEST_SHARDS_ROOT))
+    return int(root.get(MANIFEST_SHARDS_SPEC_KEY, 0)) if root else 0
+
+
+def get_manifest_files(manifest_path):
+    """Returns the files holding the manifest at manifest_path: its shards or the MANIFEST.yaml itself."""
+    shards = get_shards_count(manifest_path)
+    if not shards:
+        return [manifest_path]
+    shards_path = get_shards_path(manifest_path)
+    paths = [os.path.join(shards_path, MANIFEST_SHARD_FILE % shard) for shard in range(shards)]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def manifest_exists(manifest_path):
+    return os.path.isfile(manifest_path) or get_shards_count(manifest_path) > 0
+
+
+def load_manifest(manifest_path):
+    """Loads the manifest at manifest_path as a dict of sets, whether it is a single file or sharded."""
+    if not get_shards_count(manifest_path):
+        return yaml_load(manifest_path)
+    manifest = {}
+    for path in get_manifest_files(manifest_path):
+        manifest.update(yaml_load(path) or {})
+    return manifest
 
 
 class Manifest(object):
-    def __init__(self, manifest):
+    def __init__(self, manifest, shards=0):
         self._mfpath = manifest
-        self._manifest = yaml_load(manifest)
+        # a sharded manifest keeps its layout, a single file is split on its next save if shards is set;
+        # _dirty_shards holds the shards to rewrite on save (None rewrites all of them)
+        self._shards = get_shards_count(manifest)
+        self._dirty_shards = set()
+        # shards are read when one of their keys is used, or all of them when the whole manifest is
+        self._pending_shards = set(range(self._shards))
+        self._data = {} if self._shards else yaml_load(manifest)
+        if not self._shards and shards:
+            self._shards = shards
+            self._dirty_shards = None
+        # reverse map {file: key}, built on first lookup by file and then kept up to date;
+        # a file under more than one key has the others in _other_keys
+        self._file_keys = None
+        self._other_keys = {}
+
+    @property
+    def _manifest(self):
+        for shard in sorted(self._pending_shards):
+            self._load_shard(shard)
+        return self._data
+
+    def _load_shard(self, shard):
+        self._pending_shards.discard(shard)
+        path = os.path.join(get_shards_path(self._mfpath), MANIFEST_SHARD_FILE % shard)
+        if os.path.exists(path):
+            self._data.update(yaml_load(path) or {})
+
+    def _keyed(self, key):
+        """Returns the manifest with the shard of key loaded."""
+        if self._pending_shards:
+            shard = shard_of(key, self._shards)
+            if shard in self._pending_shards:
+                self._load_shard(shard)
+        return self._data
+
+    def _get_file_keys(self):
+        if self._file_keys is None:
+            file_keys, other_keys = {}, {}
+            for key, files in self._manifest.items():
+                if isinstance(files, dict):
+                    continue
+                for file in files:
+                    if file in file_keys:
+                        other_keys.setdefault(file, set()).add(key)
+                    else:
+                        file_keys[file] = key
+            self._file_keys, self._other_keys = file_keys, other_keys
+        return self._file_keys
+
+    def _map_file(self, key, file):
+        if self._file_keys is None or not isinstance(file, str):
+            return
+        if self._file_keys.setdefault(file, key) != key:
+            self._other_keys.setdefault(file, set()).add(key)
+
+    def _unmap_file(self, key, file):
+        if self._file_keys is None or not isinstance(file, str):
+            return
+        other_keys = self._other_keys.get(file)
+        if self._file_keys.get(file) == key:
+            if other_keys:
+                self._file_keys[file] = other_keys.pop()
+            else:
+                del self._file_keys[file]
+        elif other_keys:
+            other_keys.discard(key)
+        if other_keys is not None and not other_keys:
+            del self._other_keys[file]
+
+    def _touch(self, key):
+        if self._shards and self._dirty_shards is not None:
+            self._dirty_shards.add(shard_of(key, self._shards))
 
     def add(self, key, file, previous_key=None):
-        mf = self._manifest
+        mf = self._keyed(key)
+        self._touch(key)
 
         from ml_git.file_system.index import Status
         if previous_key is not None and \
                 ((file is not None) and ('status' in file and file['status'] != Status.c.name)
                  or ('status' not in file)):
-            if previous_key in mf and file in mf[previous_key]:
+            if previous_key in self._keyed(previous_key) and file in mf[previous_key]:
                 self.rm(previous_key, file)
 
         try:
@@ -30,23 +161,29 @@ class Manifest(object):
         except Exception:
             if type(file) is dict:
                 mf[key] = file
+                return
             else:
                 mf[key] = {file}
+        self._map_file(key, file)
 
     def merge(self, manifest):
-        mf = yaml_load(manifest)
-        smf = self._manifest
-
+        mf = yaml_load(manifest) if isinstance(manifest, str) else manifest
         for k in mf:
+            smf = self._keyed(k)
+            self._touch(k)
             try:
                 smf[k] = smf[k].union(mf[k])
             except Exception:
                 smf[k] = mf[k]
+            if not isinstance(mf[k], dict):
+                for file in mf[k]:
+                    self._map_file(k, file)
 
     def rm(self, key, file):
-        mf = self._manifest
+        mf = self._keyed(key)
         if key not in mf:
             return False
+        self._touch(key)
         try:
             files = mf[key]
             if len(files) == 1:
@@ -54,62 +191,56 @@ class Manifest(object):
             else:
                 files.remove(file)
                 mf[key] = files
+                self._unmap_file(key, file)
         except Exception as e:
             print(e)
             return False
         return True
 
     def rm_file(self, file):
-        mf = self._manifest
-        for key in mf:
-            files = mf[key]
-            if file not in files:
-                continue
-            if len(files) == 1:
-                self.__rm(key)
-            else:
-                files.remove(file)
-                mf[key] = files
-            return True
-        return False
+        key = self.search(file)
+        if key is None:
+            return False
+        return self.rm(key, file)
 
     def __rm(self, key):
-        mf = self._manifest
+        mf = self._keyed(key)
         try:
+            files = mf[key]
             del(mf[key])
+            self._touch(key)
         except Exception as e:
             print(e)
             return False
+        if not isinstance(files, dict):
+            for file in files:
+                self._unmap_file(key, file)
         return True
 
     def rm_key(self, key):
         self.__rm(key)
 
     def exists(self, key):
-        return key in self._manifest
+        return key in self._keyed(key)
 
     def search(self, file):
-        mf = self._manifest
-        for key in mf:
-            if file in mf[key]:
-                return key
-        return None
+        return self._get_file_keys().get(file)
 
     def __iter__(self):
         for key in self._manifest.keys():
             yield key
 
     def __getitem__(self, key):
-        return self._manifest[key]
+        return self._keyed(key)[key]
 
     def get(self, key):
         try:
-            return self._manifest[key]
+            return self._keyed(key)[key]
         except Exception:
             return None
 
     def exists_keyfile(self, key, file):
-        mf = self._manifest
+        mf = self._keyed(key)
         try:
             files = mf[key]
             return file in files
@@ -124,10 +255,33 @@ class Manifest(object):
         return pformat(self._manifest, indent=4)
 
     def save(self):
-        yaml_save(self._manifest, self._mfpath)
+        if not self._shards:
+            yaml_save(self._manifest, self._mfpath)
+            return
+        shards_path = get_shards_path(self._mfpath)
+        ensure_path_exists(shards_path)
+        shards = range(self._shards) if self._dirty_shards is None else self._dirty_shards
+        contents = {shard: {} for shard in shards}
+        # the shards to rewrite are loaded, as each of them had a key changed
+        for key, files in self._data.items():
+            content = contents.get(shard_of(key, self._shards))
+            if content is not None:
+                content[key] = files
+        for shard, content in contents.items():
+            path = os.path.join(shards_path, MANIFEST_SHARD_FILE % shard)
+            if content:
+                yaml_save(content, path)
+            elif os.path.exists(path):
+                os.unlink(path)
+        if self._dirty_shards is None:
+            root = {'version': MANIFEST_SHARDS_VERSION, MANIFEST_SHARDS_SPEC_KEY: self._shards}
+            yaml_save(root, os.path.join(shards_path, MANIFEST_SHARDS_ROOT))
+            if os.path.exists(self._mfpath):
+                os.unlink(self._mfpath)
+        self._dirty_shards = set()
 
     def load(self):
-        return yaml_load(self._mfpath)
+        return load_manifest(self._mfpath)
 
     def get_diff(self, manifest_to_compare):
         result = {}
@@ -146,20 +300,18 @@ class Manifest(object):
     @Halo(text='Comparing MANIFEST files', spinner='dots')
     def compare_files(self, manifest_to_compare):
         added_files, modified_files = [], []
-        current_files_hash = {}
-
-        for key in self._manifest:
-            for file in self._manifest[key]:
-                current_files_hash[file] = key
+        current_files_hash = self._get_file_keys()
+        compared_files = set()
 
         for key in manifest_to_compare:
             for file in manifest_to_compare[key]:
-                if file not in current_files_hash:
+                current_key = current_files_hash.get(file)
+                if current_key is None:
                     added_files.append(file)
                 else:
-                    if current_files_hash[file] != key:
+                    if current_key != key and key not in self._other_keys.get(file, ()):
                         modified_files.append(file)
-                    del current_files_hash[file]
+                    compared_files.add(file)
 
-        deleted_files = current_files_hash.keys()
+        deleted_files = [file for file in current_files_hash if file not in compared_files]
         return added_files, deleted_files, modified_files
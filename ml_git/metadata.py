@@ -15,7 +15,9 @@ from ml_git.config import get_refs_path, get_sample_spec_doc
 from ml_git.constants import METADATA_CLASS_NAME, LOCAL_REPOSITORY_CLASS_NAME, ROOT_FILE_NAME, MutabilityType, \
     SPEC_EXTENSION, MANIFEST_FILE, EntityType, STORAGE_SPEC_KEY, DATASET_SPEC_KEY, LABELS_SPEC_KEY, \
     MLGIT_IGNORE_FILE_NAME
-from ml_git.manifest import Manifest
+from ml_git.compact_manifest import load_compact_manifest
+from ml_git.file_system.index_store import ManifestIndexStore
+from ml_git.manifest import Manifest, get_manifest_shards
 from ml_git.ml_git_message import output_messages
 from ml_git.plugin_interface.data_plugin_constants import ADD_METADATA
 from ml_git.plugin_interface.plugin_especialization import PluginCaller
@@ -63,7 +65,8 @@ class Metadata(MetadataManager):
 
         ensure_path_exists(full_metadata_path)
 
-        ret = self.__commit_manifest(full_metadata_path, index_path, changed_files, mutability)
+        shards = get_manifest_shards(metadata[get_spec_key(self.__repo_type)].get('manifest'))
+        ret = self.__commit_manifest(full_metadata_path, index_path, changed_files, mutability, shards)
         if ret is False:
             log.info(output_messages['INFO_NO_FILES_COMMIT_FOR'] % self._spec, class_name=METADATA_CLASS_NAME)
             return None, None
@@ -110,21 +113,23 @@ class Metadata(MetadataManager):
         return full_metadata_path, entity_dir, metadata
 
     @Halo(text='Commit manifest', spinner='dots')
-    def __commit_manifest(self, full_metadata_path, index_path, changed_files, mutability):
+    def __commit_manifest(self, full_metadata_path, index_path, changed_files, mutability, shards=0):
         # Append index/files/MANIFEST.yaml to .ml-git/dataset/metadata/ <categories>/MANIFEST.yaml
-        idx_path = os.path.join(index_path, 'metadata', self._spec, MANIFEST_FILE)
-        if os.path.exists(idx_path) is False:
+        idx_path = os.path.join(index_path, 'metadata', self._spec)
+        idx_manifest = ManifestIndexStore(idx_path)
+        if not idx_manifest.is_saved():
             log.error(output_messages['ERROR_NO_MANIFEST_FILE_FOUND'] % idx_path, class_name=METADATA_CLASS_NAME)
             return False
         full_path = os.path.join(full_metadata_path, MANIFEST_FILE)
-        mobj = Manifest(full_path)
+        mobj = Manifest(full_path, shards)
         if mutability == MutabilityType.MUTABLE.value or mutability == MutabilityType.FLEXIBLE.value:
             for key, file in changed_files:
                 mobj.rm(key, file)
-        mobj.merge(idx_path)
+        mobj.merge(idx_manifest.load())
         mobj.save()
         del (mobj)
-        os.unlink(idx_path)
+        idx_manifest.remove()
+        idx_manifest.close()
         return True
 
     def get_metadata_path(self, tag):
@@ -221,7 +226,7 @@ class Metadata(MetadataManager):
 
     def _get_amount_and_size_of_workspace_files(self, full_metadata_path, ws_path):
         full_path = os.path.join(full_metadata_path, MANIFEST_FILE)
-        metadata_file = yaml_load(full_path)
+        metadata_file = load_compact_manifest(full_path)
         amount = 0
         workspace_size = 0
         for values in metadata_file.values():
@@ -18,7 +18,7 @@ doc = '''
 
 output_messages = {
     'DEBUG_REMOVE_REMOTE': 'Removing remote from local repository [%s]',
-    'DEBUG_BUILDING_STORAGE_LOG': 'Building the storage.log with these added files',
+    'DEBUG_BUILDING_STORAGE_LOG': 'Building the push journal with these added files',
     'DEBUG_OBJECT_ALREADY_IN_STORAGE': 'Object [%s] already in %s storage',
     'DEBUG_STORAGE_AND_BUCKET': 'Storage [%s] ; bucket [%s]',
     'DEBUG_CHECKSUM_VERIFIED': 'Checksum verified for chunk [%s]',
@@ -43,6 +43,11 @@ output_messages = {
     'DEBUG_COMMIT_SPEC': 'Commit spec [%s] to ml-git metadata',
     'DEBUG_NEW_TAG_CREATED': 'New tag created [%s]',
     'DEBUG_CREATE_WORKER_POOL': 'Create a worker pool with [%d] threads & retry strategy of [%d]',
+    'DEBUG_CREATE_ADAPTIVE_WORKER_POOL': 'Adapt the concurrency of the worker pool between [%d] and [%d] tasks',
+    'DEBUG_CONCURRENCY_INCREASED': 'Concurrency limit increased from [%d] to [%d]: mean latency [%.3f]s, throughput [%.1f] tasks/s',
+    'DEBUG_CONCURRENCY_HELD': 'Concurrency limit held at [%d]: throughput dropped from [%.1f] to [%.1f] tasks/s',
+    'DEBUG_CONCURRENCY_LATENCY': 'Concurrency limit decreased from [%d] to [%d]: mean latency [%.3f]s above [%.3f]s',
+    'DEBUG_CONCURRENCY_THROTTLED': 'Concurrency limit decreased from [%d] to [%d] after a throttling error: %s',
     'DEBUG_WAIT_BEFORE_NEXT_ATTEMP': 'Wait [%d] before next attempt',
     'DEBUG_WORKER_SUCESS': 'Worker success at attempt [%d]',
     'DEBUG_SETTING_HEAD': 'Setting head of [%s] to [%s]-[%s]',
@@ -55,9 +60,18 @@ output_messages = {
     'DEBUG_UPDATE_LOG': 'Update hashfs log',
     'DEBUG_UPDATE_LOG_LIST_FILES': 'Update hashfs log with a list of files to keep',
     'DEBUG_UPDATE_LOG_KEY': 'Update log for key [%s]',
-    'DEBUG_LOADING_LOG': 'Loading log file',
+    'DEBUG_LOADING_LOG': 'Loading push journal',
+    'DEBUG_INLINE_FILE': 'Embedding file [%s] (%d bytes) in its descriptor',
+    'DEBUG_DESCRIPTOR_CACHE_STATS': 'Descriptor cache: %d hits, %d misses (%.1f%% hit rate), %d entries',
+    'DEBUG_OBJECTS_FILTER_BUILT': 'Objects filter built with %d keys (%d bytes)',
+    'DEBUG_INVALID_OBJECTS_FILTER': 'Ignoring invalid objects filter [%s]',
+    'DEBUG_OBJECTS_FILTER_NOT_SAVED': 'Could not save the objects filter [%s]: %s',
+    'DEBUG_INDEX_FILE_IMPORTED': 'Imported %d entries of [%s] into the index database',
     'DEBUG_CHUNK_ALREADY_EXISTS': 'Chunk [%s]-[%d] already exists',
     'DEBUG_ADDING_CHUNK': 'Add chunk [%s]-[%d]',
+    'DEBUG_PARALLEL_HASHING': 'Hashing [%s] with [%d] blocks using [%d] threads',
+    'DEBUG_PACK_CREATED': 'Created pack [%s] with [%d] objects',
+    'DEBUG_CONTENT_DEFINED_CHUNKING': 'Hashing [%s] with content-defined chunking (avg chunk size [%d])',
     'DEBUG_GET_CHUNK': 'Get chunk [%s]-[%d]',
     'DEBUG_BLOB_ALREADY_COMMITED': 'Blob %s already commited',
     'DEBUG_REMOVING_FILE': 'Removing file [%s]',
@@ -88,6 +102,7 @@ output_messages = {
     'DEBUG_LOCAL_CONFIG_FILE_NOT_EXISTS': 'Local config file does not exist',
     'DEBUG_MERGING_LOCAL_AND_GLOBAL_CONFIG': 'Merging local and global configuration files',
 
+    'INFO_TRANSFER_STATS': 'Transfer limits: %d requests, %s transferred, %.1f s spent throttled',
     'INFO_INITIALIZED_PROJECT_IN': 'Initialized empty ml-git repository in %s',
     'INFO_ADD_REMOTE': 'Add remote repository [%s] for [%s]',
     'INFO_CHECKOUT_LATEST_TAG': 'Performing checkout on the entity\'s lastest tag (%s)',
@@ -102,6 +117,8 @@ output_messages = {
     'INFO_STARTING_GC': 'Starting the garbage collector for %s',
     'INFO_REMOVED_FILES': 'A total of %s files have been removed from %s',
     'INFO_RECLAIMED_SPACE': 'Total reclaimed space %s.',
+    'INFO_STARTING_REPACK': 'Packing loose objects of %s',
+    'INFO_REPACK_FINISHED': 'A total of %s objects have been packed in %s',
     'INFO_ENTITY_DELETED': 'Entity %s was deleted',
     'INFO_WRONG_ENTITY_TYPE': 'Metrics cannot be added to this entity: [%s].',
     'INFO_PROJECT_UPDATE_SUCCESSFULLY': 'Project updated successfully',
@@ -166,6 +183,9 @@ output_messages = {
     'INFO_SPEC_NOT_HAVE_MUTABILITY': 'The spec does not have the \'mutability\' property set. Default: strict.',
     'INFO_STARTING_INTEGRITY_CHECK': 'Starting integrity check on [{}]',
     'INFO_FINISH_INTEGRITY_CHECK': 'Finished integrity check on [{}]',
+    'INFO_RESUMING_INTEGRITY_CHECK': 'Resuming integrity check on [%s] (%d of %d directories already checked)',
+    'INFO_INTEGRITY_CHECK_THROUGHPUT': 'Checked %s in %d files in %.1fs (%s/s)',
+    'INFO_SKIPPED_VERIFIED_OBJECTS': 'Skipped %d objects unchanged since their last verification (use --full-verify to check them)',
     'INFO_REMOVING_CORRUPTED_FILES': 'Removing %s corrupted files',
     'INFO_GETTING_FILE': 'Getting file [%s] from local index',
     'INFO_NO_BLOBS_TO_PUSH': 'No blobs to push at this time.',
@@ -265,6 +285,13 @@ output_messages = {
     'ERROR_NOT_DISK_SPACE': 'There is not enough space in the disk. Remove some files and try again.',
     'ERROR_WHILE_CREATING_FILES': 'An error occurred while creating the files into workspace: %s \n.',
     'ERROR_INVALID_MUTABILITY_TYPE': 'Invalid mutability type.',
+    'ERROR_INVALID_COMPRESSION_CODEC': 'Invalid compression codec [%s]. Available codecs: %s',
+    'ERROR_INVALID_HASH_ALGORITHM': 'Invalid hash algorithm [%s]. Available algorithms: %s',
+    'ERROR_INVALID_COMPRESSED_CHUNK': 'Invalid compressed chunk: expected %d bytes, got %d',
+    'ERROR_INVALID_PACK_INDEX': 'Invalid pack index [%s].',
+    'ERROR_INVALID_CHUNKING_TYPE': 'Invalid chunking type [%s]. Valid values are: %s',
+    'ERROR_INVALID_MANIFEST_SHARDS': 'Invalid number of manifest shards [%s]. It must be a positive integer.',
+    'ERROR_INVALID_CHUNKING_SIZES': 'Invalid chunking sizes: min_size [%d], avg_size [%d] and max_size [%d] must satisfy 0 < min_size <= avg_size <= max_size.',
     'ERROR_CHUNK_WRONG_DIRECTORY': 'Chunk found in wrong directory. Expected [%s]. Found [%s]',
     'ERROR_INVALID_VERSION_INCREMENT': 'Invalid version, could not increment.  File:\n     %s',
     'ERROR_INVALID_VERSION_GET': 'Invalid version, could not get.  File:\n     %s',
@@ -288,6 +315,11 @@ output_messages = {
     'ERROR_NO_ENTITY_LOG': 'No log found for entity [%s]',
     'ERROR_INVALID_BATCH_SIZE': 'The batch size value is invalid in the config file for the [%s] key',
     'ERROR_INVALID_STORAGE_TYPE': 'Invalid storage type.',
+    'ERROR_INVALID_VERIFICATION_POLICY': 'Invalid verification policy [%s] in config file. Valid values are: %s',
+    'ERROR_INVALID_SAMPLE_RATE_IN_CONFIG': 'Invalid value in config file for the [%s] key. This should be a number between 0 and 1.',
+    'ERROR_BACKGROUND_VERIFICATION_FAILED': '%d objects failed the integrity verification: %s. Run fsck with --fix-workspace to repair them.',
+    'ERROR_INVALID_TRANSFER_LIMIT': 'Invalid value in config file for the [%s] or [%s] key. It should be a number greater than or equal to 0.',
+    'ERROR_INVALID_CONCURRENCY_LIMITS': 'Invalid values in config file for the [%s] and [%s] keys. They should be integer numbers with 0 < min <= max.',
     'ERROR_INVALID_VALUE_IN_CONFIG': 'Invalid value in config file for the [%s] key. This is should be a integer number greater than 0.',
     'ERROR_DOWNLOADING_IPLD': 'Error download ipld [%s]',
     'ERROR_DOWNLOAD_BLOG': 'error download blob [%s]',
@@ -5,34 +5,182 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import os
 import random
+import threading
 import time
+from collections import deque
 from concurrent import futures
 
 from tqdm import tqdm
 
 from ml_git import log
-from ml_git.constants import POOL_CLASS_NAME
+from ml_git.constants import POOL_CLASS_NAME, CONCURRENCY_DECREASE_FACTOR, CONCURRENCY_LATENCY_TOLERANCE, \
+    CONCURRENCY_THROUGHPUT_DROP, THROTTLING_ERROR_CODES, POOL_IN_FLIGHT_PER_WORKER, POOL_ROOTS_IN_FLIGHT_SHARE
 from ml_git.error_handler import CriticalErrors
 from ml_git.ml_git_message import output_messages
 
 
-def pool_factory(ctx_factory=None, nworkers=os.cpu_count() * 5, retry=2, pb_elts=None, pb_desc='units', fail_limit=None):
+# marks the end of the items of imap_unordered
+_END = object()
+
+
+def pool_factory(ctx_factory=None, nworkers=os.cpu_count() * 5, retry=2, pb_elts=None, pb_desc='units', fail_limit=None, concurrency=None,
+                 ctx_pool=None):
+    if concurrency is not None:
+        # a thread is kept for each task that the limit may allow
+        nworkers = concurrency.max_limit
+        log.debug(output_messages['DEBUG_CREATE_ADAPTIVE_WORKER_POOL'] % (concurrency.min_limit, concurrency.max_limit),
+                  class_name=POOL_CLASS_NAME)
     log.debug(output_messages['DEBUG_CREATE_WORKER_POOL'] % (nworkers, retry),
               class_name=POOL_CLASS_NAME)
-    ctxs = [ctx_factory() for i in range(nworkers)] if ctx_factory is not None else None
-    return WorkerPool(nworkers=nworkers, pool_ctxs=ctxs, retry=retry, pb_elts=pb_elts, pb_desc=pb_desc, fail_limit=fail_limit)
+    if ctx_pool is None and ctx_factory is not None:
+        ctx_pool = ContextPool(ctx_factory)
+    return WorkerPool(nworkers=nworkers, retry=retry, pb_elts=pb_elts, pb_desc=pb_desc, fail_limit=fail_limit,
+                      concurrency=concurrency, ctx_pool=ctx_pool)
+
+
+class ContextPool(object):
+    """Creates the contexts of the workers with factory when they first need one and reuses the released ones.
+
+    When shared is True, a single context is created and used by all the workers at once.
+    """
+
+    def __init__(self, factory, shared=False):
+        self._factory = factory
+        self._shared = shared
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._shared:
+                if not self._idle:
+                    self.created += 1
+                    self._idle.append(self._factory())
+                return self._idle[0]
+            if self._idle:
+                return self._idle.pop()
+            self.created += 1
+        # the other workers do not wait while a context is created
+        return self._factory()
+
+    def release(self, ctx):
+        if ctx is not None and not self._shared:
+            with self._lock:
+                self._idle.append(ctx)
+
+
+def is_throttling_error(error):
+    """Returns whether error reports that the storage is throttling the requests or failed on its side (HTTP 429 or 5xx)."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        if response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            return True
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    else:
+        status = getattr(error, 'status_code', None) or getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return any(code in str(error) for code in THROTTLING_ERROR_CODES)
+    return status == 429 or status >= 500
+
+
+class AdaptiveConcurrency(object):
+    """Limits the number of tasks of a WorkerPool running at once, adapting the limit between min_limit and max_limit.
+
+    The tasks are observed in windows of as many tasks as the limit. After a window of successful tasks,
+    the limit doubles until its first decrease and then grows by one (additive increase), unless the
+    throughput of the window dropped. It is halved (multiplicative decrease) when a task is throttled or
+    fails with a 5xx error, or when the mean latency of a window exceeds CONCURRENCY_LATENCY_TOLERANCE
+    times the best one observed. Tasks started before a decrease do not cause another one.
+    """
+
+    def __init__(self, min_limit, max_limit):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min_limit
+        self._running = 0
+        self._condition = threading.Condition()
+        self._slow_start = True
+        self._last_decrease = float('-inf')
+        self._best_latency = None
+        self._last_throughput = None
+        self._reset_window(time.perf_counter())
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._window_tasks = 0
+        self._window_latency = 0.0
+
+    def acquire(self):
+        """Waits until the limit allows one more task and returns its start time, to be passed to release."""
+        with self._condition:
+            while self._running >= self.limit:
+                self._condition.wait()
+            self._running += 1
+        return time.perf_counter()
+
+    def release(self, start, error=None):
+        """Records the outcome of a task started at start, which failed with error if it is not None."""
+        now = time.perf_counter()
+        with self._condition:
+            self._running -= 1
+            if error is None:
+                self._window_tasks += 1
+                self._window_latency += now - start
+                if self._window_tasks >= self.limit:
+                    self._end_window(now)
+            elif is_throttling_error(error) and start > self._last_decrease:
+                self._decrease(now)
+                log.debug(output_messages['DEBUG_CONCURRENCY_THROTTLED'] % (self._previous_limit, self.limit, error), class_name=POOL_CLASS_NAME)
+            self._condition.notify_all()
+
+    def _end_window(self, now):
+        latency = self._window_latency / self._window_tasks
+        throughput = self._window_tasks / max(now - self._window_start, 1e-9)
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        if latency > self._best_latency * CONCURRENCY_LATENCY_TOLERANCE:
+            if self._window_start > self._last_decrease:
+                self._decrease(now)
+                log.debug(output_messages['DEBUG_CONCURRENCY_LATENCY'] % (self._previous_limit, self.limit, latency,
+                                                                          self._best_latency * CONCURRENCY_LATENCY_TOLERANCE),
+                          class_name=POOL_CLASS_NAME)
+        elif self._last_throughput is not None and throughput < self._last_throughput * CONCURRENCY_THROUGHPUT_DROP:
+            log.debug(output_messages['DEBUG_CONCURRENCY_HELD'] % (self.limit, self._last_throughput, throughput), class_name=POOL_CLASS_NAME)
+        elif self.limit < self.max_limit:
+            previous_limit = self.limit
+            self.limit = min(self.limit * 2 if self._slow_start else self.limit + 1, self.max_limit)
+            log.debug(output_messages['DEBUG_CONCURRENCY_INCREASED'] % (previous_limit, self.limit, latency, throughput), class_name=POOL_CLASS_NAME)
+        self._last_throughput = throughput
+        self._reset_window(now)
+
+    def _decrease(self, now):
+        self._previous_limit = self.limit
+        self.limit = max(int(self.limit * CONCURRENCY_DECREASE_FACTOR), self.min_limit)
+        self._slow_start = False
+        self._last_decrease = now
+        self._last_throughput = None
+        self._reset_window(now)
 
 
 class WorkerPool(object):
-    def __init__(self, nworkers=10, pool_ctxs=None, retry=0, pb_elts=None, pb_desc='units', fail_limit=None):
+    def __init__(self, nworkers=10, pool_ctxs=None, retry=0, pb_elts=None, pb_desc='units', fail_limit=None, concurrency=None,
+                 ctx_pool=None):
         if pool_ctxs is not None and len(pool_ctxs) != nworkers:
             return None
         self._avail_ctx = pool_ctxs
+        self._ctx_pool = ctx_pool
+        self._concurrency = concurrency
 
         nwrkrs = nworkers if nworkers > 0 else 1
+        self.nworkers = nwrkrs
         self._pool = futures.ThreadPoolExecutor(max_workers=nwrkrs)
 
-        self._futures = []
+        # an ordered set of the submitted futures not consumed yet
+        self._futures = {}
+        self._cancelled = False
         self._retry = retry if retry >= 0 else 0
 
         self._progress_bar = tqdm(total=pb_elts, desc=pb_desc, unit=pb_desc, unit_scale=True, mininterval=1.0) if pb_elts is not None else None
@@ -45,16 +193,11 @@ class WorkerPool(object):
         time.sleep(wait)
 
     def _submit_fn(self, userfn, *args, **kwds):
-        ctx = self._get_ctx()
-
         result = False
         retry_cnt = 0
         while True:
             try:
-                if ctx is not None:
-                    result = userfn(ctx, *args, **kwds)
-                else:
-                    result = userfn(*args, **kwds)
+                result = self._run(userfn, *args, **kwds)
             except Exception as e:
                 if retry_cnt < self._retry:
                     retry_cnt += 1
@@ -67,27 +210,146 @@ class WorkerPool(object):
                     raise e
                 else:
                     self.errors_count += 1
-                    self._progress_bar.set_postfix({'Failed': self.errors_count})
+                    if self._progress_bar is not None:
+                        self._progress_bar.set_postfix({'Failed': self.errors_count})
                     log.debug(output_messages['ERROR_WORKER_FAILURE'] % (e, retry_cnt), class_name=POOL_CLASS_NAME)
-                    self._release_ctx(ctx)
                     raise e
             break
 
         log.debug(output_messages['DEBUG_WORKER_SUCESS'] % (retry_cnt+1), class_name=POOL_CLASS_NAME)
-        self._release_ctx(ctx)
         self._progress()
 
         return result
 
+    def _run(self, userfn, *args, **kwds):
+        if self._concurrency is None:
+            return self._run_with_ctx(userfn, *args, **kwds)
+        # the context is only taken once the limit allows the task to run, so the waiting workers do not hold one
+        start = self._concurrency.acquire()
+        try:
+            result = self._run_with_ctx(userfn, *args, **kwds)
+        except Exception as e:
+            self._concurrency.release(start, e)
+            raise
+        self._concurrency.release(start)
+        return result
+
+    def _run_with_ctx(self, userfn, *args, **kwds):
+        ctx = self._get_ctx()
+        try:
+            if ctx is not None:
+                args = (ctx,) + args
+            return userfn(*args, **kwds)
+        finally:
+            self._release_ctx(ctx)
+
     def submit(self, userfn, *args, **kwds):
-        self._futures.append(self._pool.submit(self._submit_fn, userfn, *args, **kwds))
+        self._futures[self._pool.submit(self._submit_fn, userfn, *args, **kwds)] = None
+
+    def imap_unordered(self, userfn, iterable, *args):
+        """Runs userfn(item, *args) for each item of iterable and yields the (item, future) of the tasks as they finish.
+
+        Items are taken from iterable only as tasks finish, so at most POOL_IN_FLIGHT_PER_WORKER tasks per worker are
+        submitted and not consumed yet. If the iteration stops early, the tasks not started are cancelled and
+        the running ones are waited for.
+        """
+        limit = self.nworkers * POOL_IN_FLIGHT_PER_WORKER
+        items = iter(iterable)
+        in_flight = {}
+        try:
+            while True:
+                while len(in_flight) < limit and not self._cancelled:
+                    item = next(items, _END)
+                    if item is _END:
+                        break
+                    future = self._pool.submit(self._submit_fn, userfn, item, *args)
+                    self._futures[future] = None
+                    in_flight[future] = item
+                if not in_flight:
+                    return
+                done, _ = futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    self._untrack(future)
+                    yield in_flight.pop(future), future
+        finally:
+            for future in in_flight:
+                future.cancel()
+            futures.wait(in_flight)
+            for future in in_flight:
+                self._untrack(future)
+
+    def imap_graph(self, roots, children, roots_share=POOL_ROOTS_IN_FLIGHT_SHARE):
+        """Runs the (userfn, item) tasks of roots and the tasks that depend on them, and yields the (task, future)
+        of each task as it finishes.
+
+        When a task succeeds, children(task, result) returns the tasks that depend on it, which are submitted as
+        soon as a slot is free. As in imap_unordered, at most POOL_IN_FLIGHT_PER_WORKER tasks per worker are
+        submitted and not consumed yet. Roots are submitted first, but only take roots_share of these slots while
+        there are children waiting, so the children of the first roots run while the other roots are still running.
+        """
+        limit = self.nworkers * POOL_IN_FLIGHT_PER_WORKER
+        roots_limit = max(int(limit * roots_share), 1)
+        roots = iter(roots)
+        ready = deque()
+        in_flight = {}
+        running_roots = 0
+        roots_left = True
+        try:
+            while True:
+                while len(in_flight) < limit and not self._cancelled:
+                    if roots_left and (running_roots < roots_limit or not ready):
+                        task = next(roots, _END)
+                        if task is _END:
+                            roots_left = False
+                            continue
+                        is_root = True
+                    elif ready:
+                        task = ready.popleft()
+                        is_root = False
+                    else:
+                        break
+                    userfn, item = task
+                    future = self._pool.submit(self._submit_fn, userfn, item)
+                    self._futures[future] = None
+                    in_flight[future] = task, is_root
+                    running_roots += is_root
+                if not in_flight:
+                    return
+                done, _ = futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    self._untrack(future)
+                    task, is_root = in_flight.pop(future)
+                    running_roots -= is_root
+                    if not future.cancelled() and future.exception() is None:
+                        ready.extend(children(task, future.result()))
+                    yield task, future
+        finally:
+            for future in in_flight:
+                future.cancel()
+            futures.wait(in_flight)
+            for future in in_flight:
+                self._untrack(future)
+
+    def _untrack(self, future):
+        self._futures.pop(future, None)
+
+    def as_completed(self):
+        """Yields the submitted futures as they finish; they are no longer tracked by the pool."""
+        while self._futures:
+            for future in futures.as_completed(list(self._futures)):
+                self._untrack(future)
+                yield future
 
     def _get_ctx(self):
+        if self._ctx_pool is not None:
+            return self._ctx_pool.acquire()
         if self._avail_ctx is not None:
             return self._avail_ctx.pop()
 
     def _release_ctx(self, ctx):
-        if ctx is not None:
+        if self._ctx_pool is not None:
+            self._ctx_pool.release(ctx)
+        elif ctx is not None:
             self._avail_ctx.append(ctx)
 
     def progress_bar_total_inc(self, cnt):
@@ -97,23 +359,58 @@ class WorkerPool(object):
         if self._progress_bar is not None:
             self._progress_bar.update(units)
 
+    def progress(self, units=1):
+        """Counts units of work done outside of the pool."""
+        self._progress(units)
+
     def progress_bar_close(self):
         self._progress_bar.close()
 
     def reset_futures(self):
         del(self._futures)
-        self._futures = []
+        self._futures = {}
+        self._cancelled = False
 
     def wait(self):
         futures.wait(self._futures)
-        return self._futures
+        return list(self._futures)
+
+    def wait_next(self):
+        """Waits for at least one of the submitted tasks to finish and returns the finished ones,
+        which are no longer tracked by the pool."""
+        done, _ = futures.wait(self._futures, return_when=futures.FIRST_COMPLETED)
+        for future in done:
+            self._untrack(future)
+        return done
+
+    def pending_count(self):
+        return len(self._futures)
 
     def cancel(self):
-        for thread in self._futures:
+        self._cancelled = True
+        # workers cancel the pool while the caller may still be submitting tasks
+        for thread in list(self._futures):
             thread.cancel()
 
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+        self.reset_futures()
+
 
 def process_futures(futures_to_process, wp):
     for future in futures_to_process:
         future.result()
     wp.reset_futures()
+
+
+def process_results(results):
+    """Waits for all the (item, future) pairs of imap_unordered and raises the first error found, if any."""
+    error = None
+    for _, future in results:
+        try:
+            future.result()
+        except Exception as e:
+            if error is None:
+                error = e
+    if error is not None:
+        raise error
@@ -17,14 +17,17 @@ from ml_git.admin import remote_add, clone_config_repository, init_mlgit, remote
 from ml_git.config import get_index_path, get_objects_path, get_cache_path, get_metadata_path, get_refs_path, \
     validate_config_spec_hash, validate_spec_hash, get_sample_config_spec, get_sample_spec_doc, \
     get_index_metadata_path, create_workspace_tree_structure, start_wizard_questions, config_load, \
-    get_global_config_path, save_global_config_in_local, merged_config_load
+    get_global_config_path, save_global_config_in_local, merged_config_load, get_hash_threads_count, get_add_processes_count, \
+    get_fsck_processes_count
 from ml_git.constants import REPOSITORY_CLASS_NAME, LOCAL_REPOSITORY_CLASS_NAME, HEAD, HEAD_1, MutabilityType, \
     StorageType, \
     RGX_TAG_FORMAT, EntityType, MANIFEST_FILE, SPEC_EXTENSION, MANIFEST_KEY, STATUS_NEW_FILE, STATUS_DELETED_FILE, \
-    FileType, STORAGE_CONFIG_KEY, CONFIG_FILE, WIZARD_KEY
+    FileType, STORAGE_CONFIG_KEY, CONFIG_FILE, WIZARD_KEY, PACK_MAX_OBJECT_SIZE, BANDWIDTH_LIMIT, REQUESTS_LIMIT
 from ml_git.file_system.cache import Cache
+from ml_git.file_system.chunking import load_chunking_options
 from ml_git.file_system.hashfs import MultihashFS
 from ml_git.file_system.index import MultihashIndex, Status, FullIndex
+from ml_git.file_system.index_store import ManifestIndexStore
 from ml_git.file_system.local import LocalRepository
 from ml_git.file_system.objects import Objects
 from ml_git.manifest import Manifest
@@ -48,6 +51,13 @@ class Repository(object):
         self.__config = config
         self.__repo_type = repo_type
 
+    def set_transfer_limits(self, bandwidth_limit=None, requests_limit=None):
+        """Overrides the bytes and requests per second allowed to the transfers with every storage."""
+        if bandwidth_limit is not None:
+            self.__config[BANDWIDTH_LIMIT] = bandwidth_limit
+        if requests_limit is not None:
+            self.__config[REQUESTS_LIMIT] = requests_limit
+
     '''initializes ml-git repository metadata'''
 
     def init(self):
@@ -164,7 +174,10 @@ class Repository(object):
             # adds chunks to ml-git Index
             log.info(output_messages['INFO_ADDING_PATH_TO'] % (repo_type, path), class_name=REPOSITORY_CLASS_NAME)
             with change_mask_for_routine(is_shared_objects):
-                idx = MultihashIndex(spec, index_path, objects_path, mutability, cache_path)
+                idx = MultihashIndex(spec, index_path, objects_path, mutability, cache_path,
+                                     hash_threads=get_hash_threads_count(self.__config),
+                                     hash_processes=get_add_processes_count(self.__config),
+                                     **load_chunking_options(spec_path, repo_type))
                 idx.add(path, manifest, file_path)
 
             # create hard links in ml-git Cache
@@ -228,7 +241,7 @@ class Repository(object):
 
     @Halo(text='Creating hard links in cache', spinner='dots')
     def create_hard_links_in_cache(self, cache_path, index_path, is_shared_cache, mutability, path, spec):
-        mf = os.path.join(index_path, 'metadata', spec, MANIFEST_FILE)
+        mf = ManifestIndexStore(os.path.join(index_path, 'metadata', spec))
         with change_mask_for_routine(is_shared_cache):
             if mutability in [MutabilityType.STRICT.value, MutabilityType.FLEXIBLE.value]:
                 cache = Cache(cache_path, path, mf)
@@ -718,8 +731,9 @@ class Repository(object):
         unfixed_files = []
         for entity in dirs:
             try:
-                spec_path, _ = search_spec_file(self.__repo_type, entity)
-                idx = MultihashIndex(entity, index_path, objects_path, cache_path=cache_path)
+                spec_path, spec_file = search_spec_file(self.__repo_type, entity)
+                chunking_options = load_chunking_options(os.path.join(spec_path, spec_file), self.__repo_type)
+                idx = MultihashIndex(entity, index_path, objects_path, cache_path=cache_path, **chunking_options)
                 files = idx.fsck(spec_path)
                 corrupted_files_idx.extend(files.keys())
                 if fix_workspace and len(files.keys()) > 0:
@@ -752,7 +766,7 @@ class Repository(object):
                 log.debug(output_messages['ERROR_WHILE_FETCHING_MISSING_FILES'].format(entity, e))
         return missing_files
 
-    def fsck(self, full_log=False, fix_workspace=False):
+    def fsck(self, full_log=False, fix_workspace=False, full_verify=False):
         repo_type = self.__repo_type
         try:
             objects_path = get_objects_path(self.__config, repo_type)
@@ -770,7 +784,7 @@ class Repository(object):
             return
 
         o = Objects('', objects_path)
-        corrupted_files_obj = o.fsck(remove_corrupted=True)
+        corrupted_files_obj = o.fsck(remove_corrupted=True, workers=get_fsck_processes_count(self.__config), incremental=not full_verify)
         corrupted_files_obj_len = len(corrupted_files_obj)
 
         log.info(output_messages['INFO_STARTING_INTEGRITY_CHECK'].format(index_path), break_line=True)
@@ -810,6 +824,23 @@ class Repository(object):
         if len(unfixed_in_workspace) > 0 and not fix_workspace:
             log.info(output_messages['INFO_USE_FIX_WORKSPACE'])
 
+    def repack(self, max_object_size=PACK_MAX_OBJECT_SIZE):
+        repo_type = self.__repo_type
+        try:
+            objects_path = get_objects_path(self.__config, repo_type)
+            index_path = get_index_path(self.__config, repo_type)
+            metadata_path = get_metadata_path(self.__config, repo_type)
+            m = Metadata('', metadata_path, self.__config, repo_type)
+            if not m.check_exists():
+                raise RuntimeError(output_messages['INFO_NOT_INITIALIZED'] % self.__repo_type)
+        except Exception as e:
+            log.error(e, class_name=REPOSITORY_CLASS_NAME)
+            return
+
+        for path in (objects_path, index_path):
+            if os.path.exists(path):
+                MultihashFS(path).repack(max_object_size)
+
     def show(self, spec):
         repo_type = self.__repo_type
         try:
@@ -16,6 +16,9 @@ from ml_git.storages.storage import Storage
 
 
 class AzureMultihashStorage(Storage, MultihashStorage):
+    # BlobServiceClient is thread-safe
+    THREAD_SAFE = True
+
     def __init__(self, bucket_name, bucket):
         self._bucket = bucket_name
         self._storage_type = StorageType.AZUREBLOBH.value
@@ -46,6 +49,7 @@ class AzureMultihashStorage(Storage, MultihashStorage):
             log.debug(output_messages['DEBUG_FILE_NOT_IN_LOCAL_REPOSITORY'] % file_path, class_name=AZURE_STORAGE_NAME)
             return False
 
+        self._limit_request(os.path.getsize(file_path))
         try:
             blob_client = self._storage.get_blob_client(container=self._bucket, blob=key_path)
             with open(file_path, 'rb') as data:
@@ -59,11 +63,13 @@ class AzureMultihashStorage(Storage, MultihashStorage):
 
     def get(self, file_path, reference):
         try:
+            self._limit_request()
             blob_client = self._storage.get_blob_client(container=self._bucket, blob=reference)
             with open(file_path, 'wb') as download_file:
                 data = blob_client.download_blob().readall()
                 download_file.write(data)
-            if not self.check_integrity(reference, self.digest(data)):
+            self._limit_download(nbytes=len(data))
+            if not self.check_integrity(reference, self.digest(data, reference), file_path):
                 return False
         except Exception as e:
             log.error(e, class_name=AZURE_STORAGE_NAME)
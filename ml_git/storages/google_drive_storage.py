@@ -87,6 +87,7 @@ class GoogleDriveStorage(Storage):
 
     @_should_retry
     def __upload_file(self, file_path, file_metadata):
+        self._limit_request(os.path.getsize(file_path))
         file = self._storage.CreateFile(metadata=file_metadata)
         file.SetContentFile(file_path)
         file.Upload()
@@ -119,8 +120,10 @@ class GoogleDriveStorage(Storage):
 
     @_should_retry
     def _download_file(self, id, file_path):
+        self._limit_request()
         file = self._storage.CreateFile({'id': id})
         file.GetContentFile(file_path)
+        self._limit_download(file_path)
 
     def download_file(self, file_path, file_info):
         file_id = file_info.get('id')
@@ -248,6 +251,6 @@ class GoogleDriveMultihashStorage(GoogleDriveStorage, MultihashStorage):
         self._download_file(file_info['id'], file_path)
 
         with open(file_path, 'rb') as file:
-            return self.check_integrity(reference, self.digest(file.read()))
+            return self.check_integrity(reference, self.digest(file.read(), reference), file_path)
 
         return False
@@ -3,29 +3,38 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
-import hashlib
-
-from cid import CIDv1
-from multihash import multihash
-
 from ml_git import log
 from ml_git.constants import MULTI_HASH_STORAGE_NAME
+from ml_git.file_system.compression import CHUNK_HEADER, decode_chunk, is_encoded
+from ml_git.file_system.hash_algorithms import algorithm_of, get_hash_algorithm
 from ml_git.ml_git_message import output_messages
 
 
 class MultihashStorage(object):
 
-    def digest(self, data):
-        m = hashlib.sha256()
-        m.update(data)
-        h = m.hexdigest()
-        mh = multihash.encode(bytes.fromhex(h), 'sha2-256')
-        cid = CIDv1('dag-pb', mh)
-        return str(cid)
+    def digest(self, data, cid=None):
+        """Returns the CID of data, hashed with the algorithm recorded in cid (sha2-256 if cid is None)."""
+        algorithm = get_hash_algorithm() if cid is None else algorithm_of(cid)
+        return algorithm.digest(data)
 
-    def check_integrity(self, cid, ncid):
+    def check_integrity(self, cid, ncid, file_path=None):
+        """Compares the CID of an object with the CID of the data downloaded to file_path.
+        Compressed chunks are checked against their uncompressed content."""
+        if cid != ncid and file_path is not None:
+            ncid = self._decoded_digest(file_path, cid, ncid)
         if cid == ncid:
             log.debug(output_messages['DEBUG_CHECKSUM_VERIFIED'] % cid, class_name=MULTI_HASH_STORAGE_NAME)
             return True
         log.debug(output_messages['DEBUG_CORRUPTION_DETECTED'] % (cid, ncid), class_name=MULTI_HASH_STORAGE_NAME)
         return False
+
+    def _decoded_digest(self, file_path, cid, ncid):
+        with open(file_path, 'rb') as f:
+            if not is_encoded(f.read(CHUNK_HEADER.size)):
+                return ncid
+            f.seek(0)
+            try:
+                return self.digest(decode_chunk(f.read()), cid)
+            except Exception as e:
+                log.debug(str(e), class_name=MULTI_HASH_STORAGE_NAME)
+                return ncid
@@ -3,19 +3,17 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
-import hashlib
 import os
 from pprint import pprint
 
 import boto3
-import multihash
 from botocore.client import ClientError, Config
 from botocore.exceptions import EndpointConnectionError
-from cid import CIDv1
 
 from ml_git import log
 from ml_git.config import get_key
 from ml_git.constants import STORAGE_FACTORY_CLASS_NAME, S3STORAGE_NAME, S3_MULTI_HASH_STORAGE_NAME, StorageType
+from ml_git.file_system.hash_algorithms import algorithm_of
 from ml_git.ml_git_message import output_messages
 from ml_git.storages.multihash_storage import MultihashStorage
 from ml_git.storages.storage import Storage
@@ -94,6 +92,7 @@ class S3Storage(Storage):
         bucket = self._bucket
         s3_resource = self._storage
         self.key_exists(key_path)
+        self._limit_request(os.path.getsize(file_path))
         res = s3_resource.Bucket(bucket).Object(key_path).put(file_path, Body=open(file_path,
                                                                                    'rb'))  # TODO :test for errors here!!!
         pprint(res)
@@ -110,6 +109,7 @@ class S3Storage(Storage):
     def put_object(self, file_path, object):
         bucket = self._bucket
         s3_resource = self._storage
+        self._limit_request(len(object))
         s3_resource.Object(bucket, file_path).put(Body=object)
 
     @staticmethod
@@ -130,7 +130,10 @@ class S3Storage(Storage):
 
     def get(self, file_path, reference):
         key, version = self._to_file(reference)
-        return self._get(file_path, key, version=version)
+        self._limit_request()
+        ret = self._get(file_path, key, version=version)
+        self._limit_download(file_path)
+        return ret
 
     def get_object(self, key_path):
         bucket = self._bucket
@@ -139,8 +142,11 @@ class S3Storage(Storage):
         if not self.key_exists(key_path):
             raise RuntimeError(output_messages['ERROR_OBJECT_NOT_FOUND'] % key_path)
 
+        self._limit_request()
         res = s3_resource.Object(bucket, key_path).get()
-        return res['Body'].read()
+        data = res['Body'].read()
+        self._limit_download(nbytes=len(data))
+        return data
 
     def _get(self, file, key_path, version=None):
         bucket = self._bucket
@@ -206,12 +212,16 @@ class S3MultihashStorage(S3Storage, MultihashStorage):
             log.debug(output_messages['DEBUG_FILE_NOT_IN_LOCAL_REPOSITORY'] % file_path, class_name=S3STORAGE_NAME)
             return False
 
+        self._limit_request(os.path.getsize(file_path))
         with open(file_path, 'rb') as f:
             s3_resource.Bucket(bucket).Object(key_path).put(file_path, Body=f)  # TODO :test for errors here!!!
         return key_path
 
     def get(self, file_path, key_path):
-        return self._get(file_path, key_path)
+        self._limit_request()
+        ret = self._get(file_path, key_path)
+        self._limit_download(file_path)
+        return ret
 
     def _get(self, file, key_path):
         bucket = self._bucket
@@ -223,21 +233,19 @@ class S3MultihashStorage(S3Storage, MultihashStorage):
             output_messages['DEBUG_DOWNLOADING_FROM_BUCKET'] % (key_path, bucket, file),
             class_name=S3_MULTI_HASH_STORAGE_NAME
         )
+        algorithm = algorithm_of(key_path)
         with open(file, 'wb') as f:
-            m = hashlib.sha256()
+            m = algorithm.new()
             while True:
                 chunk = c.read(self._blk_size)
                 if not chunk:
                     break
                 m.update(chunk)
                 f.write(chunk)
-            h = m.hexdigest()
-            mh = multihash.encode(bytes.fromhex(h), 'sha2-256')
-            cid = CIDv1('dag-pb', mh)
-            ncid = str(cid)
-            if self.check_integrity(key_path, ncid) is False:
-                return False
+            ncid = algorithm.cid(m)
         c.close()
+        if self.check_integrity(key_path, ncid, file) is False:
+            return False
         return True
 
     def delete(self, key_path):
@@ -50,6 +50,7 @@ class SFtpStorage(Storage):
         return True
 
     def put(self, key_path, file_path):
+        self._limit_request(os.path.getsize(file_path))
         self._storage.put(file_path, self._bucket + '/' + key_path)
         version = None
         log.debug(output_messages['INFO_FILE_STORED_IN_BUCKET'] % (file_path, self._bucket, key_path, version), class_name=SFTPSTORE_NAME)
@@ -57,7 +58,9 @@ class SFtpStorage(Storage):
 
     def get(self, file_path, reference):
         try:
+            self._limit_request()
             self._storage.get(self._bucket + '/' + reference, file_path)
+            self._limit_download(file_path)
             return True
         except Exception:
             log.error(output_messages['ERROR_OBJECT_NOT_FOUND'] % reference, class_name=SFTPSTORE_NAME)
@@ -8,6 +8,11 @@ import os
 
 
 class Storage(abc.ABC):
+    # whether a single instance can be used by several threads at once
+    THREAD_SAFE = False
+    # TransferLimiter shared by the storages of the same bucket, None when its transfers are not limited
+    limiter = None
+
     def __init__(self):
         self.connect()
         if self._storage is None:
@@ -41,6 +46,19 @@ class Storage(abc.ABC):
         """
         pass
 
+    def _limit_request(self, nbytes=0):
+        """Waits until the transfer limits of the storage allow a request that sends nbytes."""
+        if self.limiter is not None:
+            self.limiter.request(nbytes)
+
+    def _limit_download(self, file_path=None, nbytes=0):
+        """Accounts for the bytes downloaded (to file_path, or nbytes) in the transfer limits of the storage."""
+        if self.limiter is None:
+            return
+        if file_path is not None and os.path.exists(file_path):
+            nbytes = os.path.getsize(file_path)
+        self.limiter.transfer(nbytes)
+
     def store(self, key, file, path, prefix=None):
         full_path = os.sep.join([path, file])
         return self.file_store(key, full_path, prefix)
@@ -3,24 +3,84 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import copy
+import threading
+
 import boto3
 from botocore.exceptions import ProfileNotFound
 
 from ml_git import log
+from ml_git.config import get_transfer_limits
 from ml_git.constants import STORAGE_FACTORY_CLASS_NAME, StorageType, STORAGE_CONFIG_KEY
 from ml_git.ml_git_message import output_messages
+from ml_git.pool import ContextPool
 from ml_git.storages.azure_storage import AzureMultihashStorage
 from ml_git.storages.google_drive_storage import GoogleDriveMultihashStorage, GoogleDriveStorage
 from ml_git.storages.s3_storage import S3Storage, S3MultihashStorage
 from ml_git.storages.sftp_storage import SFtpStorage
+from ml_git.storages.transfer_limits import TransferLimiter
+
+storages = {StorageType.S3.value: S3Storage, StorageType.S3H.value: S3MultihashStorage,
+            StorageType.AZUREBLOBH.value: AzureMultihashStorage,
+            StorageType.GDRIVEH.value: GoogleDriveMultihashStorage,
+            StorageType.GDRIVE.value: GoogleDriveStorage,
+            StorageType.SFTPH.value: SFtpStorage}
+
+# storage string -> (configuration of its bucket and transfer limits, pool of its storages)
+_storage_pools = {}
+_storage_pools_lock = threading.Lock()
+# storage string -> (transfer limits, limiter shared by its storages)
+_transfer_limiters = {}
+
+
+def _bucket_config(config, storage_string):
+    sp = storage_string.split('/')
+    try:
+        return config[STORAGE_CONFIG_KEY][sp[0][:-1]][sp[2]]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def storage_pool(config, storage_string):
+    """Returns the pool of the storages of storage_string used by the workers of the worker pools.
+
+    Storages are only created when a worker needs one, and are kept for the following worker pools of the same
+    storage (e.g. the descriptor and blob phases of fetch) while its configuration is unchanged. A storage whose
+    client is thread-safe is shared by all the workers.
+    """
+    storage_type = storage_string.split('/')[0][:-1]
+    bucket = _bucket_config(config, storage_string)
+    settings = (bucket, get_transfer_limits(config, bucket))
+    with _storage_pools_lock:
+        if storage_string not in _storage_pools or _storage_pools[storage_string][0] != settings:
+            shared = getattr(storages.get(storage_type), 'THREAD_SAFE', False)
+            _storage_pools[storage_string] = (copy.deepcopy(settings),
+                                              ContextPool(lambda: storage_factory(config, storage_string), shared=shared))
+        return _storage_pools[storage_string][1]
+
+
+def transfer_limiter(config, storage_string):
+    """Returns the TransferLimiter shared by the storages of storage_string, or None if its transfers are not limited."""
+    limits = get_transfer_limits(config, _bucket_config(config, storage_string))
+    if not any(limits):
+        return None
+    with _storage_pools_lock:
+        if storage_string not in _transfer_limiters or _transfer_limiters[storage_string][0] != limits:
+            _transfer_limiters[storage_string] = (limits, TransferLimiter(*limits))
+        return _transfer_limiters[storage_string][1]
+
+
+def transfer_stats(storage_string):
+    """Returns and resets the transfer stats of the storages of storage_string, or None if they are not limited."""
+    if storage_string not in _transfer_limiters:
+        return None
+    limiter = _transfer_limiters[storage_string][1]
+    stats = limiter.stats()
+    limiter.reset_stats()
+    return stats
 
 
 def storage_factory(config, storage_string):
-    storages = {StorageType.S3.value: S3Storage, StorageType.S3H.value: S3MultihashStorage,
-                StorageType.AZUREBLOBH.value: AzureMultihashStorage,
-                StorageType.GDRIVEH.value: GoogleDriveMultihashStorage,
-                StorageType.GDRIVE.value: GoogleDriveStorage,
-                StorageType.SFTPH.value: SFtpStorage}
     sp = storage_string.split('/')
     config_bucket_name, bucket_name = None, None
 
@@ -36,7 +96,9 @@ def storage_factory(config, storage_string):
                 bucket_name, storage_type, config_bucket_name), class_name=STORAGE_FACTORY_CLASS_NAME)
             return None
         bucket = config[STORAGE_CONFIG_KEY][storage_type][bucket_name]
-        return storages[storage_type](bucket_name, bucket)
+        storage = storages[storage_type](bucket_name, bucket)
+        storage.limiter = transfer_limiter(config, storage_string)
+        return storage
     except ProfileNotFound as pfn:
         log.error(pfn, class_name=STORAGE_FACTORY_CLASS_NAME)
         return None
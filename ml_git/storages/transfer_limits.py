@@ -0,0 +1,78 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Allows rate units per second on average, in bursts of up to capacity units (one second of rate by default).
+
+    Units are taken from the bucket even when it does not hold enough of them; the caller then waits until the
+    debt is refilled, so amounts larger than the capacity, or only known once a transfer ends, are still limited.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else self.rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Takes amount units from the bucket and returns the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class TransferLimiter(object):
+    """Limits the bytes and requests per second of the transfers of a storage, shared by all its instances.
+
+    Each put and get is one request; the bytes of an upload are taken before it starts and those of a download
+    once it finishes. The time spent waiting for the limits is reported by stats.
+    """
+
+    def __init__(self, bandwidth_limit=None, requests_limit=None):
+        self._bandwidth = TokenBucket(bandwidth_limit) if bandwidth_limit else None
+        self._requests = TokenBucket(requests_limit) if requests_limit else None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _wait(self, bucket, amount):
+        wait = bucket.reserve(amount) if bucket is not None else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def request(self, nbytes=0):
+        """Waits until the limits allow one more request that sends nbytes."""
+        throttled = self._wait(self._requests, 1)
+        if nbytes:
+            throttled += self._wait(self._bandwidth, nbytes)
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+            self.throttled += throttled
+
+    def transfer(self, nbytes):
+        """Accounts for nbytes received by a request, waiting if they exceed the bandwidth limit."""
+        throttled = self._wait(self._bandwidth, nbytes)
+        with self._lock:
+            self.bytes += nbytes
+            self.throttled += throttled
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'bytes': self.bytes, 'throttled': self.throttled}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes = 0
+            self.throttled = 0.0
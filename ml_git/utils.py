@@ -265,10 +265,10 @@ def group_files_by_path(files):
 
 
 @Halo(text='Removing unnecessary files', spinner='dots')
-def remove_unnecessary_files(filenames, path):
+def remove_unnecessary_files(filenames, path, ignored_dirs=[]):
     total_count = 0
     total_reclaimed_space = 0
-    dirs = os.listdir(path)
+    dirs = [dir for dir in os.listdir(path) if dir not in ignored_dirs]
     wp = pool_factory()
     for dir in dirs:
         wp.submit(remove_other_files, filenames, os.path.join(path, dir))
@@ -0,0 +1,91 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Simulates the upload of --objects objects to a storage that serves --capacity requests at once at a
+latency of --latency seconds, slows down as more requests are in flight and answers SlowDown (the S3
+throttling error) above --throttle concurrent requests. Compares worker pools of a fixed size (the
+default push_threads_count of a 4-core and of a 96-core host) with the adaptive concurrency of the pool.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_adaptive_concurrency.py [--objects 5000] [--capacity 32] [--throttle 128]
+"""
+
+import argparse
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.pool import AdaptiveConcurrency, pool_factory
+
+
+class ThrottlingStorage(object):
+
+    def __init__(self, capacity, throttle, latency):
+        self._capacity = capacity
+        self._throttle = throttle
+        self._latency = latency
+        self._running = 0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def file_store(self, key):
+        with self._lock:
+            self._running += 1
+            running = self._running
+        try:
+            if running > self._throttle:
+                with self._lock:
+                    self.throttled += 1
+                raise ClientError({'Error': {'Code': 'SlowDown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, 'PutObject')
+            time.sleep(self._latency * max(1.0, running / self._capacity))
+        finally:
+            with self._lock:
+                self._running -= 1
+        return key
+
+
+def upload(storage, objects, nworkers, concurrency):
+    wp = pool_factory(nworkers=nworkers, retry=2, concurrency=concurrency)
+    for key in range(objects):
+        wp.submit(storage.file_store, key)
+    failed = 0
+    for future in wp.wait():
+        try:
+            future.result()
+        except Exception:
+            failed += 1
+    wp.shutdown()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=5000)
+    parser.add_argument('--capacity', type=int, default=32)
+    parser.add_argument('--throttle', type=int, default=128)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--max', type=int, default=256)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    runs = [('fixed 20', 20, None), ('fixed 480', 480, None), ('adaptive', 0, (4, args.max))]
+    results = {}
+    for name, nworkers, limits in runs:
+        storage = ThrottlingStorage(args.capacity, args.throttle, args.latency)
+        concurrency = AdaptiveConcurrency(*limits) if limits is not None else None
+        with timer(results, name):
+            failed = upload(storage, args.objects, nworkers, concurrency)
+        final_limit = concurrency.limit if concurrency is not None else nworkers
+        results[name + ' stats'] = (storage.throttled, failed, final_limit)
+
+    print('%d uploads to a storage serving %d requests at once and throttling above %d' % (args.objects, args.capacity, args.throttle))
+    print('%-10s %10s %12s %12s %10s %12s' % ('pool', 'time (s)', 'objects/s', 'throttled', 'failed', 'final limit'))
+    for name, _, _ in runs:
+        throttled, failed, final_limit = results[name + ' stats']
+        print('%-10s %10.1f %12.0f %12d %10d %12d' % (name, results[name], args.objects / results[name], throttled, failed, final_limit))
+
+
+if __name__ == '__main__':
+    main()
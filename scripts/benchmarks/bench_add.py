@@ -0,0 +1,55 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the throughput of `ml-git <entity> add` on a tree of --files small files spread over --dirs
+directories: the tree is scanned, the files are hashed into the objects and recorded in the index.
+The peak RSS is reported to check that the memory footprint does not grow with the number of files.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_add.py [--files 1000000] [--dirs 1000] [--size 256]
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system.index import MultihashIndex
+
+
+def create_tree(path, nfiles, ndirs, size):
+    for i in range(ndirs):
+        os.makedirs(os.path.join(path, 'dir-%d' % i))
+    for i in range(nfiles):
+        with open(os.path.join(path, 'dir-%d' % (i % ndirs), 'file-%d' % i), 'wb') as file:
+            file.write(os.urandom(size))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=1000000)
+    parser.add_argument('--dirs', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=256)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, 'data')
+        results = {}
+        with timer(results, 'create'):
+            create_tree(data_path, args.files, args.dirs, args.size)
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        idx = MultihashIndex('dataset-ex', os.path.join(tmp_dir, 'index'), os.path.join(tmp_dir, 'objects'))
+        with timer(results, 'add'):
+            idx.add(data_path, '')
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        assert idx.get_index_yaml().get_total_count() == args.files
+
+    print('%d files of %d bytes in %d directories (created in %.1f s)' % (args.files, args.size, args.dirs, results['create']))
+    print('add: %.1f s, %.0f files/s, peak RSS %.1f MB (%.1f MB above the tree creation)' % (
+        results['add'], args.files / results['add'], peak_rss / 1024, (peak_rss - base_rss) / 1024))
+
+
+if __name__ == '__main__':
+    main()
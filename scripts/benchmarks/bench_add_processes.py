@@ -0,0 +1,59 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures how `ml-git <entity> add` of --files small files scales with the cores of the host: the files are
+hashed by the worker threads of the add (add_processes_count: 1) and then by 2, 4, ... worker processes, up
+to --processes (add_processes_count). Each run adds the same tree to a fresh index and objects directory.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_add_processes.py [--files 100000] [--dirs 100] [--size 4096] [--processes 8]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from bench_add import create_tree
+from ml_git.file_system.index import MultihashIndex
+
+# the worker processes import this script as their main module, so their debug messages are silenced here
+silence_debug_logs()
+
+
+def add(tmp_dir, name, data_path, processes):
+    idx = MultihashIndex('dataset-ex', os.path.join(tmp_dir, name, 'index'), os.path.join(tmp_dir, name, 'objects'),
+                         hash_processes=processes)
+    idx.add(data_path, '')
+    return idx.get_index_yaml().get_total_count()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--dirs', type=int, default=100)
+    parser.add_argument('--size', type=int, default=4096)
+    parser.add_argument('--processes', type=int, default=8)
+    args = parser.parse_args()
+
+    runs = [('threads', 1)]
+    processes = 2
+    while processes <= args.processes:
+        runs.append(('%d processes' % processes, processes))
+        processes *= 2
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, 'data')
+        create_tree(data_path, args.files, args.dirs, args.size)
+        results = {}
+        for name, processes in runs:
+            with timer(results, name):
+                assert add(tmp_dir, name, data_path, processes) == args.files
+
+    print('add of %d files of %d bytes on a host with %d cores' % (args.files, args.size, os.cpu_count()))
+    print('%-12s %10s %12s %10s' % ('hashing', 'add (s)', 'files/s', 'speedup'))
+    for name, _ in runs:
+        print('%-12s %10.1f %12.0f %9.1fx' % (name, results[name], args.files / results[name], results['threads'] / results[name]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Compares fixed-size and content-defined chunking when a file is stored again after small edits.
+Each version inserts a few bytes at random offsets, which shifts every fixed-size block after the edit.
+Also reports the throughput of splitting a file into chunks alone: fixed-size, content-defined with the byte loop,
+and content-defined with the vectorized search when numpy is installed.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_cdc_dedup.py [--size-mb 64] [--versions 5] [--edits 3]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system import chunking
+from ml_git.file_system.chunking import ContentDefinedChunker
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def objects_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, file)) for file in files)
+    return total
+
+
+def create_versions(tmp_dir, size, versions, edits):
+    rnd = random.Random(42)
+    data = bytearray(os.urandom(size))
+    paths = []
+    for version in range(versions):
+        if version > 0:
+            for _ in range(edits):
+                offset = rnd.randrange(len(data))
+                data[offset:offset] = os.urandom(rnd.randint(1, 64))
+        path = os.path.join(tmp_dir, 'file-v%d.bin' % version)
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def fixed_chunks(file, block_size=256 * 1024):
+    return iter(lambda: file.read(block_size), b'')
+
+
+def chunking_throughput(path):
+    byte_chunker = ContentDefinedChunker()
+    byte_chunker._scan = byte_chunker._scan_bytes
+    runs = [('fixed', fixed_chunks), ('cdc, byte loop', byte_chunker.chunks)]
+    if chunking.numpy is not None:
+        runs.append(('cdc, numpy', ContentDefinedChunker().chunks))
+    size = os.path.getsize(path) / 1024 ** 2
+    results = {}
+    for name, chunks in runs:
+        with open(path, 'rb') as f, timer(results, name):
+            for _ in chunks(f):
+                pass
+    print('\nchunking only, %.0f MB:' % size)
+    for name, _ in runs:
+        print('%-15s %8.1f MB/s  %6.2fx the time of fixed' % (name, size / results[name], results[name] / results['fixed']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--versions', type=int, default=5)
+    parser.add_argument('--edits', type=int, default=3)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = create_versions(tmp_dir, args.size_mb * 1024 * 1024, args.versions, args.edits)
+        logical_size = sum(os.path.getsize(path) for path in paths)
+        results = {}
+        for name, chunker in (('fixed', None), ('cdc', ContentDefinedChunker())):
+            objects_path = os.path.join(tmp_dir, 'objects-%s' % name)
+            hfs = MultihashFS(objects_path, chunker=chunker)
+            with timer(results, name):
+                for path in paths:
+                    hfs.put(path)
+            stored = objects_size(os.path.join(objects_path, 'hashfs'))
+            print('%-6s stored=%8.1f MB  dedup ratio=%.2fx  %8.1f MB/s' % (name, stored / 1024 ** 2, logical_size / stored,
+                                                                           logical_size / 1024 ** 2 / results[name]))
+        chunking_throughput(paths[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures MultihashFS.put throughput for an increasing number of hashing threads.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_chunk_hashing.py [--size-mb 1024] [--max-threads N]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import create_random_file, silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--max-threads', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_file = os.path.join(tmp_dir, 'checkpoint.bin')
+        create_random_file(src_file, args.size_mb * 1024 * 1024)
+        results = {}
+        baseline_cid = None
+        threads = 1
+        while threads <= args.max_threads:
+            hfs = MultihashFS(os.path.join(tmp_dir, 'objects-%d' % threads), hash_threads=threads)
+            with timer(results, threads):
+                cid = hfs.put(src_file)
+            baseline_cid = baseline_cid or cid
+            print('threads=%-3d %8.1f MB/s  speedup=%.2fx  %s' % (threads, args.size_mb / results[threads],
+                                                                  results[1] / results[threads],
+                                                                  'ok' if cid == baseline_cid else 'CID MISMATCH'))
+            threads *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Reports, for each chunk compression codec, the compression ratio of a tabular text dataset against
+the CPU time spent compressing the chunks during add and decompressing them during checkout.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_compression.py [--size-mb 64]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def create_csv_file(path, size):
+    rng = random.Random(0)
+    labels = ['cat', 'dog', 'bird', 'fish', 'horse']
+    with open(path, 'w') as f:
+        f.write('id,label,score,x,y\n')
+        row = 0
+        while f.tell() < size:
+            f.write('%d,%s,%.4f,%d,%d\n' % (row, rng.choice(labels), rng.random(), rng.randrange(1920), rng.randrange(1080)))
+            row += 1
+
+
+def stored_size(hfs, object_key):
+    return sum(os.path.getsize(hfs.get_keypath(link['Hash'])) for link in hfs.load(object_key)['Links'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=64)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_file = os.path.join(tmp_dir, 'table.csv')
+        create_csv_file(src_file, args.size_mb * 1024 * 1024)
+        size_mb = os.path.getsize(src_file) / 1024 / 1024
+        dst_file = os.path.join(tmp_dir, 'table.out')
+        print('%-6s %7s %12s %12s' % ('codec', 'ratio', 'put MB/s', 'get MB/s'))
+        for codec in (None, 'zlib', 'bz2', 'lzma'):
+            hfs = MultihashFS(os.path.join(tmp_dir, 'objects-%s' % codec), compression=codec)
+            results = {}
+            with timer(results, 'put'):
+                object_key = hfs.put(src_file)
+            with timer(results, 'get'):
+                hfs.get(object_key, dst_file)
+            os.unlink(dst_file)
+            ratio = os.path.getsize(src_file) / stored_size(hfs, object_key)
+            print('%-6s %6.2fx %12.1f %12.1f' % (codec or 'none', ratio, size_mb / results['put'], size_mb / results['get']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures MultihashFS._exists for keys present and missing in an objects store, with the objects filter
+and with plain filesystem lookups. Point --path to a network filesystem to see the cost of the lookups there.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_exists.py [--objects 20000] [--path /mnt/nfs/tmp]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+
+import multihash
+from cid import CIDv1
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def random_cid():
+    return str(CIDv1('dag-pb', multihash.encode(hashlib.sha256(os.urandom(32)).digest(), 'sha2-256')))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', type=int, default=20000)
+    parser.add_argument('--path', default=None)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory(dir=args.path) as tmp_dir:
+        hfs = MultihashFS(tmp_dir)
+        present = [random_cid() for _ in range(args.objects)]
+        for key in present:
+            hfs._store_chunk(key, b'')
+        missing = [random_cid() for _ in range(args.objects)]
+
+        print('%-10s %14s %14s' % ('lookups', 'present us/op', 'missing us/op'))
+        for name in ('filter', 'filesystem'):
+            hfs = MultihashFS(tmp_dir)
+            if name == 'filesystem':
+                hfs._objects_filter.might_contain = lambda key: True
+            results = {}
+            with timer(results, 'present'):
+                assert all(hfs._exists(key) for key in present)
+            with timer(results, 'missing'):
+                assert not any(hfs._exists(key) for key in missing)
+            print('%-10s %14.2f %14.2f' % (name, results['present'] / args.objects * 1e6, results['missing'] / args.objects * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Simulates the fetch of --files files of --chunks chunks of --chunk-size bytes each from a storage that answers each
+request in --latency ms, over a link of --bandwidth bytes/s shared by all the requests, with worker pools of
+--workers threads: in two phases as fetch did (all the descriptors, then the chunks of each file in a single task),
+in two phases with a task per chunk, and pipelined through WorkerPool.imap_graph, where the chunks of a descriptor
+are queued as soon as it arrives. Reports the time of each against the time the link needs to transfer the chunks.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_fetch_pipeline.py [--files 1000] [--chunks 2] [--workers 20] [--latency 20]
+"""
+
+import argparse
+import time
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.pool import WorkerPool
+from ml_git.storages.transfer_limits import TokenBucket
+
+
+class Fetcher(object):
+
+    def __init__(self, chunks, chunk_size, latency, bandwidth):
+        self._chunks = chunks
+        self._chunk_size = chunk_size
+        self._latency = latency
+        # the descriptors are small enough for their transfer time to be negligible
+        self._link = TokenBucket(bandwidth, capacity=chunk_size)
+
+    def descriptor(self, key):
+        time.sleep(self._latency)
+        return ['%s-%d' % (key, i) for i in range(self._chunks)]
+
+    def chunk(self, key):
+        time.sleep(self._latency + self._link.reserve(self._chunk_size))
+        return key
+
+    def file_chunks(self, key):
+        for i in range(self._chunks):
+            self.chunk('%s-%d' % (key, i))
+        return key
+
+
+def consume(results):
+    for _, future in results:
+        future.result()
+
+
+def two_phases(wp, fetcher, keys):
+    consume(wp.imap_unordered(fetcher.descriptor, keys))
+    consume(wp.imap_unordered(fetcher.file_chunks, keys))
+
+
+def two_phases_per_chunk(wp, fetcher, keys):
+    chunks = []
+    for _, future in wp.imap_unordered(fetcher.descriptor, keys):
+        chunks.extend(future.result())
+    consume(wp.imap_unordered(fetcher.chunk, chunks))
+
+
+def pipelined(wp, fetcher, keys):
+    def children(task, result):
+        return [(fetcher.chunk, key) for key in result] if task[0] == fetcher.descriptor else []
+    consume(wp.imap_graph(((fetcher.descriptor, key) for key in keys), children))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--chunks', type=int, default=2)
+    parser.add_argument('--chunk-size', type=int, default=256 * 1024)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--latency', type=int, default=20)
+    parser.add_argument('--bandwidth', type=int, default=64 * 1024 * 1024)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    keys = ['file-%d' % i for i in range(args.files)]
+    runs = (('two phases', two_phases), ('two phases, per chunk', two_phases_per_chunk), ('pipelined', pipelined))
+    results = {}
+    for name, run in runs:
+        fetcher = Fetcher(args.chunks, args.chunk_size, args.latency / 1000, args.bandwidth)
+        wp = WorkerPool(nworkers=args.workers)
+        with timer(results, name):
+            run(wp, fetcher, keys)
+        wp.shutdown()
+
+    data_only = args.files * args.chunks * args.chunk_size / args.bandwidth
+    print('%d files of %d chunks of %d bytes, %d ms per request, %d bytes/s on %d workers (%.1f s to transfer the chunks)'
+          % (args.files, args.chunks, args.chunk_size, args.latency, args.bandwidth, args.workers, data_only))
+    print('%-22s %10s %18s' % ('schedule', 'time (s)', 'vs. transfer alone'))
+    for name, _ in runs:
+        print('%-22s %10.1f %17.2fx' % (name, results[name], results[name] / data_only))
+
+
+if __name__ == '__main__':
+    main()
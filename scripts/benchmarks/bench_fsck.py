@@ -0,0 +1,42 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Stores random files in a MultihashFS and reports the fsck time and throughput with one process
+and with a pool of worker processes.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_fsck.py [--files 200] [--file-size-mb 8] [--workers 8]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import create_random_file, silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--file-size-mb', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        hfs = MultihashFS(os.path.join(tmp_dir, 'objects'))
+        file_path = os.path.join(tmp_dir, 'file.bin')
+        for _ in range(args.files):
+            create_random_file(file_path, args.file_size_mb * 1024 * 1024)
+            hfs.put(file_path)
+        total_mb = args.files * args.file_size_mb
+        for workers in (1, args.workers):
+            results = {}
+            with timer(results, workers):
+                hfs.fsck(workers=workers)
+            print('workers=%-3d fsck=%7.2fs  %8.1f MB/s' % (workers, results[workers], total_mb / results[workers]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the throughput of rebuilding a file from its chunks with MultihashFS.get, comparing the
+zero-copy reassembly with the previous approach of reading every chunk into a bytes object.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_get_throughput.py [--size-mb 1024] [--runs 3]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import create_random_file, silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def buffered_get(hfs, object_key, dst_file_path):
+    size = 0
+    with open(dst_file_path, 'wb') as dst_file:
+        for chunk in hfs.load(object_key)['Links']:
+            with open(hfs.get_keypath(chunk['Hash']), 'rb') as chunk_file:
+                data = chunk_file.read()
+            if not hfs._check_integrity(chunk['Hash'], data):
+                raise RuntimeError('corrupted chunk %s' % chunk['Hash'])
+            dst_file.write(data)
+            size += len(data)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_file = os.path.join(tmp_dir, 'model.bin')
+        create_random_file(src_file, args.size_mb * 1024 * 1024)
+        hfs = MultihashFS(os.path.join(tmp_dir, 'objects'))
+        object_key = hfs.put(src_file)
+        dst_file = os.path.join(tmp_dir, 'checkout.bin')
+        unverified_hfs = MultihashFS(os.path.join(tmp_dir, 'objects'))
+        # isolates the cost of moving the data from the cost of hashing it
+        unverified_hfs._check_integrity = lambda cid, data: True
+        for name, get in (('buffered', lambda: buffered_get(hfs, object_key, dst_file)),
+                          ('zero-copy', lambda: hfs.get(object_key, dst_file)),
+                          ('zero-copy without integrity check', lambda: unverified_hfs.get(object_key, dst_file))):
+            results = {}
+            for run in range(args.runs):
+                if os.path.exists(dst_file):
+                    os.unlink(dst_file)
+                with timer(results, run):
+                    get()
+            print('%-34s %6.2f GB/s' % (name, args.size_mb / 1024 / min(results.values())))
+
+
+if __name__ == '__main__':
+    main()
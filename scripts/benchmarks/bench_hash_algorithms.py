@@ -0,0 +1,55 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Reports the digest throughput of each hash algorithm available to the entities specs on chunks of the default
+size, and the cost of encoding a CID with the fast path compared with the cid package.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_hash_algorithms.py [--size-mb 256]
+"""
+
+import argparse
+import os
+
+import multihash
+from cid import CIDv1
+
+from bench_utils import timer
+from ml_git.file_system.hash_algorithms import get_hash_algorithm, hash_algorithms
+
+CHUNK_SIZE = 256 * 1024
+CID_ENCODINGS = 100000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=256)
+    args = parser.parse_args()
+    chunk = os.urandom(CHUNK_SIZE)
+    nchunks = args.size_mb * 1024 * 1024 // CHUNK_SIZE
+
+    print('%-12s %10s' % ('algorithm', 'MB/s'))
+    for name in hash_algorithms():
+        algorithm = get_hash_algorithm(name)
+        results = {}
+        with timer(results, 'digest'):
+            for _ in range(nchunks):
+                algorithm.digest(chunk)
+        print('%-12s %10.1f' % (name, args.size_mb / results['digest']))
+
+    algorithm = get_hash_algorithm()
+    hasher = algorithm.new()
+    hasher.update(chunk)
+    results = {}
+    with timer(results, 'fast'):
+        for _ in range(CID_ENCODINGS):
+            algorithm.cid(hasher)
+    with timer(results, 'cid'):
+        for _ in range(CID_ENCODINGS):
+            str(CIDv1('dag-pb', multihash.encode(bytes.fromhex(hasher.hexdigest()), 'sha2-256')))
+    print('\nCID encoding: %.2f us (fast path), %.2f us (cid package)' % (results['fast'] / CID_ENCODINGS * 1e6,
+                                                                          results['cid'] / CID_ENCODINGS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
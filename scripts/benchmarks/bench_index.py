@@ -0,0 +1,68 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the cost of adding a single file to the working index of an entity that already holds --files
+files, as `ml-git <entity> add` of one file does: open the index, look the file up, record it and save.
+Compares the YAML files of older versions (INDEX.yaml and MANIFEST.yaml) with the SQLite index.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_index.py [--files 200000]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
+from ml_git.manifest import Manifest
+from ml_git.utils import yaml_save
+
+
+def entry(i):
+    return {'ctime': 1650000000.5 + i, 'mtime': 1650000000.25 + i, 'status': 'a', 'hash': 'zdj7W%045d' % i, 'size': 1024 + i}
+
+
+def add_one_file(index, manifest, i):
+    index.get('data/new-file-%d' % i)
+    index.add('data/new-file-%d' % i, entry(i))
+    manifest.add('zdj7W%045d' % i, 'data/new-file-%d' % i)
+    index.save()
+    manifest.save()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200000)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yaml_dir = os.path.join(tmp_dir, 'yaml')
+        sqlite_dir = os.path.join(tmp_dir, 'sqlite')
+        os.makedirs(yaml_dir)
+        os.makedirs(sqlite_dir)
+        files = {'data/file-%d' % i: entry(i) for i in range(args.files)}
+        manifest = {'zdj7W%045d' % i: {'data/file-%d' % i} for i in range(args.files)}
+        yaml_save(files, os.path.join(yaml_dir, 'INDEX.yaml'))
+        yaml_save(manifest, os.path.join(yaml_dir, 'MANIFEST.yaml'))
+        yaml_save(files, os.path.join(sqlite_dir, 'INDEX.yaml'))
+        yaml_save(manifest, os.path.join(sqlite_dir, 'MANIFEST.yaml'))
+
+        results = {}
+        with timer(results, 'migration'):
+            FileIndexStore(sqlite_dir).is_saved()
+            ManifestIndexStore(sqlite_dir).is_saved()
+        with timer(results, 'yaml'):
+            add_one_file(Manifest(os.path.join(yaml_dir, 'INDEX.yaml')), Manifest(os.path.join(yaml_dir, 'MANIFEST.yaml')), args.files)
+        with timer(results, 'sqlite'):
+            add_one_file(FileIndexStore(sqlite_dir), ManifestIndexStore(sqlite_dir), args.files)
+
+        print('%d files in the index, one-time migration to SQLite: %.2f s' % (args.files, results['migration']))
+        print('%-8s %18s' % ('index', 'add one file (ms)'))
+        for name in ('yaml', 'sqlite'):
+            print('%-8s %18.1f' % (name, results[name] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the removal of --deleted files from a Manifest of --files files, as done for the files deleted
+from the workspace, with the reverse file-to-key map of Manifest and with a scan of the keys.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_manifest.py [--files 200000] [--deleted 2000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from bench_utils import timer
+from ml_git.manifest import Manifest
+
+
+def scan_rm_file(manifest, file):
+    mf = manifest.get_yaml()
+    for key in mf:
+        files = mf[key]
+        if file not in files:
+            continue
+        if len(files) == 1:
+            del mf[key]
+        else:
+            files.remove(file)
+        return True
+    return False
+
+
+def create_manifest(path, nfiles):
+    manifest = Manifest(os.path.join(path, 'MANIFEST.yaml'))
+    for i in range(nfiles):
+        manifest.add('zdj7W%045d' % i, 'data/dir-%d/file-%d' % (i % 100, i))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--deleted', type=int, default=2000)
+    args = parser.parse_args()
+    deleted = ['data/dir-%d/file-%d' % (i % 100, i) for i in random.sample(range(args.files), args.deleted)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        manifest = create_manifest(tmp_dir, args.files)
+        with timer(results, 'scan'):
+            assert all(scan_rm_file(manifest, file) for file in deleted)
+        manifest = create_manifest(tmp_dir, args.files)
+        with timer(results, 'reverse map'):
+            assert all(manifest.rm_file(file) for file in deleted)
+
+    print('removing %d of %d files' % (args.deleted, args.files))
+    print('%-12s %10s %12s' % ('lookup', 'total (s)', 'us per file'))
+    for name in ('scan', 'reverse map'):
+        print('%-12s %10.3f %12.1f' % (name, results[name], results[name] / args.deleted * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the peak RSS and the load time of a MANIFEST.yaml of --files files (one per hash, spread over
+--dirs directories) loaded as a dict of sets by yaml_load and as a CompactManifest. Each loader runs in its
+own process, and the RSS of an interpreter that only imports ml_git is reported as the baseline.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_manifest_memory.py [--files 500000] [--dirs 1000]
+"""
+
+import argparse
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import silence_debug_logs
+from ml_git.compact_manifest import load_compact_manifest
+from ml_git.file_system.hash_algorithms import get_hash_algorithm
+from ml_git.utils import yaml_load
+
+
+def write_manifest(path, nfiles, ndirs):
+    algorithm = get_hash_algorithm()
+    with open(path, 'w') as manifest_file:
+        for i in range(nfiles):
+            key = algorithm.cid(hashlib.sha256(str(i).encode()))
+            manifest_file.write('%s: !!set\n  data/dir-%d/image-%08d.jpg: null\n' % (key, i % ndirs, i))
+
+
+def load(loader, path):
+    silence_debug_logs()
+    start = time.perf_counter()
+    manifest = load_compact_manifest(path) if loader == 'compact' else yaml_load(path) if loader == 'yaml' else {}
+    elapsed = time.perf_counter() - start
+    print('%d %.2f %d' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed, len(manifest)))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--load':
+        return load(sys.argv[2], sys.argv[3])
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500000)
+    parser.add_argument('--dirs', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'MANIFEST.yaml')
+        write_manifest(path, args.files, args.dirs)
+        results = {}
+        for loader in ('baseline', 'yaml', 'compact'):
+            output = subprocess.check_output([sys.executable, __file__, '--load', loader, path])
+            rss, elapsed, count = output.split()
+            results[loader] = (int(rss) / 1024, float(elapsed), int(count))
+
+    baseline = results['baseline'][0]
+    print('%d files in %d directories' % (args.files, args.dirs))
+    print('%-10s %14s %16s %10s' % ('loader', 'peak RSS (MB)', 'above base (MB)', 'load (s)'))
+    for loader in ('yaml', 'compact'):
+        rss, elapsed, count = results[loader]
+        assert count == args.files
+        print('%-10s %14.1f %16.1f %10.2f' % (loader, rss, rss - baseline, elapsed))
+    print('memory reduction: %.1fx' % ((results['yaml'][0] - baseline) / max(results['compact'][0] - baseline, 1)))
+
+
+if __name__ == '__main__':
+    main()
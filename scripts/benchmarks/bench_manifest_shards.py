@@ -0,0 +1,70 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures a commit of --added new files to the metadata repository of an entity that already holds --files
+files, as `ml-git <entity> commit` does: load the committed manifest, merge the new files, save it and
+commit the entity directory with git. Compares a single MANIFEST.yaml with a manifest split in --shards shards.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_manifest_shards.py [--files 500000] [--added 10] [--shards 256]
+"""
+
+import argparse
+import os
+import tempfile
+
+from git import Repo
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.manifest import Manifest, get_manifest_files
+
+
+def commit(repo, entity_path, manifest_path, added, shards):
+    manifest = Manifest(manifest_path, shards)
+    manifest.merge(added)
+    manifest.save()
+    repo.git.add('--all', '--', entity_path)
+    return repo.index.commit('commit')
+
+
+def rewritten_bytes(commit_obj, changed):
+    return sum(blob.size for blob in commit_obj.tree.traverse() if blob.type == 'blob' and blob.path in changed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500000)
+    parser.add_argument('--added', type=int, default=10)
+    parser.add_argument('--shards', type=int, default=256)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    initial = {'zdj7W%045d' % i: {'data/dir-%d/file-%d' % (i % 100, i)} for i in range(args.files)}
+    added = {'zdj7WNew%042d' % i: {'data/new/file-%d' % i} for i in range(args.added)}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, shards in (('single', 0), ('sharded', args.shards)):
+            repo = Repo.init(os.path.join(tmp_dir, name))
+            entity_path = os.path.join(repo.working_dir, 'dataset-ex')
+            manifest_path = os.path.join(entity_path, 'MANIFEST.yaml')
+            os.makedirs(entity_path)
+            manifest = Manifest(manifest_path, shards)
+            manifest.merge(initial)
+            manifest.save()
+            repo.git.add('--all', '--', entity_path)
+            repo.index.commit('initial')
+
+            with timer(results, name):
+                commit_obj = commit(repo, entity_path, manifest_path, added, shards)
+            changed = commit_obj.stats.files
+            results[name + ' files'] = (len(changed), len(get_manifest_files(manifest_path)), rewritten_bytes(commit_obj, changed))
+
+    print('commit of %d files to an entity of %d files' % (args.added, args.files))
+    print('%-8s %10s %18s %20s' % ('layout', 'commit (s)', 'files changed', 'bytes rewritten'))
+    for name in ('single', 'sharded'):
+        changed, total, size = results[name + ' files']
+        print('%-8s %10.2f %18s %20d' % (name, results[name], '%d of %d' % (changed, total), size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Stores many small files in a MultihashFS and reports the inode count and the fsck and garbage collector
+times before and after the loose objects are moved into packfiles.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_packfiles.py [--files 20000] [--file-size 4096]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.file_system.objects import Objects
+
+
+def count_inodes(path):
+    inodes = 0
+    for _, dirs, files in os.walk(path):
+        inodes += len(dirs) + len(files)
+    return inodes
+
+
+def measure(objects, objects_path, used_keys, label):
+    results = {}
+    with timer(results, 'fsck'):
+        objects.fsck()
+    with timer(results, 'gc'):
+        objects.garbage_collector(used_keys)
+    print('%-7s inodes=%-9d fsck=%7.2fs  gc=%7.2fs' % (label, count_inodes(os.path.join(objects_path, 'hashfs')),
+                                                       results['fsck'], results['gc']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--file-size', type=int, default=4096)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        objects_path = os.path.join(tmp_dir, 'objects')
+        objects = Objects('', objects_path)
+        file_path = os.path.join(tmp_dir, 'file.bin')
+        used_keys = []
+        for _ in range(args.files):
+            with open(file_path, 'wb') as f:
+                f.write(os.urandom(args.file_size))
+            used_keys.append(objects.put(file_path))
+
+        measure(objects, objects_path, used_keys, 'loose')
+        results = {}
+        with timer(results, 'repack'):
+            objects.repack()
+        print('repack  %.2fs' % results['repack'])
+        measure(objects, objects_path, used_keys, 'packed')
+
+
+if __name__ == '__main__':
+    main()
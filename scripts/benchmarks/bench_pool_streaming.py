@@ -0,0 +1,77 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Runs --tasks simulated storage requests of variable latency (between 1 and --latency ms) in a worker pool of
+--workers threads, submitted as fetch and checkout did (groups of 20 tasks ending in a barrier), all at once
+as push did, and streamed through WorkerPool.imap_unordered. Reports the time and the peak number of
+futures held by the pool.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_pool_streaming.py [--tasks 20000] [--workers 20] [--latency 20]
+"""
+
+import argparse
+import random
+import time
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.pool import WorkerPool, process_futures
+from ml_git.utils import run_function_per_group
+
+
+def request(latency):
+    time.sleep(latency)
+    return latency
+
+
+def groups(wp, latencies, peak):
+    def run_group(group, _):
+        for latency in group:
+            wp.submit(request, latency)
+        peak.append(wp.pending_count())
+        process_futures(wp.wait(), wp)
+        return True
+    run_function_per_group(latencies, 20, function=run_group)
+
+
+def submit_all(wp, latencies, peak):
+    for latency in latencies:
+        wp.submit(request, latency)
+    peak.append(wp.pending_count())
+    process_futures(wp.wait(), wp)
+
+
+def streaming(wp, latencies, peak):
+    for _, future in wp.imap_unordered(request, latencies):
+        peak.append(wp.pending_count())
+        future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--latency', type=int, default=20)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    latencies = [random.randint(1, args.latency) / 1000 for _ in range(args.tasks)]
+    runs = (('groups of 20', groups), ('submit all', submit_all), ('streaming', streaming))
+    results = {}
+    for name, run in runs:
+        wp = WorkerPool(nworkers=args.workers)
+        peak = []
+        with timer(results, name):
+            run(wp, latencies, peak)
+        results[name + ' peak'] = max(peak)
+        wp.shutdown()
+
+    ideal = sum(latencies) / args.workers
+    print('%d requests of 1-%d ms on %d workers (%.1f s with the workers always busy)' % (args.tasks, args.latency, args.workers, ideal))
+    print('%-14s %10s %14s %14s' % ('submission', 'time (s)', 'worker usage', 'peak futures'))
+    for name, _ in runs:
+        print('%-14s %10.1f %13.0f%% %14d' % (name, results[name], 100 * ideal / results[name], results[name + ' peak']))
+
+
+if __name__ == '__main__':
+    main()
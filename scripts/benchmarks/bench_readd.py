@@ -0,0 +1,66 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the re-add of a modified file of --size MB, as `ml-git <entity> add` does for a file of the index
+whose mtime changed: hashing it to compare with its previous key, then storing its new chunks.
+Compares hashing and storing in two reads of the file with the single pass of get_scid(store=True).
+The bytes read are taken from /proc/self/io (Linux only).
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_readd.py [--size 512]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench_utils import create_random_file, silence_debug_logs, timer
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def read_bytes():
+    with open('/proc/self/io') as io:
+        for line in io:
+            if line.startswith('rchar:'):
+                return int(line.split()[1])
+    return 0
+
+
+def two_passes(hfs, path, previous_key):
+    if hfs.get_scid(path, previous_key) != previous_key:
+        return hfs.put(path)
+
+
+def single_pass(hfs, path, previous_key):
+    scid = hfs.get_scid(path, previous_key, store=True, size=os.stat(path).st_size)
+    if scid != previous_key:
+        return scid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=512)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.bin')
+        results = {}
+        for name, readd in (('two passes', two_passes), ('single pass', single_pass)):
+            hfs = MultihashFS(os.path.join(tmp_dir, name))
+            create_random_file(path, args.size * 1024 * 1024)
+            previous_key = hfs.put(path)
+            create_random_file(path, args.size * 1024 * 1024)
+            before = read_bytes()
+            with timer(results, name):
+                assert readd(hfs, path, previous_key) is not None
+            results[name + ' read'] = read_bytes() - before
+
+    print('re-add of a modified file of %d MB' % args.size)
+    print('%-12s %10s %14s' % ('hashing', 'time (s)', 'read (MB)'))
+    for name in ('two passes', 'single pass'):
+        print('%-12s %10.2f %14.1f' % (name, results[name], results[name + ' read'] / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
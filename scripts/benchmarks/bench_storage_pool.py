@@ -0,0 +1,76 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Measures the startup cost of the storage connections of a worker pool of --workers threads (the default
+push_threads_count of a 64-core host) that uploads --files files of --latency seconds each: the boto3 S3 resources
+are created for every worker before the first task, as pool_factory did, and lazily through a ContextPool.
+The fetch runs two pools in a row (descriptors then blobs), with the lazy storages kept between them.
+No request is sent to S3: the benchmark only creates the resources.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_storage_pool.py [--workers 320] [--files 3] [--latency 0.05]
+"""
+
+import argparse
+import time
+
+import boto3
+
+from bench_utils import silence_debug_logs, timer
+from ml_git.pool import ContextPool, WorkerPool
+
+
+def s3_resource():
+    return boto3.Session().resource('s3', region_name='us-east-1')
+
+
+def upload(ctx, latency):
+    time.sleep(latency)
+    return ctx
+
+
+def run_pool(nworkers, files, latency, pool_ctxs=None, ctx_pool=None):
+    wp = WorkerPool(nworkers=nworkers, pool_ctxs=pool_ctxs, ctx_pool=ctx_pool)
+    for _, future in wp.imap_unordered(upload, range(files)):
+        future.result()
+    wp.shutdown()
+
+
+def eager(nworkers, files, latency, phases):
+    created = 0
+    for _ in range(phases):
+        ctxs = [s3_resource() for _ in range(nworkers)]
+        created += len(ctxs)
+        run_pool(nworkers, files, latency, pool_ctxs=ctxs)
+    return created
+
+
+def lazy(nworkers, files, latency, phases):
+    ctx_pool = ContextPool(s3_resource)
+    for _ in range(phases):
+        run_pool(nworkers, files, latency, ctx_pool=ctx_pool)
+    return ctx_pool.created
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=320)
+    parser.add_argument('--files', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    runs = [('eager push', eager, 1), ('lazy push', lazy, 1), ('eager fetch', eager, 2), ('lazy fetch', lazy, 2)]
+    results = {}
+    for name, run, phases in runs:
+        with timer(results, name):
+            results[name + ' created'] = run(args.workers, args.files, args.latency, phases)
+
+    print('%d files of %.2f s each on %d workers' % (args.files, args.latency, args.workers))
+    print('%-12s %10s %18s' % ('storages', 'time (s)', 'resources created'))
+    for name, _, _ in runs:
+        print('%-12s %10.2f %18d' % (name, results[name], results[name + ' created']))
+
+
+if __name__ == '__main__':
+    main()
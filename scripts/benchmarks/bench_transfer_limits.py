@@ -0,0 +1,97 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Uploads --files files of --size bytes with a worker pool of --workers threads to a storage that copies them to a
+local directory, without limits and then with a --bandwidth bytes/s and a --requests requests/s limit, and reports
+the rates reached and the time the requests spent throttled.
+
+Usage: PYTHONPATH=. python scripts/benchmarks/bench_transfer_limits.py [--files 200] [--size 65536] [--workers 64]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from bench_utils import create_random_file, silence_debug_logs, timer
+from ml_git.pool import pool_factory
+from ml_git.storages.storage import Storage
+from ml_git.storages.transfer_limits import TransferLimiter
+
+
+class DirectoryStorage(Storage):
+
+    def __init__(self, path):
+        self._path = path
+        super(DirectoryStorage, self).__init__()
+
+    def connect(self):
+        self._storage = self._path
+
+    def put(self, key_path, file_path):
+        self._limit_request(os.path.getsize(file_path))
+        shutil.copyfile(file_path, os.path.join(self._storage, key_path))
+        return key_path
+
+    def get(self, file_path, reference):
+        self._limit_request()
+        shutil.copyfile(os.path.join(self._storage, reference), file_path)
+        self._limit_download(file_path)
+        return True
+
+
+def upload(storage, name, src):
+    return storage.file_store(name, os.path.join(src, name))
+
+
+def run(src, dst, files, workers, limiter):
+    def storage_factory():
+        storage = DirectoryStorage(dst)
+        storage.limiter = limiter
+        return storage
+
+    wp = pool_factory(ctx_factory=storage_factory, nworkers=workers)
+    for _, future in wp.imap_unordered(upload, files, src):
+        future.result()
+    wp.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', type=int, default=64 * 1024)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--bandwidth', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+    silence_debug_logs()
+
+    src = tempfile.mkdtemp()
+    dst = tempfile.mkdtemp()
+    try:
+        files = ['file-%d' % i for i in range(args.files)]
+        for name in files:
+            create_random_file(os.path.join(src, name), args.size)
+
+        runs = [('no limit', TransferLimiter()), ('bandwidth', TransferLimiter(bandwidth_limit=args.bandwidth)),
+                ('requests', TransferLimiter(requests_limit=args.requests))]
+        results = {}
+        for name, limiter in runs:
+            with timer(results, name):
+                run(src, dst, files, args.workers, limiter)
+
+        total = args.files * args.size
+        print('%d files of %d bytes on %d workers, limits: %d bytes/s, %d requests/s'
+              % (args.files, args.size, args.workers, args.bandwidth, args.requests))
+        print('%-10s %10s %14s %12s %14s' % ('limit', 'time (s)', 'bytes/s', 'requests/s', 'throttled (s)'))
+        for name, limiter in runs:
+            elapsed = results[name]
+            print('%-10s %10.2f %14.0f %12.1f %14.1f' % (name, elapsed, total / elapsed, args.files / elapsed, limiter.stats()['throttled']))
+    finally:
+        shutil.rmtree(src)
+        shutil.rmtree(dst)
+
+
+if __name__ == '__main__':
+    main()
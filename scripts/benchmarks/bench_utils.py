@@ -0,0 +1,34 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+
+Helpers shared by the benchmark scripts in this directory.
+Run the scripts from the repository root with PYTHONPATH=. so that ml_git is importable.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from ml_git import log
+
+
+def silence_debug_logs():
+    # per-chunk debug messages would otherwise dominate the measurements
+    log.debug = lambda *args, **kwargs: None
+
+
+def create_random_file(path, size, block_size=4 * 1024 * 1024):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            block = os.urandom(min(remaining, block_size))
+            f.write(block)
+            remaining -= len(block)
+
+
+@contextmanager
+def timer(results, name):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
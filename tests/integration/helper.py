@@ -17,6 +17,7 @@ from ruamel.yaml import YAML
 from ml_git.commands.wizard import WIZARD_KEY, WizardMode
 from ml_git.constants import GLOBAL_ML_GIT_CONFIG, MutabilityType, StorageType, EntityType, STORAGE_SPEC_KEY, \
     STORAGE_CONFIG_KEY, FileType, MLGIT_IGNORE_FILE_NAME
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
 from ml_git.ml_git_message import output_messages
 from ml_git.spec import get_spec_key
 from ml_git.utils import ensure_path_exists
@@ -189,10 +190,8 @@ def add_file(self, entity, bumpversion, name=None, artifact_name=None, file_cont
     else:
         self.assertIn(output_messages['INFO_ADDING_PATH'] % LABELS, check_output(MLGIT_ADD % (entity, artifact_name, bumpversion)))
     metadata = os.path.join(self.tmp_dir, ML_GIT_DIR, entity, 'index', 'metadata', artifact_name)
-    metadata_file = os.path.join(metadata, 'MANIFEST.yaml')
-    index_file = os.path.join(metadata, 'INDEX.yaml')
-    self.assertTrue(os.path.exists(metadata_file))
-    self.assertTrue(os.path.exists(index_file))
+    self.assertTrue(ManifestIndexStore(metadata).is_saved())
+    self.assertTrue(FileIndexStore(metadata).is_saved())
 
 
 def delete_file(workspace_path, delete_files):
@@ -11,6 +11,7 @@ from stat import S_IWUSR, S_IREAD
 import pytest
 
 from ml_git.constants import MLGIT_IGNORE_FILE_NAME
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
 from ml_git.ml_git_message import output_messages
 from ml_git.spec import get_spec_key
 from ml_git.utils import ensure_path_exists
@@ -59,12 +60,12 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         self.assertIn(output_messages['INFO_NO_NEW_DATA_TO_ADD'], check_output(MLGIT_ADD % (DATASETS, DATASET_NAME, '--bumpversion')))
 
     def _check_index(self, index, files_in, files_not_in):
-        with open(index, 'r') as file:
-            added_file = yaml_processor.load(file)
-            for file in files_in:
-                self.assertIn(file, added_file)
-            for file in files_not_in:
-                self.assertNotIn(file, added_file)
+        added_file = FileIndexStore(index)
+        self.assertTrue(added_file.is_saved())
+        for file in files_in:
+            self.assertIn(file, added_file)
+        for file in files_not_in:
+            self.assertNotIn(file, added_file)
 
     @pytest.mark.usefixtures('start_local_git_server', 'switch_to_tmp_dir')
     def test_06_add_command_with_corrupted_file_added(self):
@@ -97,7 +98,7 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         add_command_output = check_output(MLGIT_ADD % (DATASETS, DATASET_NAME, os.path.join('data', 'file1')))
         self.assertIn(output_messages['INFO_ADDING_PATH'] % DATASETS, add_command_output)
         self.assertIn(output_messages['INFO_FILE_AUTOMATICALLY_ADDED'].format(DATASET_NAME + '.spec'), add_command_output)
-        index = os.path.join(ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME, 'INDEX.yaml')
+        index = os.path.join(ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME)
         self._check_index(index, ['data/file1'], ['data/file2', 'data/file3'])
 
         add_command_output = check_output(MLGIT_ADD % (DATASETS, DATASET_NAME, 'data'))
@@ -124,7 +125,7 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         metrics_options = '--metric Accuracy 1 --metric Recall 2'
 
         self.assertIn(output_messages['INFO_ADDING_PATH'] % repo_type, check_output(MLGIT_ADD % (repo_type, entity_name, metrics_options)))
-        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', entity_name, 'INDEX.yaml')
+        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', entity_name)
         self._check_index(index, ['data/file1'], [])
 
         with open(os.path.join(workspace, entity_name + '.spec')) as spec:
@@ -151,8 +152,8 @@ class AddFilesAcceptanceTests(unittest.TestCase):
 
         self.assertIn(output_messages['ERROR_NO_SUCH_OPTION'] % '--metric',
                       check_output(MLGIT_ADD % (repo_type, DATASET_NAME, metrics_options)))
-        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', DATASET_NAME, 'INDEX.yaml')
-        self.assertFalse(os.path.exists(index))
+        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', DATASET_NAME)
+        self.assertFalse(FileIndexStore(index).is_saved())
 
         with open(os.path.join(workspace, DATASET_NAME+'.spec')) as spec:
             spec_file = yaml_processor.load(spec)
@@ -180,7 +181,7 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         metrics_options = '--metrics-file="{}"'.format(csv_file)
 
         self.assertIn(output_messages['INFO_ADDING_PATH'] % repo_type, check_output(MLGIT_ADD % (repo_type, entity_name, metrics_options)))
-        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', entity_name, 'INDEX.yaml')
+        index = os.path.join(ML_GIT_DIR, repo_type, 'index', 'metadata', entity_name)
         self._check_index(index, ['data/file1'], [])
 
         with open(os.path.join(workspace, entity_name + '.spec')) as spec:
@@ -241,10 +242,8 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         self.assertNotIn(ERROR_MESSAGE, output)
 
         metadata = os.path.join(self.tmp_dir, ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME)
-        metadata_file = os.path.join(metadata, 'MANIFEST.yaml')
-        index_file = os.path.join(metadata, 'INDEX.yaml')
-        self.assertTrue(os.path.exists(metadata_file))
-        self.assertTrue(os.path.exists(index_file))
+        self.assertTrue(ManifestIndexStore(metadata).is_saved())
+        self.assertTrue(FileIndexStore(metadata).is_saved())
 
     @pytest.mark.usefixtures('start_local_git_server', 'switch_to_tmp_dir')
     def test_14_add_with_ignore_file(self):
@@ -264,13 +263,10 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         self.assertNotIn(ERROR_MESSAGE, output)
 
         metadata = os.path.join(self.tmp_dir, ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME)
-        metadata_file = os.path.join(metadata, 'MANIFEST.yaml')
-        index_file = os.path.join(metadata, 'INDEX.yaml')
         ignore_file = os.path.join(metadata, MLGIT_IGNORE_FILE_NAME)
-        self.assertTrue(os.path.exists(metadata_file))
+        self.assertTrue(ManifestIndexStore(metadata).is_saved())
         self.assertTrue(os.path.exists(ignore_file))
-        self.assertTrue(os.path.exists(index_file))
-        self._check_index(index_file, ['data/file1', 'data/file2'], ['data/image.png', 'ignored-folder/image2.jpg'])
+        self._check_index(metadata, ['data/file1', 'data/file2'], ['data/image.png', 'ignored-folder/image2.jpg'])
 
     @pytest.mark.usefixtures('start_local_git_server', 'switch_to_tmp_dir')
     def test_15_add_and_edit_file_with_same_hash(self):
@@ -289,7 +285,7 @@ class AddFilesAcceptanceTests(unittest.TestCase):
         self.assertNotIn(ERROR_MESSAGE, check_output(MLGIT_COMMIT % (DATASETS, entity_name, '')))
         self.assertNotIn(ERROR_MESSAGE, check_output(MLGIT_PUSH % (DATASETS, entity_name)))
 
-        index = os.path.join(ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME, 'INDEX.yaml')
+        index = os.path.join(ML_GIT_DIR, DATASETS, 'index', 'metadata', DATASET_NAME)
         self._check_index(index, ['file1', 'file1 - Copy'], [])
 
     @pytest.mark.usefixtures('start_local_git_server', 'switch_to_tmp_dir', 'create_csv_file')
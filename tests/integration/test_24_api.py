@@ -11,6 +11,7 @@ import pytest
 from ml_git import api
 from ml_git.constants import EntityType, STORAGE_SPEC_KEY, STORAGE_CONFIG_KEY, DATE, RELATED_DATASET_TABLE_INFO, \
     RELATED_LABELS_TABLE_INFO, TAG, LABELS_SPEC_KEY, DATASET_SPEC_KEY, MODEL_SPEC_KEY, FileType, GraphEntityColors
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
 from ml_git.ml_git_message import output_messages
 from ml_git.spec import get_spec_key
 from tests.integration.commands import MLGIT_INIT, MLGIT_COMMIT
@@ -217,18 +218,16 @@ class APIAcceptanceTests(unittest.TestCase):
 
     def check_add(self, entity=DATASETS, files=['file', 'file2'], files_not_in=[]):
         metadata = os.path.join(self.tmp_dir, ML_GIT_DIR, entity, 'index', 'metadata', entity + '-ex')
-        metadata_file = os.path.join(metadata, 'MANIFEST.yaml')
-        index_file = os.path.join(metadata, 'INDEX.yaml')
-
-        self.assertTrue(os.path.exists(metadata_file))
-        self.assertTrue(os.path.exists(index_file))
-
-        with open(metadata_file) as y:
-            manifest = yaml_processor.load(y)
-            for file in files:
-                self.assertIn({file}, manifest.values())
-            for file in files_not_in:
-                self.assertNotIn({file}, manifest.values())
+        index_manifest = ManifestIndexStore(metadata)
+
+        self.assertTrue(index_manifest.is_saved())
+        self.assertTrue(FileIndexStore(metadata).is_saved())
+
+        manifest = index_manifest.load()
+        for file in files:
+            self.assertIn({file}, manifest.values())
+        for file in files_not_in:
+            self.assertNotIn({file}, manifest.values())
 
     def check_entity_version(self, version, entity=DATASETS):
         spec_path = os.path.join(entity, entity+'-ex', entity+'-ex.spec')
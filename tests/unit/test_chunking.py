@@ -0,0 +1,65 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import io
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from ml_git.constants import CHUNKING_SPEC_KEY, STORAGE_SPEC_KEY, HASH_ALGORITHM_SPEC_KEY
+from ml_git.file_system import chunking
+from ml_git.file_system.chunking import ContentDefinedChunker, create_chunker, get_inline_max_size, get_hash_algorithm_name
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class ChunkingTestCases(unittest.TestCase):
+
+    def test_chunks_respect_size_limits(self):
+        data = os.urandom(512 * 1024)
+        chunker = ContentDefinedChunker(2 * 1024, 8 * 1024, 32 * 1024)
+        chunks = list(chunker.chunks(io.BytesIO(data)))
+        self.assertEqual(b''.join(chunks), data)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), 2 * 1024)
+            self.assertLessEqual(len(chunk), 32 * 1024)
+
+    def test_chunks_are_deterministic(self):
+        data = os.urandom(256 * 1024)
+        chunker = ContentDefinedChunker(2 * 1024, 8 * 1024, 32 * 1024)
+        self.assertEqual(list(chunker.chunks(io.BytesIO(data))), list(chunker.chunks(io.BytesIO(data))))
+
+    @unittest.skipIf(chunking.numpy is None, 'numpy is not installed')
+    def test_block_scan_matches_byte_scan(self):
+        data = os.urandom(512 * 1024)
+        chunker = ContentDefinedChunker(2 * 1024, 8 * 1024, 32 * 1024)
+        byte_chunker = ContentDefinedChunker(2 * 1024, 8 * 1024, 32 * 1024)
+        byte_chunker._scan = byte_chunker._scan_bytes
+        expected = list(byte_chunker.chunks(io.BytesIO(data)))
+        self.assertEqual(list(chunker.chunks(io.BytesIO(data))), expected)
+        # blocks smaller than the chunks split the search around the normal size
+        with mock.patch('ml_git.file_system.chunking.CDC_SCAN_BLOCK_SIZE', 1000):
+            self.assertEqual(list(chunker.chunks(io.BytesIO(data))), expected)
+
+    def test_invalid_chunk_sizes(self):
+        self.assertRaises(RuntimeError, lambda: ContentDefinedChunker(64, 32, 128))
+
+    def test_create_chunker(self):
+        self.assertIsNone(create_chunker({STORAGE_SPEC_KEY: 's3h://fake'}))
+        self.assertIsNone(create_chunker({CHUNKING_SPEC_KEY: {'type': 'fixed'}}))
+        chunker = create_chunker({CHUNKING_SPEC_KEY: {'type': 'cdc', 'avg_size': 128 * 1024}})
+        self.assertEqual(chunker.avg_size, 128 * 1024)
+        self.assertRaises(RuntimeError, lambda: create_chunker({CHUNKING_SPEC_KEY: {'type': 'unknown'}}))
+
+    def test_get_inline_max_size(self):
+        self.assertEqual(get_inline_max_size({STORAGE_SPEC_KEY: 's3h://fake'}), 0)
+        self.assertEqual(get_inline_max_size({CHUNKING_SPEC_KEY: {'type': 'cdc'}}), 0)
+        self.assertEqual(get_inline_max_size({CHUNKING_SPEC_KEY: {'inline_max_size': 4096}}), 4096)
+
+    def test_get_hash_algorithm_name(self):
+        self.assertEqual(get_hash_algorithm_name({STORAGE_SPEC_KEY: 's3h://fake'}), 'sha2-256')
+        self.assertEqual(get_hash_algorithm_name({HASH_ALGORITHM_SPEC_KEY: 'blake2b-256'}), 'blake2b-256')
+        self.assertRaises(RuntimeError, lambda: get_hash_algorithm_name({HASH_ALGORITHM_SPEC_KEY: 'md5'}))
@@ -0,0 +1,65 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+
+import pytest
+
+from ml_git.compact_manifest import CompactManifest, load_compact_manifest
+from ml_git.manifest import Manifest
+from ml_git.sample import SampleValidate
+from ml_git.utils import yaml_save, yaml_load
+
+MANIFEST = {
+    'zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9u': {'data/think-hires.jpg', 'data/copy of think-hires.jpg'},
+    'zdj7WemKEtQMVL81UU6PSuYaoxvBQ6CiUMq1fMvoXBhPUsCK2': {'image.jpg'},
+    'zb2rhX8LkXBgtAoq5FkMjMk4GBSFRMqKDQC6S6YnB8AGxGvCL': {"data/it's.txt", 'data/123', 'data/null', 'data/a:b', 'data/tab\there',
+                                                          'data/%s.txt' % ('x' * 200), 'dados/ü.txt'},
+    'not-a-cid': {'other/file'},
+}
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class CompactManifestTestCases(unittest.TestCase):
+
+    def _save(self, manifest):
+        path = os.path.join(self.tmp_dir, 'MANIFEST.yaml')
+        yaml_save(manifest, path)
+        return path
+
+    def test_load(self):
+        path = self._save(MANIFEST)
+        manifest = load_compact_manifest(path)
+        self.assertEqual(len(manifest), len(MANIFEST))
+        self.assertEqual(list(manifest), list(yaml_load(path)))
+        self.assertEqual(dict(manifest.items()), MANIFEST)
+        self.assertEqual(manifest.files_count(), 11)
+        for key, files in MANIFEST.items():
+            self.assertIn(key, manifest)
+            self.assertEqual(manifest[key], files)
+        self.assertIsNone(manifest.get('zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9v'))
+        self.assertNotIn('zdj7', manifest)
+        self.assertRaises(KeyError, lambda: manifest['missing'])
+
+    def test_load_other_layouts(self):
+        path = os.path.join(self.tmp_dir, 'MANIFEST.yaml')
+        with open(path, 'w') as manifest_file:
+            manifest_file.write('zdj7WemKEtQMVL81UU6PSuYaoxvBQ6CiUMq1fMvoXBhPUsCK2: !!set {image.jpg: null}\n')
+        self.assertEqual(dict(load_compact_manifest(path).items()), {'zdj7WemKEtQMVL81UU6PSuYaoxvBQ6CiUMq1fMvoXBhPUsCK2': {'image.jpg'}})
+        self.assertEqual(len(load_compact_manifest(os.path.join(self.tmp_dir, 'missing.yaml'))), 0)
+
+    def test_sample(self):
+        manifest = load_compact_manifest(self._save(MANIFEST))
+        self.assertEqual(SampleValidate.process_samples({'range': '1:3'}, manifest), {
+            'zdj7WemKEtQMVL81UU6PSuYaoxvBQ6CiUMq1fMvoXBhPUsCK2': {'image.jpg'},
+            'zb2rhX8LkXBgtAoq5FkMjMk4GBSFRMqKDQC6S6YnB8AGxGvCL': MANIFEST['zb2rhX8LkXBgtAoq5FkMjMk4GBSFRMqKDQC6S6YnB8AGxGvCL']})
+
+    def test_compare_files(self):
+        mf = Manifest(self._save({'zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9u': {'data/think-hires.jpg', 'image.jpg'}}))
+        added_files, deleted_files, modified_files = mf.compare_files(CompactManifest.from_dict(MANIFEST))
+        self.assertEqual(len(added_files), 9)
+        self.assertEqual(list(deleted_files), [])
+        self.assertEqual(modified_files, ['image.jpg'])
@@ -0,0 +1,50 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+
+import pytest
+
+from ml_git.file_system.compression import CHUNK_MAGIC, decode_chunk, encode_chunk, get_codec, is_encoded
+from ml_git.storages.multihash_storage import MultihashStorage
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class CompressionTestCases(unittest.TestCase):
+
+    def test_encode_and_decode_chunk(self):
+        data = b'id,label,score\n' + b'1234,cat,0.98\n' * 1000
+        for name in ('zlib', 'bz2', 'lzma'):
+            encoded = encode_chunk(get_codec(name), data)
+            self.assertTrue(is_encoded(encoded))
+            self.assertLess(len(encoded), len(data))
+            self.assertEqual(decode_chunk(encoded), data)
+
+    def test_keep_incompressible_chunk(self):
+        data = os.urandom(4096)
+        encoded = encode_chunk(get_codec('zlib'), data)
+        self.assertEqual(encoded, data)
+        self.assertEqual(decode_chunk(encoded), data)
+
+    def test_uncompressed_chunk_with_magic(self):
+        data = CHUNK_MAGIC + b'\xff' + b'not compressed'
+        self.assertFalse(is_encoded(data))
+        self.assertEqual(decode_chunk(data), data)
+
+    def test_invalid_codec(self):
+        self.assertIsNone(get_codec(None))
+        self.assertRaises(RuntimeError, lambda: get_codec('unknown'))
+
+    def test_storage_checks_uncompressed_content(self):
+        data = b'0123456789' * 1000
+        file_path = os.path.join(self.tmp_dir, 'chunk')
+        with open(file_path, 'wb') as f:
+            f.write(encode_chunk(get_codec('zlib'), data))
+        storage = MultihashStorage()
+        with open(file_path, 'rb') as f:
+            ncid = storage.digest(f.read())
+        self.assertFalse(storage.check_integrity(storage.digest(data), ncid))
+        self.assertTrue(storage.check_integrity(storage.digest(data), ncid, file_path))
@@ -15,9 +15,10 @@ from ml_git.config import validate_config_spec_hash, get_sample_config_spec, get
     validate_spec_hash, config_verbose, get_refs_path, config_load, mlgit_config_load, list_repos, \
     get_index_path, get_objects_path, get_cache_path, get_metadata_path, import_dir, \
     extract_storage_info_from_list, create_workspace_tree_structure, get_batch_size, merge_conf, \
-    merge_local_with_global_config, mlgit_config, save_global_config_in_local, merged_config_load, _get_user_input
+    merge_local_with_global_config, mlgit_config, save_global_config_in_local, merged_config_load, _get_user_input, \
+    get_transfer_limits
 from ml_git.constants import BATCH_SIZE_VALUE, BATCH_SIZE, STORAGE_CONFIG_KEY, STORAGE_SPEC_KEY, DATASET_SPEC_KEY, \
-    PUSH_THREADS_COUNT
+    PUSH_THREADS_COUNT, BANDWIDTH_LIMIT, REQUESTS_LIMIT, STORAGE_BANDWIDTH_LIMIT, STORAGE_REQUESTS_LIMIT
 from ml_git.utils import get_root_path, yaml_load, yaml_processor
 from tests.unit.conftest import DATASETS, LABELS, MODELS, STRICT, S3H, S3
 
@@ -231,3 +232,11 @@ class ConfigTestCases(unittest.TestCase):
 
         with mock.patch('builtins.input', return_value='Test'):
             self.assertEquals('Test', _get_user_input(''))
+
+    def test_get_transfer_limits(self):
+        bucket = {STORAGE_BANDWIDTH_LIMIT: 1024, STORAGE_REQUESTS_LIMIT: 10}
+        self.assertEqual(get_transfer_limits({}), (0, 0))
+        self.assertEqual(get_transfer_limits({BANDWIDTH_LIMIT: 0, REQUESTS_LIMIT: 0}, bucket), (1024, 10))
+        self.assertEqual(get_transfer_limits({BANDWIDTH_LIMIT: '2048', REQUESTS_LIMIT: 0}, bucket), (2048, 10))
+        self.assertRaises(RuntimeError, get_transfer_limits, {REQUESTS_LIMIT: -1})
+        self.assertRaises(RuntimeError, get_transfer_limits, {}, {STORAGE_BANDWIDTH_LIMIT: 'fast'})
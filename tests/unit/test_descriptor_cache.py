@@ -0,0 +1,92 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from ml_git.file_system.descriptor_cache import DescriptorCache
+from ml_git.file_system.hashfs import MultihashFS
+
+
+def _descriptor(*links):
+    return {'Links': [{'Hash': cid, 'Size': size} for cid, size in links]}
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class DescriptorCacheTestCases(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = DescriptorCache(max_entries=2)
+        cache.put('a', _descriptor(('chunk-a', 1)))
+        cache.put('b', _descriptor(('chunk-b', 2)))
+        self.assertEqual(cache.get('a'), _descriptor(('chunk-a', 1)))
+        cache.put('c', _descriptor(('chunk-c', 3), ('chunk-d', 4)))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), _descriptor(('chunk-c', 3), ('chunk-d', 4)))
+        self.assertEqual(cache.stats(), {'entries': 2, 'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+    def test_ignore_unknown_descriptor_format(self):
+        cache = DescriptorCache()
+        cache.put('a', {'Links': [{'Hash': 'chunk-a', 'Size': 1, 'Name': 'file'}]})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+        descriptor = {'Links': [{'Hash': 'chunk-b', 'Size': 2}], 'Codec': 'zlib'}
+        cache.put('b', descriptor)
+        self.assertEqual(list(cache.get('b').items()), list(descriptor.items()))
+
+    def test_load_descriptor_from_cache(self):
+        file_path = os.path.join(self.tmp_dir, 'file.bin')
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(1024))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        hfs._descriptors = DescriptorCache()
+        objkey = hfs.put(file_path)
+        descriptor = hfs.load(objkey)
+        os.unlink(hfs.get_keypath(objkey))
+        self.assertEqual(hfs.load(objkey), descriptor)
+        self.assertEqual(hfs._descriptors.hits, 1)
+
+    def test_corrupted_descriptor_is_not_cached(self):
+        file_path = os.path.join(self.tmp_dir, 'file.bin')
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(1024))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        hfs._descriptors = DescriptorCache()
+        objkey = hfs.put(file_path)
+        with open(hfs.get_keypath(objkey), 'w') as f:
+            f.write('{"Links": []}')
+        hfs.load(objkey)
+        self.assertIsNone(hfs._descriptors.get((hfs._path, objkey), verified=True))
+        self.assertEqual(hfs.get(objkey, os.path.join(self.tmp_dir, 'file.out')), 0)
+        self.assertIsNone(hfs._descriptors.get((hfs._path, objkey), verified=True))
+
+    def test_load_does_not_hash_descriptor(self):
+        file_path = os.path.join(self.tmp_dir, 'file.bin')
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(1024))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        hfs._descriptors = DescriptorCache()
+        objkey = hfs.put(file_path)
+        with mock.patch.object(hfs, '_check_integrity', wraps=hfs._check_integrity) as check_integrity:
+            hfs.load(objkey)
+            self.assertEqual(check_integrity.call_count, 0)
+            hfs.get(objkey, os.path.join(self.tmp_dir, 'file.out'))
+            hfs.get(objkey, os.path.join(self.tmp_dir, 'file.out'))
+        # only the first get hashes the descriptor, the chunks are checked by each get
+        self.assertEqual([args[0] for args, _ in check_integrity.call_args_list].count(objkey), 1)
+
+    def test_entries_per_store(self):
+        cache = DescriptorCache()
+        cache.put(('store-a', 'a'), _descriptor(('chunk-a', 1)))
+        self.assertIsNone(cache.get(('store-b', 'a')))
+        cache.put(('store-b', 'a'), _descriptor(('chunk-b', 2)), verified=False)
+        self.assertEqual(cache.get(('store-b', 'a')), _descriptor(('chunk-b', 2)))
+        self.assertIsNone(cache.get(('store-b', 'a'), verified=True))
+        self.assertEqual(cache.get(('store-a', 'a'), verified=True), _descriptor(('chunk-a', 1)))
+        cache.discard(('store-a', 'a'))
+        self.assertIsNone(cache.get(('store-a', 'a')))
@@ -0,0 +1,41 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+
+import pytest
+
+from ml_git.file_system.fastcopy import copy_range, map_range
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class FastCopyTestCases(unittest.TestCase):
+
+    def _create_file(self, size):
+        data = os.urandom(size)
+        src_path = os.path.join(self.tmp_dir, 'src.bin')
+        with open(src_path, 'wb') as f:
+            f.write(data)
+        return src_path, data
+
+    def test_copy_range(self):
+        src_path, data = self._create_file(300 * 1024)
+        dst_path = os.path.join(self.tmp_dir, 'dst.bin')
+        with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+            dst_file.write(b'header')
+            dst_file.flush()
+            copy_range(src_file.fileno(), dst_file.fileno(), 1000, 200 * 1024)
+            copy_range(src_file.fileno(), dst_file.fileno(), 0, 10)
+        with open(dst_path, 'rb') as f:
+            self.assertEqual(f.read(), b'header' + data[1000:1000 + 200 * 1024] + data[:10])
+
+    def test_map_range(self):
+        src_path, data = self._create_file(200 * 1024)
+        with open(src_path, 'rb') as src_file:
+            with map_range(src_file.fileno(), 70000, 1234) as view:
+                self.assertEqual(bytes(view), data[70000:71234])
+            with map_range(src_file.fileno(), 10, 0) as view:
+                self.assertEqual(bytes(view), b'')
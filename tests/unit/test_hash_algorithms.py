@@ -0,0 +1,47 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import hashlib
+import os
+import unittest
+
+import multihash
+import pytest
+from cid import CIDv1, make_cid
+
+from ml_git.file_system.hash_algorithms import algorithm_of, b58decode, b58encode, get_hash_algorithm, hash_algorithms
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class HashAlgorithmsTestCases(unittest.TestCase):
+
+    def test_cid_matches_cid_package(self):
+        data = os.urandom(1024)
+        for name in ('sha2-256', 'sha2-512', 'sha3-256', 'sha3-512', 'blake2b-256'):
+            algorithm = get_hash_algorithm(name)
+            hasher = algorithm.new()
+            hasher.update(data)
+            expected = str(CIDv1('dag-pb', multihash.encode(hasher.digest(), name)))
+            self.assertEqual(algorithm.digest(data), expected)
+            self.assertEqual(make_cid(expected).multihash, multihash.encode(hasher.digest(), name))
+
+    def test_default_algorithm(self):
+        data = b'ml-git'
+        expected = str(CIDv1('dag-pb', multihash.encode(hashlib.sha256(data).digest(), 'sha2-256')))
+        self.assertEqual(get_hash_algorithm().digest(data), expected)
+
+    def test_algorithm_of(self):
+        for name in hash_algorithms():
+            self.assertEqual(algorithm_of(get_hash_algorithm(name).digest(b'data')).name, name)
+        self.assertEqual(algorithm_of('not-a-cid').name, 'sha2-256')
+        self.assertEqual(algorithm_of('z0OIl').name, 'sha2-256')
+        self.assertEqual(algorithm_of('').name, 'sha2-256')
+
+    def test_base58(self):
+        for data in (b'', b'\0\0abc', os.urandom(36)):
+            self.assertEqual(b58decode(b58encode(data)), data)
+
+    def test_invalid_algorithm(self):
+        self.assertRaises(RuntimeError, lambda: get_hash_algorithm('md5'))
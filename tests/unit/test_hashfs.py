@@ -6,13 +6,18 @@ SPDX-License-Identifier: GPL-2.0-only
 import hashlib
 import os
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
 
 import pytest
 
-from ml_git.constants import STORAGE_LOG
+from ml_git.constants import STORAGE_LOG, PACKS_PATH, PUSH_JOURNAL, FSCK_CHECKPOINT, CODEC_KEY, VerificationPolicy
+from ml_git.file_system.chunking import ContentDefinedChunker
+from ml_git.file_system.descriptor_cache import DescriptorCache
 from ml_git.file_system.hashfs import MultihashFS, HashFS
 from ml_git.file_system.index import MultihashIndex
 from ml_git.file_system.objects import Objects
+from ml_git.utils import json_load
 
 chunks256 = {
     'zdj7Wena1SoxPakkmaBTq1853qqKFwo1gDMWLB4SJjREsuGTC',
@@ -147,6 +152,282 @@ class MultihashFSTestCases(unittest.TestCase):
         self.assertTrue(len(corrupted_files) == 2)
         self.assertTrue('zdj7WaUNoRAzciw2JJi69s2HjfCyzWt39BHCucCV2CsAX6vSv' in corrupted_files)
 
+    def test_put_with_parallel_hashing(self):
+        original_file = os.path.join(self.tmp_dir, 'large-file.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(64 * 1024 * 67 + 123))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'sequential'), blocksize=64 * 1024)
+        parallel_hfs = MultihashFS(os.path.join(self.tmp_dir, 'parallel'), blocksize=64 * 1024, hash_threads=4)
+        objkey = hfs.put(original_file)
+        self.assertEqual(objkey, parallel_hfs.put(original_file))
+        self.assertEqual(objkey, parallel_hfs.get_scid(original_file))
+        self.assertEqual(hfs.load(objkey), parallel_hfs.load(objkey))
+        dst_file = os.path.join(self.tmp_dir, 'large-file.out')
+        parallel_hfs.get(objkey, dst_file)
+        self.assertEqual(self.md5sum(original_file), self.md5sum(dst_file))
+
+    def test_put_with_parallel_hashing_error(self):
+        original_file = os.path.join(self.tmp_dir, 'large-file.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(64 * 1024 * 67))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'parallel'), blocksize=64 * 1024, hash_threads=4)
+        with mock.patch.object(MultihashFS, '_hash_block_range', side_effect=OSError('No space left on device')), \
+                mock.patch('ml_git.file_system.hashfs.WorkerPool.shutdown') as shutdown:
+            self.assertRaises(OSError, hfs.put, original_file)
+        shutdown.assert_called_once()
+
+    def test_put_with_content_defined_chunking(self):
+        original_file = os.path.join(self.tmp_dir, 'large-file.bin')
+        data = os.urandom(1024 * 1024)
+        with open(original_file, 'wb') as f:
+            f.write(data)
+        hfs = MultihashFS(self.tmp_dir, blocksize=64 * 1024, chunker=ContentDefinedChunker(16 * 1024, 64 * 1024, 256 * 1024))
+        objkey = hfs.put(original_file)
+        self.assertEqual(objkey, hfs.get_scid(original_file))
+        chunks = {link['Hash'] for link in hfs.load(objkey)['Links']}
+
+        shifted_file = os.path.join(self.tmp_dir, 'shifted-file.bin')
+        with open(shifted_file, 'wb') as f:
+            f.write(b'ml-git' + data)
+        shifted_chunks = {link['Hash'] for link in hfs.load(hfs.put(shifted_file))['Links']}
+        self.assertGreater(len(chunks & shifted_chunks), len(chunks) // 2)
+
+        dst_file = os.path.join(self.tmp_dir, 'large-file.out')
+        hfs.get(objkey, dst_file)
+        self.assertEqual(self.md5sum(original_file), self.md5sum(dst_file))
+
+    def _put_small_files(self, hfs, count):
+        objkeys = {}
+        for i in range(count):
+            file_path = os.path.join(self.tmp_dir, 'small-file-%d.bin' % i)
+            with open(file_path, 'wb') as f:
+                f.write(os.urandom(1024 + i))
+            objkeys[hfs.put(file_path)] = file_path
+        return objkeys
+
+    def test_repack(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        objkeys = self._put_small_files(hfs, 20)
+        self.assertEqual(hfs.repack(), 40)
+
+        hashfs_path = os.path.join(self.tmp_dir, 'objects', 'hashfs')
+        self.assertEqual(sorted(os.listdir(hashfs_path)), ['log', PACKS_PATH])
+        for objkey, file_path in objkeys.items():
+            self.assertTrue(hfs._exists(objkey))
+            dst_file = file_path + '.out'
+            hfs.get(objkey, dst_file)
+            self.assertEqual(self.md5sum(file_path), self.md5sum(dst_file))
+            with hfs.materialize(objkey) as materialized_path:
+                self.assertEqual(hfs.load(objkey), json_load(materialized_path))
+        self.assertEqual(sum(len(files) for files in hfs.walk()), 40)
+        self.assertEqual(hfs.fsck(), [])
+
+    def test_fsck_and_gc_on_packs(self):
+        objects_path = os.path.join(self.tmp_dir, 'objects')
+        hfs = MultihashFS(objects_path)
+        objkeys = list(self._put_small_files(hfs, 4))
+        hfs.repack()
+        pack_path = hfs._packs.pack_files()[0]
+        with open(pack_path, 'r+b') as f:
+            f.write(b'corrupted')
+        self.assertEqual(len(hfs.fsck(remove_corrupted=True)), 1)
+        self.assertEqual(hfs.fsck(), [])
+
+        objects = Objects('', objects_path)
+        intact_objkeys = [objkey for objkey in objkeys if objects._exists(objkey)
+                          and all(objects._exists(link['Hash']) for link in objects.load(objkey)['Links'])]
+        used_objkeys = intact_objkeys[:1]
+        objects.garbage_collector(used_objkeys)
+        self.assertEqual(len(objects._packs.keys()), 2)
+
+    def test_parallel_fsck(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        objkeys = list(self._put_small_files(hfs, 10))
+        corrupted_path = hfs.get_keypath(objkeys[0])
+        with open(corrupted_path, 'wb') as f:
+            f.write(b'corrupted')
+        with mock.patch('ml_git.file_system.hashfs.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as executor:
+            self.assertEqual(hfs.fsck(remove_corrupted=True, workers=2), [objkeys[0]])
+        # the workers do not inherit the open connections of this process
+        self.assertEqual(executor.call_args[1]['mp_context'].get_start_method(), 'spawn')
+        self.assertFalse(os.path.exists(corrupted_path))
+        self.assertEqual(hfs.fsck(workers=2), [])
+
+    def test_fsck_resumes_from_checkpoint(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        objkeys = list(self._put_small_files(hfs, 10))
+        with open(hfs.get_keypath(objkeys[0]), 'wb') as f:
+            f.write(b'corrupted')
+        shards = hfs._fsck_shards()
+        checked_shards = []
+        check_shard_integrity = hfs._check_shard_integrity
+
+        def interrupted_check(shard, *args):
+            if len(checked_shards) == len(shards) // 2:
+                raise KeyboardInterrupt()
+            checked_shards.append(shard)
+            return check_shard_integrity(shard, *args)
+
+        hfs._check_shard_integrity = interrupted_check
+        self.assertRaises(KeyboardInterrupt, hfs.fsck)
+        self.assertTrue(os.path.exists(os.path.join(hfs._logpath, FSCK_CHECKPOINT)))
+
+        resumed_shards = []
+        hfs._check_shard_integrity = lambda shard, *args: resumed_shards.append(shard) or check_shard_integrity(shard, *args)
+        self.assertEqual(hfs.fsck(), [objkeys[0]])
+        self.assertEqual(sorted(checked_shards + resumed_shards), shards)
+        self.assertFalse(os.path.exists(os.path.join(hfs._logpath, FSCK_CHECKPOINT)))
+
+    def test_incremental_fsck(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        objkeys = list(self._put_small_files(hfs, 10))
+        hfs.repack()
+        objkeys.extend(self._put_small_files(hfs, 2))
+        verified_files = []
+        verify_chunk_integrity = hfs._verify_chunk_integrity
+
+        def count_verification(corrupted_files, corrupted_files_fullpaths, file, *args):
+            verified_files.append(file)
+            return verify_chunk_integrity(corrupted_files, corrupted_files_fullpaths, file, *args)
+
+        hfs._verify_chunk_integrity = count_verification
+        self.assertEqual(hfs.fsck(incremental=True), [])
+        self.assertEqual(len(verified_files), 4)
+
+        verified_files.clear()
+        corrupted_path = hfs.get_keypath(objkeys[-1])
+        with open(corrupted_path, 'wb') as f:
+            f.write(b'corrupted')
+        self.assertEqual(hfs.fsck(incremental=True), [objkeys[-1]])
+        self.assertEqual(verified_files, [objkeys[-1]])
+
+        verified_files.clear()
+        self.assertEqual(hfs.fsck(), [objkeys[-1]])
+        self.assertEqual(len(verified_files), 4)
+
+    def test_inline_small_files(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), inline_max_size=1024)
+        small_file = os.path.join(self.tmp_dir, 'small.json')
+        with open(small_file, 'wb') as f:
+            f.write(b'{"label": 1}')
+        large_file = os.path.join(self.tmp_dir, 'large.bin')
+        with open(large_file, 'wb') as f:
+            f.write(os.urandom(1025))
+        small_key = hfs.put(small_file)
+        large_key = hfs.put(large_file)
+        self.assertEqual(small_key, hfs.get_scid(small_file))
+        self.assertEqual(hfs.load(small_key)['Links'], [])
+        self.assertEqual(len(hfs.load(large_key)['Links']), 1)
+        self.assertEqual(sum(len(files) for files in hfs.walk()), 3)
+
+        hfs.fetch_scid(small_key)
+        self.assertEqual(hfs.get_log(), [small_key])
+        dst_file = os.path.join(self.tmp_dir, 'small.out')
+        self.assertEqual(hfs.get(small_key, dst_file), 12)
+        self.assertEqual(self.md5sum(small_file), self.md5sum(dst_file))
+        self.assertEqual(hfs.fsck(), [])
+
+    def test_compressed_chunks(self):
+        original_file = os.path.join(self.tmp_dir, 'table.csv')
+        with open(original_file, 'wb') as f:
+            f.write(b'id,label,score\n' + b'1234,cat,0.98\n' * 50000)
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), compression='zlib')
+        hfs._descriptors = DescriptorCache()
+        objkey = hfs.put(original_file)
+        descriptor = hfs.load(objkey)
+        self.assertEqual(descriptor[CODEC_KEY], 'zlib')
+        stored_size = sum(os.path.getsize(hfs.get_keypath(link['Hash'])) for link in descriptor['Links'])
+        self.assertLess(stored_size * 4, os.path.getsize(original_file))
+
+        dst_file = os.path.join(self.tmp_dir, 'table.out')
+        self.assertEqual(hfs.get(objkey, dst_file), os.path.getsize(original_file))
+        self.assertEqual(self.md5sum(original_file), self.md5sum(dst_file))
+        self.assertEqual(hfs.fsck(), [])
+        hfs.repack(max_object_size=1024 * 1024)
+        self.assertEqual(hfs.fsck(), [])
+        os.unlink(dst_file)
+        self.assertEqual(hfs.get(objkey, dst_file), os.path.getsize(original_file))
+        self.assertEqual(self.md5sum(original_file), self.md5sum(dst_file))
+
+        # the chunks keep the CIDs of their uncompressed content
+        uncompressed_hfs = MultihashFS(os.path.join(self.tmp_dir, 'uncompressed'))
+        self.assertEqual(uncompressed_hfs.load(uncompressed_hfs.put(original_file))['Links'], descriptor['Links'])
+
+    def test_corrupted_compressed_chunk(self):
+        original_file = os.path.join(self.tmp_dir, 'table.csv')
+        with open(original_file, 'wb') as f:
+            f.write(b'1234,cat,0.98\n' * 10000)
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), compression='zlib')
+        objkey = hfs.put(original_file)
+        chunk_path = hfs.get_keypath(hfs.load(objkey)['Links'][0]['Hash'])
+        with open(chunk_path, 'r+b') as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b'corrupt!')
+        self.assertEqual(hfs.get(objkey, os.path.join(self.tmp_dir, 'table.out')), 0)
+        self.assertEqual(len(hfs.fsck()), 1)
+
+    def test_mixed_hash_algorithms(self):
+        original_file = os.path.join(self.tmp_dir, 'data.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(300 * 1024))
+        objects_path = os.path.join(self.tmp_dir, 'objects')
+        sha256_key = MultihashFS(objects_path).put(original_file)
+        hfs = MultihashFS(objects_path, hash_algorithm='blake2b-256')
+        blake2b_key = hfs.put(original_file)
+        self.assertNotEqual(sha256_key, blake2b_key)
+        self.assertEqual(hfs.get_scid(original_file), blake2b_key)
+        self.assertEqual(hfs.get_scid(original_file, sha256_key), sha256_key)
+
+        for objkey in (sha256_key, blake2b_key):
+            dst_file = os.path.join(self.tmp_dir, 'data.out')
+            self.assertEqual(hfs.get(objkey, dst_file), 300 * 1024)
+            self.assertEqual(self.md5sum(original_file), self.md5sum(dst_file))
+            os.unlink(dst_file)
+        self.assertEqual(hfs.fsck(), [])
+
+        with open(hfs.get_keypath(hfs.load(blake2b_key)['Links'][0]['Hash']), 'r+b') as f:
+            f.write(b'corrupt!')
+        self.assertEqual(len(hfs.fsck()), 1)
+
+    def test_get_with_on_download_verification(self):
+        original_file = os.path.join(self.tmp_dir, 'file.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(600 * 1024))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), verification_policy=VerificationPolicy.ON_DOWNLOAD.value)
+        objkey = hfs.put(original_file)
+        dst_file = os.path.join(self.tmp_dir, 'file.out')
+        hfs.get(objkey, dst_file)
+        hfs.finish_verification()
+
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), verification_policy=VerificationPolicy.ON_DOWNLOAD.value)
+        verified_chunks = []
+        hfs._descriptors = DescriptorCache()
+        check_integrity = hfs._check_integrity
+        hfs._check_integrity = lambda cid, data: verified_chunks.append(cid) or check_integrity(cid, data)
+        hfs.get(objkey, dst_file)
+        self.assertEqual(verified_chunks, [objkey])
+
+        chunk = hfs.load(objkey)['Links'][0]['Hash']
+        chunk_path = hfs.get_keypath(chunk)
+        with open(chunk_path, 'r+b') as f:
+            f.write(b'corrupted')
+        self.assertEqual(hfs.get(objkey, dst_file), 0)
+        self.assertFalse(os.path.exists(dst_file))
+
+    def test_get_with_background_verification(self):
+        original_file = os.path.join(self.tmp_dir, 'file.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(600 * 1024))
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'), verification_policy=VerificationPolicy.BACKGROUND.value)
+        objkey = hfs.put(original_file)
+        chunk = hfs.load(objkey)['Links'][1]['Hash']
+        with open(hfs.get_keypath(chunk), 'r+b') as f:
+            f.write(b'corrupted')
+        dst_file = os.path.join(self.tmp_dir, 'file.out')
+        self.assertEqual(hfs.get(objkey, dst_file), 600 * 1024)
+        self.assertEqual(hfs.finish_verification(), [chunk])
+        self.assertFalse(os.path.exists(dst_file))
+
     def test_remove_corrupted_files(self):
         hfs = MultihashFS(self.tmp_dir, blocksize=1024 * 1024)
         corrupted_file_path = os.path.join(self.tmp_dir, 'corrupted_file')
@@ -221,17 +502,42 @@ class HashFSTestCases(unittest.TestCase):
     def test_update_log(self):
         original_file = 'data/think-hires.jpg'
         hfs = HashFS(self.tmp_dir, blocksize=1024 * 1024)
-        storage_log = os.path.join(self.tmp_dir, 'hashfs', 'log', STORAGE_LOG)
-        open(storage_log, 'a').close()
+        hfs._log('data/other.jpg')
         hfs.update_log([original_file])
-        with open(storage_log, 'r') as log_file:
-            self.assertIn(original_file, log_file.read())
+        self.assertEqual(hfs.get_log(), [original_file])
 
     def test_reset_log(self):
         hfs = HashFS(self.tmp_dir, blocksize=1024 * 1024)
-        storage_log = os.path.join(self.tmp_dir, 'hashfs', 'log', STORAGE_LOG)
-        open(storage_log, 'a').close()
+        hfs._log('data/think-hires.jpg')
+        push_journal = os.path.join(self.tmp_dir, 'hashfs', 'log', PUSH_JOURNAL)
+        self.assertTrue(os.path.exists(push_journal))
         hfs.reset_log()
+        self.assertFalse(os.path.exists(push_journal))
+        self.assertEqual(hfs.get_log(), [])
+
+    def test_push_journal_resume(self):
+        hfs = HashFS(self.tmp_dir, blocksize=1024 * 1024)
+        keys = ['key%d' % i for i in range(10)]
+        hfs._log(keys[0], [{'Hash': key} for key in keys[1:]])
+        hfs._log(keys[3])
+        for key in keys[:4]:
+            hfs.mark_pushed(key)
+        hfs.close_log()
+        hfs = HashFS(self.tmp_dir, blocksize=1024 * 1024)
+        self.assertEqual(hfs.count_log(), 6)
+        self.assertEqual(list(hfs.iter_log()), keys[4:])
+        hfs.unmark_pushed([keys[1]])
+        hfs.remove_hash(keys[5])
+        self.assertEqual(hfs.get_log(), [keys[1], keys[4]] + keys[6:])
+
+    def test_migrate_storage_log(self):
+        keys = ['key1', 'key2', 'key1']
+        storage_log = os.path.join(self.tmp_dir, 'hashfs', 'log', STORAGE_LOG)
+        os.makedirs(os.path.dirname(storage_log))
+        with open(storage_log, 'w') as log_file:
+            log_file.write('\n'.join(keys) + '\n')
+        hfs = HashFS(self.tmp_dir, blocksize=1024 * 1024)
+        self.assertEqual(hfs.get_log(), keys[:2])
         self.assertFalse(os.path.exists(storage_log))
 
     def test_get_simple(self):
@@ -256,15 +562,13 @@ class HashFSTestCases(unittest.TestCase):
         o = Objects('dataset-spec', self.tmp_dir)
         o.commit_index(self.tmp_dir, data)
         for h in hash_list:
-            with open(os.path.join(self.tmp_dir, 'hashfs', 'log', STORAGE_LOG)) as f:
-                self.assertTrue(h in f.read())
+            self.assertIn(h, hfs.get_log())
 
         for h in hash_list:
             hfs.remove_hash(h)
 
         for h in hash_list:
-            with open(os.path.join(self.tmp_dir, 'hashfs', 'log', STORAGE_LOG)) as f:
-                self.assertFalse(h in f.read())
+            self.assertNotIn(h, hfs.get_log())
 
     def test_link(self):
         hfs = HashFS(self.tmp_dir)
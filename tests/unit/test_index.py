@@ -5,11 +5,14 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import os
 import unittest
+from unittest import mock
 
 import pytest
 
+from ml_git.constants import MutabilityType
+from ml_git.file_system.hashfs import MultihashFS
 from ml_git.file_system.index import MultihashIndex
-from ml_git.utils import yaml_load, yaml_save
+from ml_git.utils import yaml_save
 
 singlefile = {
     'manifest': {'zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9u': {'think-hires.jpg'}},
@@ -35,9 +38,8 @@ class IndexTestCases(unittest.TestCase):
 
         idx.add('data', '')
 
-        mf = os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'MANIFEST.yaml')
-        self.assertEqual(yaml_load(mf), singlefile['manifest'])
-        fi = yaml_load(os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'INDEX.yaml'))
+        self.assertEqual(idx.get_index().load(), singlefile['manifest'])
+        fi = idx.get_index_yaml().get_index()
         for k, v in fi.items():
             self.assertEqual(v['hash'], singlefile['datastore'])
 
@@ -46,22 +48,20 @@ class IndexTestCases(unittest.TestCase):
         idx.add('data', '')
         idx.add('data', '')
 
-        mf = os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'MANIFEST.yaml')
-        self.assertEqual(yaml_load(mf), singlefile['manifest'])
+        self.assertEqual(idx.get_index().load(), singlefile['manifest'])
 
     def test_add2(self):
         idx = MultihashIndex('dataset-spec', self.tmp_dir, self.tmp_dir)
         idx.add('data', '')
 
-        mf = os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'MANIFEST.yaml')
-        self.assertEqual(yaml_load(mf), singlefile['manifest'])
-        fi = yaml_load(os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'INDEX.yaml'))
+        self.assertEqual(idx.get_index().load(), singlefile['manifest'])
+        fi = idx.get_index_yaml().get_index()
         for k, v in fi.items():
             self.assertEqual(v['hash'], singlefile['datastore'])
 
         idx.add('data2', '')
-        self.assertEqual(yaml_load(mf), secondfile['manifest'])
-        fi = yaml_load(os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'INDEX.yaml'))
+        self.assertEqual(idx.get_index().load(), secondfile['manifest'])
+        fi = idx.get_index_yaml().get_index()
         hashs = []
         for k, v in fi.items():
             hashs.append(v['hash'])
@@ -101,7 +101,7 @@ class IndexTestCases(unittest.TestCase):
 
         idx = MultihashIndex('dataset-spec', self.tmp_dir, self.tmp_dir)
         idx.add('data', manifestfile)
-        f_idx = yaml_load(os.path.join(self.tmp_dir, 'metadata', 'dataset-spec', 'INDEX.yaml'))
+        f_idx = idx.get_index_yaml().get_index()
         self.assertTrue(len(f_idx) > 0)
         for k, v in f_idx.items():
             self.assertEqual(k, 'think-hires.jpg')
@@ -121,3 +121,103 @@ class IndexTestCases(unittest.TestCase):
 
         self.assertTrue(mf.exists('zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9u'))
         self.assertTrue(mf.exists('zdj7WemKEtQMVL81UU6PSuYaoxvBQ6CiUMq1fMvoXBhPUsCK2'))
+
+    def test_add_dir_many_files(self):
+        data_path = os.path.join(self.tmp_dir, 'many-files')
+        expected = {}
+        for i in range(50):
+            os.makedirs(os.path.join(data_path, 'dir-%d' % (i % 7)), exist_ok=True)
+            file_path = 'dir-%d/file-%d.txt' % (i % 7, i)
+            with open(os.path.join(data_path, file_path), 'w') as file:
+                file.write('content %d' % i)
+            expected[file_path] = 'content %d' % i
+        yaml_save({'dataset': {'version': 1}}, os.path.join(data_path, 'dataset-spec.spec'))
+
+        idx = MultihashIndex('dataset-spec', os.path.join(self.tmp_dir, 'index'), os.path.join(self.tmp_dir, 'objects'))
+        idx.add(data_path, '')
+
+        files = set().union(*idx.get_index().load().values())
+        self.assertEqual(files, set(expected))
+        full_index = idx.get_index_yaml().get_index()
+        self.assertEqual(set(full_index.keys()), set(expected))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'index', 'metadata', 'dataset-spec', 'dataset-spec.spec')))
+
+        idx.add(data_path, '')
+        self.assertEqual(set().union(*idx.get_index().load().values()), set(expected))
+
+    def test_add_modified_file_single_pass(self):
+        data_path = os.path.join(self.tmp_dir, 'modified')
+        os.makedirs(data_path)
+        file_path = os.path.join(data_path, 'model.bin')
+        with open(file_path, 'wb') as file:
+            file.write(b'version 1' * 100000)
+        idx = MultihashIndex('dataset-spec', os.path.join(self.tmp_dir, 'index'), os.path.join(self.tmp_dir, 'objects'),
+                             mutability=MutabilityType.MUTABLE.value)
+        idx.add(data_path, '')
+        first_hash = idx.get_index_yaml().get_index()['model.bin']['hash']
+
+        with open(file_path, 'wb') as file:
+            file.write(b'version 2' * 100000)
+        os.utime(file_path, (1, 1))
+        with mock.patch.object(MultihashFS, '_build_descriptor', autospec=True, side_effect=MultihashFS._build_descriptor) as build:
+            idx.add(data_path, '')
+        self.assertEqual(build.call_count, 1)
+
+        entry = idx.get_index_yaml().get_index()['model.bin']
+        self.assertNotEqual(entry['hash'], first_hash)
+        self.assertEqual(entry['previous_hash'], first_hash)
+        self.assertEqual(entry['size'], 900000)
+        self.assertIn(entry['hash'], idx.get_index().load())
+        self.assertTrue(os.path.exists(idx._hfs.get_keypath(entry['hash'])))
+
+    def test_add_dir_hash_processes(self):
+        data_path = os.path.join(self.tmp_dir, 'data')
+        for i in range(150):
+            os.makedirs(os.path.join(data_path, 'dir-%d' % (i % 5)), exist_ok=True)
+            with open(os.path.join(data_path, 'dir-%d/file-%d.txt' % (i % 5, i)), 'w') as file:
+                file.write('content %d' % (i % 100))
+
+        indexes = {}
+        for name, processes in (('threads', 1), ('processes', 2)):
+            idx = MultihashIndex('dataset-spec', os.path.join(self.tmp_dir, name, 'index'), os.path.join(self.tmp_dir, name, 'objects'),
+                                 mutability=MutabilityType.MUTABLE.value, hash_processes=processes)
+            idx.add(data_path, '')
+            indexes[name] = idx
+        manifest = indexes['processes'].get_index().load()
+        self.assertEqual(manifest, indexes['threads'].get_index().load())
+        self.assertEqual(sum(len(files) for files in manifest.values()), 150)
+        full_index = indexes['processes'].get_index_yaml().get_index()
+        self.assertEqual({key: value['hash'] for key, value in full_index.items()},
+                         {key: value['hash'] for key, value in indexes['threads'].get_index_yaml().get_index().items()})
+        for key in manifest:
+            self.assertTrue(os.path.exists(indexes['processes']._hfs.get_keypath(key)))
+
+        first_hash = full_index['dir-0/file-0.txt']['hash']
+        file_path = os.path.join(data_path, 'dir-0/file-0.txt')
+        with open(file_path, 'w') as file:
+            file.write('modified')
+        os.utime(file_path, (1, 1))
+        indexes['processes'].add(data_path, '')
+        entry = indexes['processes'].get_index_yaml().get_index()['dir-0/file-0.txt']
+        self.assertEqual(entry['previous_hash'], first_hash)
+        self.assertIn('dir-0/file-0.txt', indexes['processes'].get_index().load()[entry['hash']])
+
+    def test_add_rejected_change_not_stored(self):
+        data_path = os.path.join(self.tmp_dir, 'strict')
+        os.makedirs(data_path)
+        file_path = os.path.join(data_path, 'model.bin')
+        with open(file_path, 'wb') as file:
+            file.write(b'version 1' * 100000)
+        idx = MultihashIndex('dataset-spec', os.path.join(self.tmp_dir, 'index'), os.path.join(self.tmp_dir, 'objects'),
+                             mutability=MutabilityType.STRICT.value, cache_path=os.path.join(self.tmp_dir, 'cache'))
+        idx.add(data_path, '')
+
+        os.chmod(file_path, 0o644)
+        with open(file_path, 'wb') as file:
+            file.write(b'version 2' * 100000)
+        os.utime(file_path, (1, 1))
+        modified_hash = MultihashFS(os.path.join(self.tmp_dir, 'other')).get_scid(file_path)
+        idx.add(data_path, '')
+
+        self.assertEqual(idx.get_index_yaml().get_index()['model.bin']['status'], 'c')
+        self.assertFalse(os.path.exists(idx._hfs.get_keypath(modified_hash)))
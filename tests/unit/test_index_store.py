@@ -0,0 +1,110 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from ml_git.file_system.index_store import FileIndexStore, ManifestIndexStore
+from ml_git.utils import yaml_save
+
+
+def _entry(key, status='a'):
+    return {'ctime': 1.5, 'mtime': 2.5, 'status': status, 'hash': key, 'size': 10}
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class IndexStoreTestCases(unittest.TestCase):
+
+    def test_file_index_changes_saved_on_save(self):
+        fidx = FileIndexStore(self.tmp_dir)
+        fidx.add('data/file1', _entry('zdj7-1'))
+        self.assertEqual(fidx['data/file1']['hash'], 'zdj7-1')
+        self.assertIsNone(FileIndexStore(self.tmp_dir).get('data/file1'))
+
+        fidx.save()
+        self.assertEqual(dict(FileIndexStore(self.tmp_dir)['data/file1']), _entry('zdj7-1'))
+
+    def test_file_index_entry_update(self):
+        fidx = FileIndexStore(self.tmp_dir)
+        fidx.add('data/file1', _entry('zdj7-1'))
+        fidx.add('data/file2', _entry('zdj7-2'))
+        fidx.save()
+
+        fidx = FileIndexStore(self.tmp_dir)
+        for file, value in fidx.items():
+            value['status'] = 'u'
+        fidx['data/file1']['untime'] = 3.5
+        fidx.save()
+
+        fidx = FileIndexStore(self.tmp_dir)
+        self.assertEqual(fidx['data/file1']['status'], 'u')
+        self.assertEqual(fidx['data/file1']['untime'], 3.5)
+        self.assertEqual(fidx['data/file2']['status'], 'u')
+        self.assertNotIn('untime', fidx['data/file2'])
+        self.assertNotIn('previous_hash', fidx['data/file2'])
+
+    def test_file_index_rm_key(self):
+        fidx = FileIndexStore(self.tmp_dir)
+        for i in range(5):
+            fidx.add('file%d' % i, _entry('zdj7-%d' % i))
+        fidx.save()
+        fidx.rm_key('file1')
+        fidx.add('file5', _entry('zdj7-5'))
+        self.assertNotIn('file1', fidx)
+        self.assertEqual(len(fidx), 5)
+        self.assertEqual(sorted(fidx), ['file0', 'file2', 'file3', 'file4', 'file5'])
+        fidx.save()
+        self.assertEqual(len(FileIndexStore(self.tmp_dir)), 5)
+
+        fidx.clear()
+        self.assertEqual(len(FileIndexStore(self.tmp_dir)), 0)
+
+    def test_file_index_pages(self):
+        fidx = FileIndexStore(self.tmp_dir)
+        for i in range(25):
+            fidx.add('file%02d' % i, _entry('zdj7-%d' % i))
+        fidx.save()
+        with mock.patch('ml_git.file_system.index_store.INDEX_DB_PAGE_SIZE', 10):
+            self.assertEqual(list(FileIndexStore(self.tmp_dir)), ['file%02d' % i for i in range(25)])
+
+    def test_manifest_index(self):
+        mf = ManifestIndexStore(self.tmp_dir)
+        self.assertFalse(mf.is_saved())
+        mf.add('zdj7-1', 'file1')
+        mf.add('zdj7-1', 'file2')
+        mf.add('zdj7-2', 'file3')
+        mf.save()
+        self.assertTrue(mf.is_saved())
+
+        mf = ManifestIndexStore(self.tmp_dir)
+        self.assertEqual(mf.load(), {'zdj7-1': {'file1', 'file2'}, 'zdj7-2': {'file3'}})
+        self.assertEqual(mf.search('file3'), 'zdj7-2')
+        self.assertTrue(mf.exists_keyfile('zdj7-1', 'file2'))
+
+        mf.add('zdj7-3', 'file2', previous_key='zdj7-1')
+        mf.rm_file('file3')
+        self.assertFalse(mf.exists('zdj7-2'))
+        self.assertEqual(mf.load(), {'zdj7-1': {'file1'}, 'zdj7-3': {'file2'}})
+        mf.save()
+        self.assertEqual(ManifestIndexStore(self.tmp_dir).load(), {'zdj7-1': {'file1'}, 'zdj7-3': {'file2'}})
+
+        mf.remove()
+        self.assertFalse(mf.is_saved())
+        self.assertEqual(ManifestIndexStore(self.tmp_dir).load(), {})
+
+    def test_migrate_yaml_files(self):
+        yaml_save({'file1': _entry('zdj7-1', 'u'), 'file2': _entry('zdj7-2')}, os.path.join(self.tmp_dir, 'INDEX.yaml'))
+        yaml_save({'zdj7-2': {'file2'}}, os.path.join(self.tmp_dir, 'MANIFEST.yaml'))
+
+        fidx = FileIndexStore(self.tmp_dir)
+        self.assertEqual(fidx.load(), {'file1': _entry('zdj7-1', 'u'), 'file2': _entry('zdj7-2')})
+        mf = ManifestIndexStore(self.tmp_dir)
+        self.assertTrue(mf.is_saved())
+        self.assertEqual(mf.load(), {'zdj7-2': {'file2'}})
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'INDEX.yaml')))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'MANIFEST.yaml')))
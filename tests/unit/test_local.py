@@ -7,6 +7,7 @@ import filecmp
 import os
 import shutil
 import unittest
+from unittest import mock
 
 import boto3
 import botocore
@@ -20,6 +21,7 @@ from ml_git.file_system.hashfs import MultihashFS
 from ml_git.file_system.index import MultihashIndex, Status, FullIndex
 from ml_git.file_system.local import LocalRepository
 from ml_git.file_system.objects import Objects
+from ml_git.pool import WorkerPool
 from ml_git.sample import SampleValidate, SampleValidateException
 from ml_git.storages.s3_storage import S3Storage
 from ml_git.utils import yaml_load, yaml_save, ensure_path_exists, set_write_read
@@ -102,7 +104,7 @@ class LocalRepositoryTestCases(unittest.TestCase):
         idx = MultihashIndex(specpath, indexpath, objectpath)
         idx.add('data-test-push/', manifestpath)
 
-        fi = yaml_load(os.path.join(specpath, 'INDEX.yaml'))
+        fi = idx.get_index_yaml().get_index()
         self.assertTrue(len(fi) > 0)
         self.assertTrue(os.path.exists(indexpath))
 
@@ -143,12 +145,61 @@ class LocalRepositoryTestCases(unittest.TestCase):
 
         fs = set()
         for root, dirs, files in os.walk(objectpath):
+            if 'log' in dirs:
+                dirs.remove('log')
             for file in files:
                 fs.add(file)
 
         self.assertEqual(len(hs), len(fs))
         self.assertTrue(len(hs.difference(fs)) == 0)
 
+    def test_fetch_with_failed_key(self):
+        mdpath = os.path.join(self.tmp_dir, 'metadata-test')
+        testbucketname = os.getenv('MLGIT_TEST_BUCKET', 'ml-git-datasets')
+        config_spec = get_sample_config_spec(testbucketname, testprofile, testregion)
+        dataset_spec = get_sample_spec(testbucketname)
+
+        specpath = os.path.join(mdpath, 'vision-computing', 'images', 'dataset-ex')
+        ensure_path_exists(specpath)
+        yaml_save(dataset_spec, os.path.join(specpath, 'dataset-ex.spec'))
+
+        manifestpath = os.path.join(specpath, 'MANIFEST.yaml')
+        missing_key = 'zdj7Wm99FQsJ7a4udnx36ZQNTy7h4Pao3XmRSfjo4sAbt9g74'
+        yaml_save({'zdj7WjdojNAZN53Wf29rPssZamfbC6MVerzcGwd9tNciMpsQh': {'imghires.jpg'}, missing_key: {'1.jpg'}}, manifestpath)
+
+        objectpath = os.path.join(self.tmp_dir, 'objects-test')
+        spec = 'vision-computing__images__dataset-ex__5'
+
+        r = LocalRepository(config_spec, objectpath)
+        self.assertFalse(r.fetch(mdpath, spec, None, retries=0))
+
+        # the other key was still fetched
+        for h in hs:
+            self.assertTrue(r._exists(h))
+        self.assertFalse(r._exists(missing_key))
+
+        # a missing chunk fails the fetch too
+        boto3.client(S3, region_name='us-east-1').delete_object(Bucket=testbucketname, Key='zdj7WWsMkELZSGQGgpm5VieCWV8NxY5n5XEP73H4E7eeDMA3A')
+        yaml_save({'zdj7WjdojNAZN53Wf29rPssZamfbC6MVerzcGwd9tNciMpsQh': {'imghires.jpg'}}, manifestpath)
+        r = LocalRepository(config_spec, os.path.join(self.tmp_dir, 'objects-test-2'))
+        self.assertFalse(r.fetch(mdpath, spec, None, retries=0))
+
+    def test_fetch_batch_with_shared_chunk(self):
+        chunks = {'ipld-1': ['chunk-1', 'chunk-2'], 'ipld-2': ['chunk-2', 'chunk-3'], 'ipld-3': ['chunk-1']}
+
+        def fetch_chunk(key):
+            if key == 'chunk-2':
+                raise RuntimeError('chunk not found')
+            return key
+
+        r = LocalRepository(get_sample_config_spec('bucket', testprofile, testregion), os.path.join(self.tmp_dir, 'objects-test'))
+        with mock.patch.object(LocalRepository, '_fetch_descriptor', side_effect=chunks.get), \
+                mock.patch.object(LocalRepository, '_fetch_chunk', side_effect=fetch_chunk):
+            args = {'wp': WorkerPool(nworkers=1, pb_elts=3)}
+            self.assertFalse(r._fetch_batch(list(chunks), args))
+        # every file waiting for the failed chunk failed
+        self.assertEqual(args['failed'], ['ipld-1', 'ipld-2'])
+
     def test_get_update_cache(self):
         hfspath = os.path.join(self.tmp_dir, 'objectsfs')
         ohfs = MultihashFS(hfspath)
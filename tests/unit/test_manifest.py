@@ -8,7 +8,10 @@ import unittest
 
 import pytest
 
-from ml_git.manifest import Manifest
+from ml_git.compact_manifest import load_compact_manifest
+from ml_git.constants import MANIFEST_SHARDS_DIR, MANIFEST_SHARD_FILE
+from ml_git.manifest import Manifest, get_manifest_files, get_shards_count, shard_of
+from ml_git.utils import yaml_save
 
 
 @pytest.mark.usefixtures('tmp_dir')
@@ -129,3 +132,83 @@ class ManifestTestCases(unittest.TestCase):
         mf_diff, _ = mf_1.get_diff(mf_2)
 
         self.assertEqual(mf_diff, {'zdj7WgHSKJkoJST5GWGgS53ARqV7oqMGYVvWzEWku3MBfnQ9u': {'data/think-hires.jpg'}})
+
+    def test_search_after_changes(self):
+        mfpath = os.path.join(self.tmp_dir, 'manifest.yaml')
+        yaml_save({'zdj7-1': {'data/file1', 'data/file2'}, 'zdj7-2': {'data/file3'}}, mfpath)
+
+        mf = Manifest(mfpath)
+        self.assertEqual(mf.search('data/file3'), 'zdj7-2')
+        mf.add('zdj7-3', 'data/file2', previous_key='zdj7-1')
+        self.assertEqual(mf.search('data/file2'), 'zdj7-3')
+        self.assertFalse(mf.exists_keyfile('zdj7-1', 'data/file2'))
+        self.assertTrue(mf.rm_file('data/file3'))
+        self.assertFalse(mf.exists('zdj7-2'))
+        self.assertIsNone(mf.search('data/file3'))
+        self.assertFalse(mf.rm_file('data/file3'))
+        mf.rm_key('zdj7-1')
+        self.assertIsNone(mf.search('data/file1'))
+
+        mf.merge({'zdj7-4': {'data/file1'}})
+        self.assertEqual(mf.search('data/file1'), 'zdj7-4')
+
+    def test_file_in_more_than_one_key(self):
+        mfpath = os.path.join(self.tmp_dir, 'manifest.yaml')
+
+        mf = Manifest(mfpath)
+        mf.add('zdj7-1', 'data/file1')
+        mf.add('zdj7-2', 'data/file1')
+        mf.add('zdj7-2', 'data/file2')
+        self.assertEqual(mf.search('data/file1'), 'zdj7-1')
+        self.assertTrue(mf.rm('zdj7-1', 'data/file1'))
+        self.assertEqual(mf.search('data/file1'), 'zdj7-2')
+        self.assertTrue(mf.rm_file('data/file1'))
+        self.assertIsNone(mf.search('data/file1'))
+        self.assertEqual(mf.search('data/file2'), 'zdj7-2')
+
+    def test_compare_files(self):
+        mfpath = os.path.join(self.tmp_dir, 'manifest.yaml')
+        yaml_save({'zdj7-1': {'data/file1', 'data/file2'}, 'zdj7-2': {'data/file3'}}, mfpath)
+
+        mf = Manifest(mfpath)
+        added_files, deleted_files, modified_files = mf.compare_files({'zdj7-1': {'data/file1'}, 'zdj7-3': {'data/file3', 'data/file4'}})
+        self.assertEqual(added_files, ['data/file4'])
+        self.assertEqual(list(deleted_files), ['data/file2'])
+        self.assertEqual(modified_files, ['data/file3'])
+        self.assertEqual(mf.search('data/file2'), 'zdj7-1')
+
+    def test_sharded_save(self):
+        mfpath = os.path.join(self.tmp_dir, 'MANIFEST.yaml')
+        manifest = {'zdj7W%045d' % i: {'data/file%d' % i} for i in range(100)}
+        yaml_save(manifest, mfpath)
+
+        mf = Manifest(mfpath, shards=8)
+        mf.save()
+        self.assertFalse(os.path.exists(mfpath))
+        self.assertEqual(get_shards_count(mfpath), 8)
+        self.assertEqual(len(get_manifest_files(mfpath)), 8)
+        self.assertEqual(Manifest(mfpath).get_yaml(), manifest)
+        self.assertEqual(dict(load_compact_manifest(mfpath).items()), manifest)
+
+    def test_sharded_save_only_changed_shards(self):
+        mfpath = os.path.join(self.tmp_dir, 'MANIFEST.yaml')
+        mf = Manifest(mfpath, shards=16)
+        for i in range(100):
+            mf.add('zdj7W%045d' % i, 'data/file%d' % i)
+        mf.save()
+        for path in get_manifest_files(mfpath):
+            os.utime(path, (0, 0))
+
+        mf = Manifest(mfpath, shards=4)
+        mf.add('zdj7WNewKey', 'data/new-file')
+        self.assertTrue(mf.rm_file('data/file1'))
+        mf.save()
+        changed = [path for path in get_manifest_files(mfpath) if os.stat(path).st_mtime != 0]
+        expected = {os.path.join(self.tmp_dir, MANIFEST_SHARDS_DIR, MANIFEST_SHARD_FILE % shard_of(key, 16))
+                    for key in ('zdj7WNewKey', 'zdj7W%045d' % 1)}
+        self.assertEqual(set(changed), expected)
+        self.assertEqual(get_shards_count(mfpath), 16)
+        loaded = Manifest(mfpath).get_yaml()
+        self.assertEqual(loaded['zdj7WNewKey'], {'data/new-file'})
+        self.assertNotIn('zdj7W%045d' % 1, loaded)
+        self.assertEqual(len(loaded), 100)
@@ -15,6 +15,7 @@ from prettytable import PrettyTable
 
 from ml_git.constants import DATE, PERFORMANCE_KEY, TAG, RELATED_DATASET_TABLE_INFO, \
     RELATED_LABELS_TABLE_INFO, STORAGE_SPEC_KEY, STORAGE_CONFIG_KEY, DATASET_SPEC_KEY, MODEL_SPEC_KEY
+from ml_git.manifest import Manifest
 from ml_git.metadata import Metadata
 from ml_git.repository import Repository
 from ml_git.utils import clear, yaml_load_str, yaml_load
@@ -422,6 +423,34 @@ class MetadataTestCases(unittest.TestCase):
         self.assertTrue(len(deleted_files) == 1)
         self.assertTrue(len(modified_file) == 0)
 
+    @pytest.mark.usefixtures('start_local_git_server', 'switch_to_test_dir')
+    def test_diff_refs_sharded_manifest(self):
+        repo_type = DATASETS
+        mdpath = os.path.join(self.test_dir, '.ml-git', repo_type, 'metadata')
+        entity = 'dataset-ex'
+        specpath = os.path.join('vision-computer', 'images', entity)
+        config_test = deepcopy(config)
+        config_test['mlgit_path'] = '.ml-git'
+        m = Metadata(entity, mdpath, config_test, repo_type)
+        m.init()
+        ensure_path_exists(os.path.join(mdpath, specpath, entity))
+        manifestpath = os.path.join(os.path.join(mdpath, specpath), 'MANIFEST.yaml')
+        shutil.copy('hdata/dataset-ex.spec', os.path.join(mdpath, specpath, '{}.spec'.format(entity)))
+        yaml_save(files_mock, manifestpath)
+        sha1 = m.commit(os.path.join(mdpath, specpath), 'test')
+
+        manifest = Manifest(manifestpath, shards=4)
+        manifest.add('zPaksM5tNewHashQ2VABPvvfC3VW6wFRTWKvFhUW5QaDx6JMoma', '11.jpg')
+        manifest.save()
+        sha2 = m.commit(os.path.join(mdpath, specpath), 'test')
+        committed_files = [blob.path for blob in sha2.tree.traverse()]
+        self.assertNotIn('/'.join([specpath.replace(os.sep, '/'), 'MANIFEST.yaml']), committed_files)
+
+        added_files, deleted_files, modified_file = m.diff_refs_with_modified_files(entity, sha1, sha2)
+        self.assertEqual(added_files, ['11.jpg'])
+        self.assertEqual(len(deleted_files), 0)
+        self.assertEqual(len(modified_file), 0)
+
     @pytest.mark.usefixtures('start_local_git_server', 'switch_to_test_dir')
     def test_diff_refs_modified_file(self):
         repo_type = DATASETS
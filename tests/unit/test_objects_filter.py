@@ -0,0 +1,136 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from ml_git.file_system.hashfs import MultihashFS
+from ml_git.file_system.objects_filter import BloomFilter, ObjectsFilter
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class ObjectsFilterTestCases(unittest.TestCase):
+
+    def _create_filter(self):
+        return ObjectsFilter(os.path.join(self.tmp_dir, 'log', 'objects.db'), os.path.join(self.tmp_dir, 'log', 'objects.bloom'))
+
+    def test_bloom_filter(self):
+        bloom_filter = BloomFilter(1000)
+        keys = ['key-%d' % i for i in range(1000)]
+        for key in keys:
+            bloom_filter.add(key)
+        self.assertTrue(all(key in bloom_filter for key in keys))
+        false_positives = sum('other-%d' % i in bloom_filter for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_disabled_until_built(self):
+        objects_filter = self._create_filter()
+        self.assertFalse(objects_filter.is_enabled())
+        objects_filter.add('key-1')
+        self.assertTrue(objects_filter.might_contain('key-2'))
+
+        objects_filter.rebuild(['key-1'])
+        self.assertTrue(objects_filter.is_enabled())
+        self.assertTrue(objects_filter.might_contain('key-1'))
+        self.assertFalse(objects_filter.might_contain('key-2'))
+
+    def test_load_keys_added_since_saved(self):
+        objects_filter = self._create_filter()
+        objects_filter.rebuild(['key-1'])
+        objects_filter.add('key-2')
+        objects_filter.close()
+
+        objects_filter = self._create_filter()
+        self.assertTrue(objects_filter.might_contain('key-1'))
+        self.assertTrue(objects_filter.might_contain('key-2'))
+        self.assertFalse(objects_filter.might_contain('key-3'))
+
+    def test_keys_added_by_other_instance(self):
+        objects_filter = self._create_filter()
+        objects_filter.rebuild(['key-1'])
+        self.assertFalse(objects_filter.might_contain('key-2'))
+
+        other_filter = self._create_filter()
+        other_filter.add('key-2')
+        self.assertTrue(objects_filter.might_contain('key-2'))
+        self.assertFalse(objects_filter.might_contain('key-3'))
+
+    def test_added_keys_counted_once(self):
+        objects_filter = self._create_filter()
+        objects_filter.rebuild(['key-1'])
+        objects_filter.add('key-2')
+        self._create_filter().add('key-3')
+        objects_filter.add('key-4')
+        self.assertFalse(objects_filter.might_contain('key-5'))
+        self.assertEqual(objects_filter._count, 4)
+        self.assertTrue(all(objects_filter.might_contain('key-%d' % i) for i in range(1, 5)))
+
+    def test_failed_save_is_not_fatal(self):
+        objects_filter = self._create_filter()
+        objects_filter.rebuild(['key-1'])
+        with mock.patch('os.replace', side_effect=FileNotFoundError()):
+            objects_filter.add('key-2')
+            objects_filter.save()
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir, 'log')).count('objects.bloom'), 1)
+        self.assertFalse([name for name in os.listdir(os.path.join(self.tmp_dir, 'log')) if name.endswith('.tmp')])
+        self.assertTrue(self._create_filter().might_contain('key-2'))
+
+    def test_grow_filter(self):
+        objects_filter = self._create_filter()
+        with mock.patch('ml_git.file_system.objects_filter.OBJECTS_FILTER_MIN_CAPACITY', 10):
+            objects_filter.rebuild([])
+            nbits = objects_filter._filter.nbits
+            for i in range(50):
+                objects_filter.add('key-%d' % i)
+        self.assertGreater(objects_filter._filter.nbits, nbits)
+        self.assertTrue(all(objects_filter.might_contain('key-%d' % i) for i in range(50)))
+
+    def test_exists_skips_filesystem_for_missing_keys(self):
+        hfs = MultihashFS(os.path.join(self.tmp_dir, 'objects'))
+        original_file = os.path.join(self.tmp_dir, 'data.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(1024))
+        key = hfs.put(original_file)
+        self.assertTrue(hfs._exists(key))
+        chunk_key = hfs.load(key)['Links'][0]['Hash']
+        self.assertTrue(hfs._exists(chunk_key))
+        with mock.patch('os.path.exists') as exists:
+            self.assertFalse(hfs._exists('zdj7WWsMkELZSGQGgpm5VieCWV8NxY5n5XEP73H4E7eeDMA3A'))
+        exists.assert_not_called()
+
+    def test_objects_written_by_other_means(self):
+        path = os.path.join(self.tmp_dir, 'objects')
+        hfs = MultihashFS(path)
+        original_file = os.path.join(self.tmp_dir, 'data.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(1024))
+        key = MultihashFS(os.path.join(self.tmp_dir, 'other')).put(original_file)
+        other_path = MultihashFS(os.path.join(self.tmp_dir, 'other')).get_keypath(key)
+        keypath = hfs.get_keypath(key)
+        os.makedirs(os.path.dirname(keypath))
+        os.link(other_path, keypath)
+        self.assertFalse(hfs._exists(key))
+
+        hfs.record_object(key)
+        self.assertTrue(hfs._exists(key))
+        self.assertTrue(MultihashFS(path)._exists(key))
+
+    def test_fsck_rebuilds_filter(self):
+        path = os.path.join(self.tmp_dir, 'objects')
+        original_file = os.path.join(self.tmp_dir, 'data.bin')
+        with open(original_file, 'wb') as f:
+            f.write(os.urandom(1024))
+        key = MultihashFS(os.path.join(self.tmp_dir, 'other')).put(original_file)
+        hfs = MultihashFS(path)
+        keypath = hfs.get_keypath(key)
+        os.makedirs(os.path.dirname(keypath))
+        os.link(MultihashFS(os.path.join(self.tmp_dir, 'other')).get_keypath(key), keypath)
+        self.assertFalse(hfs._exists(key))
+
+        self.assertEqual(hfs.fsck(), [])
+        self.assertTrue(hfs._exists(key))
@@ -3,10 +3,15 @@
 SPDX-License-Identifier: GPL-2.0-only
 """
 
+import threading
+import time
 import unittest
 
+from botocore.exceptions import ClientError
+
+from ml_git.constants import POOL_IN_FLIGHT_PER_WORKER
 from ml_git.ml_git_message import output_messages
-from ml_git.pool import WorkerPool, process_futures
+from ml_git.pool import WorkerPool, process_futures, process_results, pool_factory, AdaptiveConcurrency, is_throttling_error, ContextPool
 
 
 class Context(object):
@@ -103,6 +108,15 @@ class PoolTestCases(unittest.TestCase):
         for fut in futs:
             self.assertEqual(fut.result(), job_with_ctx(ctxs[0], 10, 10))
 
+    def test_single_job_failure_without_progress_bar(self):
+        def job():
+            raise OSError('No space left on device')
+
+        wp = WorkerPool(nworkers=1)
+        wp.submit(job)
+        self.assertRaises(OSError, wp.wait()[0].result)
+        self.assertEqual(wp.errors_count, 1)
+
     def test_multiple_jobs(self):
         njobs = 10
 
@@ -136,3 +150,230 @@ class PoolTestCases(unittest.TestCase):
 
         with self.assertRaises(Exception):
             process_futures(futs, wp)
+
+    def test_adaptive_concurrency_bounds(self):
+        concurrency = AdaptiveConcurrency(2, 8)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def job(i):
+            with lock:
+                running.append(i)
+                peak.append(len(running))
+            time.sleep(0.001)
+            with lock:
+                running.remove(i)
+            return i
+
+        wp = pool_factory(nworkers=1, retry=0, concurrency=concurrency)
+        self.assertEqual(wp.nworkers, 8)
+        for i in range(200):
+            wp.submit(job, i)
+        futs = wp.wait()
+        self.assertEqual([fut.result() for fut in futs], list(range(200)))
+        self.assertLessEqual(max(peak), 8)
+        self.assertTrue(2 <= concurrency.limit <= 8)
+
+    def test_adaptive_concurrency_increase(self):
+        concurrency = AdaptiveConcurrency(2, 8)
+        limits = [concurrency.limit]
+        for _ in range(50):
+            for _ in range(concurrency.limit):
+                concurrency.release(concurrency.acquire() - 0.01)
+            limits.append(concurrency.limit)
+        self.assertEqual(limits[-1], 8)
+        self.assertEqual(sorted(limits), limits)
+
+    def test_adaptive_concurrency_decrease(self):
+        concurrency = AdaptiveConcurrency(2, 32)
+        concurrency.limit = 16
+        throttled = ClientError({'Error': {'Code': 'SlowDown'}}, 'PutObject')
+        first, second = concurrency.acquire(), concurrency.acquire()
+        concurrency.release(first, throttled)
+        self.assertEqual(concurrency.limit, 8)
+        concurrency.release(second, throttled)
+        self.assertEqual(concurrency.limit, 8)
+        concurrency.release(concurrency.acquire(), Exception('not found'))
+        self.assertEqual(concurrency.limit, 8)
+        concurrency.release(concurrency.acquire(), throttled)
+        self.assertEqual(concurrency.limit, 4)
+
+        for latency in (0.01, 0.1):
+            for _ in range(concurrency.limit):
+                concurrency.release(concurrency.acquire() - latency)
+        self.assertEqual(concurrency.limit, 2)
+
+    def test_is_throttling_error(self):
+        self.assertTrue(is_throttling_error(ClientError({'Error': {'Code': 'SlowDown'}}, 'PutObject')))
+        self.assertTrue(is_throttling_error(ClientError({'Error': {'Code': 'InternalError'}, 'ResponseMetadata': {'HTTPStatusCode': 500}},
+                                                        'GetObject')))
+        self.assertFalse(is_throttling_error(ClientError({'Error': {'Code': 'NoSuchKey'}, 'ResponseMetadata': {'HTTPStatusCode': 404}},
+                                                         'GetObject')))
+        self.assertTrue(is_throttling_error(Exception('Rate exceeded: TooManyRequests')))
+        self.assertFalse(is_throttling_error(Exception(output_messages['ERROR_WORKER_POOL_EXCEPTION'])))
+
+    def test_imap_unordered(self):
+        consumed = []
+        taken = []
+
+        def items():
+            for i in range(100):
+                # items are only taken while few enough tasks are waiting to be consumed
+                self.assertLessEqual(len(taken) - len(consumed), 2 * POOL_IN_FLIGHT_PER_WORKER)
+                taken.append(i)
+                yield i
+
+        wp = WorkerPool(nworkers=2)
+        for item, future in wp.imap_unordered(job_no_ctx, items(), 10):
+            self.assertEqual(future.result(), item * 10)
+            consumed.append(item)
+        self.assertEqual(sorted(consumed), list(range(100)))
+        self.assertEqual(wp.pending_count(), 0)
+
+    def test_imap_unordered_stop(self):
+        wp = WorkerPool(nworkers=1)
+        results = wp.imap_unordered(job_no_ctx, range(100), 10)
+        next(results)
+        results.close()
+        self.assertEqual(wp.pending_count(), 0)
+
+        ctxs = [Context(1)]
+        wp = WorkerPool(nworkers=1, pool_ctxs=ctxs)
+        self.assertEqual([future.result() for _, future in wp.imap_unordered(job_with_ctx, [1, 2], 10)], ['context: 1 10', 'context: 1 20'])
+
+    def test_as_completed(self):
+        wp = WorkerPool(nworkers=2)
+        for i in range(10):
+            wp.submit(job_no_ctx, i, 10)
+        self.assertEqual(sorted(future.result() for future in wp.as_completed()), [i * 10 for i in range(10)])
+        self.assertEqual(wp.pending_count(), 0)
+
+    def test_process_results(self):
+        done = []
+
+        def job(i):
+            if i == 3:
+                raise ValueError('failed %d' % i)
+            done.append(i)
+            return i
+
+        wp = WorkerPool(nworkers=2, pb_elts=20)
+        with self.assertRaises(ValueError):
+            process_results(wp.imap_unordered(job, range(20)))
+        # the other tasks still ran after the failure
+        self.assertEqual(sorted(done), [i for i in range(20) if i != 3])
+        self.assertEqual(wp.pending_count(), 0)
+
+    def test_lazy_contexts(self):
+        created = []
+
+        def factory():
+            created.append(Context(len(created)))
+            return created[-1]
+
+        wp = pool_factory(ctx_factory=factory, nworkers=64)
+        for i in range(3):
+            wp.submit(job_with_ctx, i, 10)
+        results = [fut.result() for fut in wp.wait()]
+        self.assertTrue(1 <= len(created) <= 3)
+        self.assertEqual(sorted(int(result.split()[-1]) for result in results), [0, 10, 20])
+
+    def test_contexts_within_concurrency_limit(self):
+        contexts = ContextPool(lambda: Context(0))
+        started = threading.Semaphore(0)
+        finish = threading.Event()
+
+        def job(ctx, i):
+            started.release()
+            finish.wait()
+            return i
+
+        wp = pool_factory(ctx_pool=contexts, concurrency=AdaptiveConcurrency(2, 16))
+        for i in range(16):
+            wp.submit(job, i)
+        try:
+            for _ in range(2):
+                started.acquire()
+            # the workers waiting for the limit do not open a context
+            self.assertEqual(contexts.created, 2)
+        finally:
+            finish.set()
+        self.assertEqual(sorted(fut.result() for fut in wp.wait()), list(range(16)))
+
+    def test_release_ctx_on_fail_limit(self):
+        contexts = ContextPool(lambda: Context(0))
+
+        def job(ctx, i):
+            raise ValueError('failed %d' % i)
+
+        wp = pool_factory(nworkers=1, retry=0, fail_limit=0, ctx_pool=contexts)
+        wp.submit(job, 1)
+        with self.assertRaises(ValueError):
+            wp.wait()[0].result()
+        # the context of the task that cancelled the pool is reused
+        self.assertIsNotNone(contexts.acquire())
+        self.assertEqual(contexts.created, 1)
+
+    def test_cancel_while_submitting(self):
+        wp = WorkerPool(nworkers=1)
+
+        class Future(object):
+            def cancel(self):
+                # a task submitted by the caller while a worker cancels the pool
+                wp._futures[Future()] = None
+
+        wp._futures[Future()] = None
+        wp.cancel()
+        self.assertEqual(wp.pending_count(), 2)
+
+    def test_context_pool(self):
+        contexts = ContextPool(lambda: object())
+        first = contexts.acquire()
+        second = contexts.acquire()
+        self.assertIsNot(first, second)
+        contexts.release(first)
+        self.assertIs(contexts.acquire(), first)
+        self.assertEqual(contexts.created, 2)
+
+        shared = ContextPool(lambda: object(), shared=True)
+        ctx = shared.acquire()
+        self.assertIs(shared.acquire(), ctx)
+        shared.release(ctx)
+        self.assertIs(shared.acquire(), ctx)
+        self.assertEqual(shared.created, 1)
+
+    def test_imap_graph(self):
+        executed = []
+
+        def root(item):
+            executed.append((root, item))
+            return [item * 10 + i for i in range(3)]
+
+        def child(item):
+            executed.append((child, item))
+            return item
+
+        def children(task, result):
+            return [(child, item) for item in result] if task[0] is root else []
+
+        wp = WorkerPool(nworkers=1)
+        order = [task for task, future in wp.imap_graph([(root, i) for i in range(4)], children)]
+        self.assertEqual(sorted(item for fn, item in order if fn is child), sorted(i * 10 + j for i in range(4) for j in range(3)))
+        # with a single worker, children of the first roots run before the last root
+        self.assertLess(min(executed.index(task) for task in executed if task[0] is child), executed.index((root, 3)))
+        self.assertEqual(wp.pending_count(), 0)
+
+    def test_imap_graph_failed_root(self):
+        def root(item):
+            if item == 1:
+                raise RuntimeError('error')
+            return [item]
+
+        def children(task, result):
+            return [(str, item) for item in result] if task[0] is root else []
+
+        wp = WorkerPool(nworkers=2)
+        results = [(task, future.exception()) for task, future in wp.imap_graph([(root, i) for i in range(3)], children)]
+        self.assertEqual(len(results), 5)
+        self.assertEqual([task for task, exc in results if exc is not None], [(root, 1)])
@@ -0,0 +1,88 @@
+"""
+© Copyright 2022 HP Development Company, L.P.
+SPDX-License-Identifier: GPL-2.0-only
+"""
+
+import os
+import shutil
+import unittest
+from unittest import mock
+
+import pytest
+
+from ml_git.storages.storage import Storage
+from ml_git.storages.transfer_limits import TokenBucket, TransferLimiter
+
+
+class DirectoryStorage(Storage):
+
+    def __init__(self, path):
+        self._path = path
+        super(DirectoryStorage, self).__init__()
+
+    def connect(self):
+        self._storage = self._path
+
+    def put(self, key_path, file_path):
+        self._limit_request(os.path.getsize(file_path))
+        shutil.copyfile(file_path, os.path.join(self._storage, key_path))
+        return key_path
+
+    def get(self, file_path, reference):
+        self._limit_request()
+        shutil.copyfile(os.path.join(self._storage, reference), file_path)
+        self._limit_download(file_path)
+        return True
+
+
+@pytest.mark.usefixtures('tmp_dir')
+class TransferLimitsTestCases(unittest.TestCase):
+
+    def test_token_bucket(self):
+        with mock.patch('ml_git.storages.transfer_limits.time.monotonic', return_value=100.0):
+            bucket = TokenBucket(10)
+            self.assertEqual(bucket.reserve(10), 0)
+            self.assertAlmostEqual(bucket.reserve(5), 0.5)
+            self.assertAlmostEqual(bucket.reserve(20), 2.5)
+        with mock.patch('ml_git.storages.transfer_limits.time.monotonic', return_value=103.0):
+            self.assertEqual(bucket.reserve(5), 0)
+
+    def test_limiter_stats(self):
+        limiter = TransferLimiter(bandwidth_limit=100, requests_limit=2)
+        with mock.patch('ml_git.storages.transfer_limits.time.sleep') as sleep:
+            limiter.request(50)
+            limiter.request(50)
+            self.assertFalse(sleep.called)
+            limiter.request()
+            limiter.transfer(100)
+        self.assertEqual(sleep.call_count, 2)
+        stats = limiter.stats()
+        self.assertEqual((stats['requests'], stats['bytes']), (3, 200))
+        self.assertGreater(stats['throttled'], 0)
+        limiter.reset_stats()
+        self.assertEqual(limiter.stats(), {'requests': 0, 'bytes': 0, 'throttled': 0.0})
+
+    def test_no_limits(self):
+        limiter = TransferLimiter()
+        with mock.patch('ml_git.storages.transfer_limits.time.sleep') as sleep:
+            for _ in range(100):
+                limiter.request(1024 * 1024)
+        self.assertFalse(sleep.called)
+        self.assertEqual(limiter.stats()['requests'], 100)
+
+    def test_storage_limits_put_and_get(self):
+        remote = os.path.join(self.tmp_dir, 'remote')
+        os.makedirs(remote)
+        file_path = os.path.join(self.tmp_dir, 'file')
+        with open(file_path, 'wb') as f:
+            f.write(b'0' * 1000)
+
+        storage = DirectoryStorage(remote)
+        storage.file_store('key', file_path)
+        storage.limiter = TransferLimiter(bandwidth_limit=1000)
+        with mock.patch('ml_git.storages.transfer_limits.time.sleep') as sleep:
+            storage.file_store('key', file_path)
+            self.assertTrue(storage.get(os.path.join(self.tmp_dir, 'downloaded'), 'key'))
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(storage.limiter.stats()['requests'], 2)
+        self.assertEqual(storage.limiter.stats()['bytes'], 2000)